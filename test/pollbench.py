@@ -0,0 +1,37 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+
+# Import the development version of treetaggerwrapper.
+import sys
+sys.path.insert(0, "..")
+
+import itertools
+import time
+
+import treetaggerwrapper as ttpw
+
+# Compare TaggerPoll throughput for different workers / taggers counts.
+# Only run on one CPU with a stub tree-tagger program, where results before
+# and after jobs borrow a tagger only for the TreeTagger exchange were
+# within noise.
+JOBSCOUNT = 2000
+COUNTS = (1, 2, 4, 8)
+
+def run_poll(workerscount, taggerscount, text):
+    p = ttpw.TaggerPoll(workerscount=workerscount, taggerscount=taggerscount,
+                        TAGLANG="en")
+    start = time.time()
+    res = [p.tag_text_async(text) for i in range(JOBSCOUNT)]
+    for i, r in enumerate(res):
+        r.wait_finished()
+        res[i] = None   # Loose Job reference - free it.
+    elapsed = time.time() - start
+    p.stop_poll()
+    return elapsed
+
+if __name__ == '__main__':
+    text = "This is Mr John's own house, it's very nice. " * 40
+    print("workers\ttaggers\tseconds")
+    for workerscount, taggerscount in itertools.product(COUNTS, COUNTS):
+        elapsed = run_poll(workerscount, taggerscount, text)
+        print("{}\t{}\t{:0.2f}".format(workerscount, taggerscount, elapsed))
@@ -0,0 +1,36 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+
+# Import the development version of treetaggerwrapper.
+import sys
+sys.path.insert(0, "..")
+
+import time
+
+import treetaggerpoll
+
+# Compare TaggerProcessPoll throughput without and with CPU affinity layouts,
+# for different workers counts (given as script arguments).
+JOBSCOUNT = 5000
+LAYOUTS = (None,) + treetaggerpoll.AFFINITY_LAYOUTS
+
+def run_poll(workerscount, affinity, text):
+    p = treetaggerpoll.TaggerProcessPoll(workerscount=workerscount, affinity=affinity,
+                                         TAGLANG="en")
+    start = time.time()
+    res = p.tag_texts_async([text] * JOBSCOUNT)
+    for i, r in enumerate(res):
+        r.wait_finished()
+        res[i] = None   # Loose Job reference - free it.
+    elapsed = time.time() - start
+    p.stop_poll()
+    return elapsed
+
+if __name__ == '__main__':
+    counts = [int(n) for n in sys.argv[1:]] or [1, 2, 4]
+    text = "This is Mr John's own house, it's very nice. " * 40
+    print("workers\taffinity\tseconds")
+    for workerscount in counts:
+        for affinity in LAYOUTS:
+            elapsed = run_poll(workerscount, affinity, text)
+            print("{}\t{}\t{:0.2f}".format(workerscount, affinity or "none", elapsed))
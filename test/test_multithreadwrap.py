@@ -72,5 +72,45 @@ class MultithreadedTagging(unittest.TestCase):
         self.check_one_fct(self.do_preproc_tagging, self.tagres)
 
 
+class CoalescedTagging(MultithreadedTagging):
+    """Same tests, with concurrent calls coalesced.
+    """
+    def setUp(self):
+        MultithreadedTagging.setUp(self)
+        self.tt = treetaggerwrapper.TreeTagger(TAGLANG='en', TAGBATCHWINDOW=0.005)
+
+    def test_demultiplexing(self):
+        """Different texts get their own results, in fewer exchanges."""
+        texts = ["Text number {} is here.".format(i) for i in range(200)]
+        plain = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        expected = [plain.tag_text(t) for t in texts]
+        executor = cf.ThreadPoolExecutor(max_workers=50)
+        results = list(executor.map(self.tt.tag_text, texts))
+        self.assertEqual(results, expected)
+        self.assertLess(self.tt._tagexchanges, len(texts))
+
+    def test_isolation(self):
+        """Coalesced texts are not tagged in the context of each other."""
+        # Texts without final punctuation, first token tagging would use
+        # the end of previous text as context.
+        texts = ["hello {}".format(i) if i % 2 else "world {}".format(i) for i in range(100)]
+        plain = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        expected = [plain.tag_text(t) for t in texts]
+        tt = treetaggerwrapper.TreeTagger(TAGLANG='en', TAGBATCHWINDOW=0.05)
+        executor = cf.ThreadPoolExecutor(max_workers=50)
+        self.assertEqual(list(executor.map(tt.tag_text, texts)), expected)
+        self.assertLess(tt._tagexchanges, len(texts))
+
+    def test_batch_lines(self):
+        """Coalesced calls don't go over the lines limit."""
+        tt = treetaggerwrapper.TreeTagger(TAGLANG='en', TAGBATCHWINDOW=0.05,
+                                          TAGBATCHLINES=16)
+        executor = cf.ThreadPoolExecutor(max_workers=20)
+        # Each text is 8 lines, two texts by exchange at most.
+        results = list(executor.map(tt.tag_text, [self.instr + " Yes."] * 20))
+        self.assertEqual(results, [self.tt.tag_text(self.instr + " Yes.")] * 20)
+        self.assertGreaterEqual(tt._tagexchanges, 10)
+
+
 if __name__ == '__main__':
     unittest.main()
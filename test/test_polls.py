@@ -0,0 +1,842 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""TreeTagger Python wrapper test module for polls of taggers (threads and
+process polls).
+
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import unittest
+try:
+    import concurrent.futures as cf
+except ImportError:     # Python2 without the futures backport package.
+    cf = None
+# Setup parent directory in sys.path.
+import sys
+from os import path
+
+thedir = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, thedir)
+
+# Now, import the modules to test
+import treetaggerwrapper
+import treetaggerpoll
+import treetaggerstore
+
+# Polls futures interface is optional with Python2.
+need_futures = unittest.skipIf(cf is None, "need concurrent.futures (futures package)")
+
+TEXTS = ["This is text number {} of the test, it's short.".format(i) for i in range(40)]
+
+
+class PollTestsMixin(object):
+    """Tests common to both polls kinds - subclasses provide make_poll()."""
+
+    def setUp(self):
+        self.tt = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        self.expected = [self.tt.tag_text(t) for t in TEXTS]
+        self.poll = self.make_poll()
+
+    def tearDown(self):
+        self.poll.stop_poll()
+
+    def test_jobs(self):
+        jobs = [self.poll.tag_text_async(t) for t in TEXTS]
+        for job, res in zip(jobs, self.expected):
+            self.assertTrue(job.wait_finished(30))
+            self.assertTrue(job.finished)
+            self.assertEqual(job.result, res)
+
+    @need_futures
+    def test_submit_as_completed(self):
+        fs = dict((self.poll.submit(treetaggerwrapper.TreeTagger.tag_text, t), i)
+                  for i, t in enumerate(TEXTS))
+        done = 0
+        for f in cf.as_completed(fs, timeout=30):
+            self.assertEqual(f.result(), self.expected[fs[f]])
+            done += 1
+        self.assertEqual(done, len(TEXTS))
+
+    @need_futures
+    def test_map(self):
+        self.assertEqual(list(self.poll.map('tag_text', TEXTS, timeout=30)), self.expected)
+
+    @need_futures
+    def test_imap(self):
+        self.assertEqual(list(self.poll.imap(iter(TEXTS), window=3)), self.expected)
+        self.assertEqual(sorted(self.poll.imap_unordered(TEXTS, window=5)),
+                         sorted(self.expected))
+
+    @need_futures
+    def test_bounded_inflight(self):
+        poll = self.make_poll(maxinflight=3)
+        try:
+            jobs = []
+            for t in TEXTS:
+                jobs.append(poll.tag_text_async(t))
+                self.assertLessEqual(poll.inflight, 3)
+            for job, res in zip(jobs, self.expected):
+                self.assertTrue(job.wait_finished(30))
+                self.assertEqual(job.result, res)
+                self.assertIsNone(job._kwargs)
+            self.assertEqual(poll.inflight, 0)
+            self.assertTrue(poll.slot_available().done())
+        finally:
+            poll.stop_poll()
+
+    @need_futures
+    def test_split_text(self):
+        text = "\n".join("{} Second sentence   here!\n\n\tAnd a third one.".format(t)
+                         for t in TEXTS)
+        for options in ({}, {'numlines': True, 'tagblanks': True}, {'prepronly': True}):
+            f = self.poll.tag_text_split_async(text, segmentsize=150, **options)
+            self.assertEqual(f.result(30), self.tt.tag_text(text, **options))
+        f = self.poll.tag_text_split_async("", segmentsize=150)
+        self.assertEqual(f.result(30), self.tt.tag_text(""))
+
+    @need_futures
+    def test_tag_stream(self):
+        text = "\n".join("{} Second sentence   here!\n\n\tAnd a third one.".format(t)
+                         for t in TEXTS)
+        blocks = list(treetaggerwrapper.read_blocks(io.StringIO(text), 150))
+        self.assertGreater(len(blocks), 5)
+        self.assertEqual("".join(b for b, n in blocks), text)
+        self.assertEqual(blocks[1][1], blocks[0][0].count("\n") + 1)
+        for options in ({}, {'numlines': True, 'tagblanks': True}, {'prepronly': True}):
+            res = self.poll.tag_stream(io.StringIO(text), blocksize=150, window=3, **options)
+            self.assertEqual(sum(res, []), self.tt.tag_text(text, **options))
+        # Form feeds are lines ends for line numbering.
+        text = text.replace("\t", "\f")
+        res = self.poll.tag_stream(io.StringIO(text), blocksize=150, window=3, numlines=True)
+        self.assertEqual(sum(res, []), self.tt.tag_text(text, numlines=True))
+
+    @need_futures
+    def test_callback_and_exception(self):
+        called = []
+        f = self.poll.submit('tag_text', b"binary string")
+        f.add_done_callback(called.append)
+        self.assertIsInstance(f.exception(timeout=30), treetaggerwrapper.TreeTaggerError)
+        self.assertEqual(called, [f])
+
+    def test_metrics(self):
+        for job in [self.poll.tag_text_async(t) for t in TEXTS]:
+            self.assertTrue(job.wait_finished(30))
+        metrics = self.poll.metrics()
+        self.assertEqual(metrics['jobs_in_flight'], 0)
+        self.assertIn(metrics['queue_depth'], (0, None))
+        self.assertEqual(metrics['tokens'], sum(len(r) for r in self.expected))
+        self.assertGreater(metrics['tokens_per_second'], 0)
+        for stage in treetaggerwrapper.LATENCY_STAGES:
+            latency = metrics['latency'][stage]
+            self.assertEqual(latency['count'], len(TEXTS))
+            self.assertEqual(sum(latency['buckets']), len(TEXTS))
+            self.assertEqual(len(latency['buckets']), len(treetaggerwrapper.LATENCY_BUCKETS) + 1)
+        self.assertTrue(metrics['busy_ratio'])
+        for ratio in metrics['busy_ratio'].values():
+            self.assertTrue(0 <= ratio <= 1)
+
+    def test_metrics_callback(self):
+        reported = []
+        poll = self.make_poll(metricscallback=reported.append, metricsinterval=0.05)
+        try:
+            deadline = time.time() + 10
+            while len(reported) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            poll.stop_poll()
+        self.assertGreaterEqual(len(reported), 2)
+        self.assertIn('latency', reported[0])
+        count = len(reported)
+        time.sleep(0.2)
+        self.assertEqual(len(reported), count)
+
+
+def sleeping_job(tagger, seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def affinity_job(tagger):
+    # CPUs of the worker and of its TreeTagger process.
+    tagger.tag_text("Hello.")
+    return os.sched_getaffinity(0), os.sched_getaffinity(tagger.tagpopen.pid)
+
+
+def exchanges_job(tagger):
+    return tagger._tagexchanges
+
+
+def crashing_job(tagger, markerpath=None):
+    # Kill the worker process, only the first time if a marker file is given.
+    if markerpath is not None and path.exists(markerpath):
+        return "survived"
+    if markerpath is not None:
+        open(markerpath, "w").close()
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+class SegmentTests(unittest.TestCase):
+    def test_segment_text(self):
+        text = "one\ntwo\r\nthree\n\nfive"
+        segments = treetaggerwrapper.segment_text(text, 5)
+        self.assertEqual("".join(s for s, n in segments), text)
+        self.assertEqual([n for s, n in segments], [1, 3, 4])
+
+    def test_segment_lines(self):
+        lines = "A b . C d e ! F . G".split()
+        frames = treetaggerwrapper.segment_lines(lines, 4)
+        self.assertEqual(frames, [([], ["A", "b", "."], ["C", "d", "e", "!"]),
+                                  (["A", "b", "."], ["C", "d", "e", "!"], ["F", "."]),
+                                  (["C", "d", "e", "!"], ["F", "."], ["G"]),
+                                  (["F", "."], ["G"], [])])
+        self.assertEqual(treetaggerwrapper.segment_lines([], 4), [([], [], [])])
+
+
+@need_futures
+class ScheduleTestsMixin(object):
+    """Size-aware scheduling on a skewed workload."""
+
+    def setUp(self):
+        self.tt = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        # Few big documents lost among many small ones.
+        self.texts = [TEXTS[i % len(TEXTS)] for i in range(60)]
+        for i in (5, 27, 51):
+            self.texts[i] = "This is a much bigger document, number {}. ".format(i) * 200
+        self.expected = [self.tt.tag_text(t) for t in self.texts]
+
+    def run_schedule(self, schedule):
+        poll = self.make_poll(workerscount=1, schedule=schedule)
+        try:
+            order = []
+            # Keep the single worker busy while jobs are queued.
+            blocker = poll.submit(sleeping_job, 0.5)
+            time.sleep(0.2)
+            jobs = [poll.tag_text_async(t) for t in self.texts]
+            for i, job in enumerate(jobs):
+                job.future.add_done_callback(lambda f, i=i: order.append(i))
+            self.assertEqual(blocker.result(30), 0.5)
+            for job, res in zip(jobs, self.expected):
+                self.assertTrue(job.wait_finished(30))
+                self.assertEqual(job.result, res)
+        finally:
+            poll.stop_poll()
+        # With process poll, first submitted job may already be in the
+        # process queue.
+        return order[1:] if order[0] == 0 else order
+
+    def test_fifo(self):
+        order = self.run_schedule("fifo")
+        self.assertEqual(order, sorted(order))
+
+    def test_lpt(self):
+        order = self.run_schedule("lpt")
+        lengths = [len(self.texts[i]) for i in order]
+        self.assertEqual(lengths, sorted(lengths, reverse=True))
+        self.assertEqual(sorted(order[:3]), [5, 27, 51])
+
+    def test_spt(self):
+        order = self.run_schedule("spt")
+        lengths = [len(self.texts[i]) for i in order]
+        self.assertEqual(lengths, sorted(lengths))
+        self.assertEqual(sorted(order[-3:]), [5, 27, 51])
+
+    def test_bad_schedule(self):
+        self.assertRaises(ValueError, self.make_poll, schedule="random")
+
+
+class ThreadPollTests(PollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerwrapper.TaggerPoll(workerscount=4, taggerscount=2, TAGLANG='en',
+                                            **kwargs)
+
+
+class ProcessPollTests(PollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en', **kwargs)
+
+    def test_tag_texts_batches(self):
+        jobs = self.poll.tag_texts_async(TEXTS, batch_size=7)
+        self.assertEqual(len(jobs), len(TEXTS))
+        for job, res in zip(jobs, self.expected):
+            self.assertTrue(job.wait_finished(30))
+            self.assertEqual(job.result, res)
+
+    def test_concurrent_batches(self):
+        poll = self.make_poll(maxinflight=2)
+        acquire_slot = poll._acquire_slot
+
+        def slow_acquire_slot(*args):
+            # Let the other thread run between slots acquisitions.
+            acquire_slot(*args)
+            time.sleep(0.01)
+        poll._acquire_slot = slow_acquire_slot
+        results = []
+
+        def tag_batches():
+            for i in range(5):
+                jobs = poll.tag_texts_async(TEXTS[:2], batch_size=2)
+                results.append([job.result for job in jobs if job.wait_finished(30)])
+        try:
+            threads = [threading.Thread(target=tag_batches) for i in range(2)]
+            for t in threads:
+                t.daemon = True
+                t.start()
+            for t in threads:
+                t.join(30)
+                self.assertFalse(t.is_alive())
+            self.assertEqual(results, [self.expected[:2]] * 10)
+            self.assertEqual(poll.inflight, 0)
+        finally:
+            poll.stop_poll()
+
+
+class ThreadScheduleTests(ScheduleTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        kwargs.setdefault('taggerscount', 1)
+        return treetaggerwrapper.TaggerPoll(TAGLANG='en', **kwargs)
+
+
+class ProcessScheduleTests(ScheduleTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerpoll.TaggerProcessPoll(TAGLANG='en', **kwargs)
+
+
+class AutoscalingTests(unittest.TestCase):
+    @need_futures
+    def test_scale_up_and_down(self):
+        poll = treetaggerpoll.TaggerProcessPoll(TAGLANG='en', minworkers=1, maxworkers=3,
+                                                idletimeout=0.5, scaleinterval=0.1)
+        try:
+            self.assertEqual(poll.metrics()['workers'], 1)
+            fs = [poll.submit(sleeping_job, 0.2) for i in range(20)]
+            maxworkers = 1
+            for f in fs:
+                self.assertEqual(f.result(30), 0.2)
+                maxworkers = max(maxworkers, poll.metrics()['workers'])
+            self.assertGreater(maxworkers, 1)
+            self.assertLessEqual(maxworkers, 3)
+            deadline = time.time() + 10
+            while poll.metrics()['workers'] > 1 and time.time() < deadline:
+                time.sleep(0.1)
+            metrics = poll.metrics()
+            self.assertEqual(metrics['workers'], 1)
+            self.assertEqual(metrics['workers_started'] - metrics['workers_retired'], 1)
+            self.assertEqual(metrics['jobs_in_flight'], 0)
+        finally:
+            poll.stop_poll()
+
+    def test_bad_bounds(self):
+        self.assertRaises(ValueError, treetaggerpoll.TaggerProcessPoll, TAGLANG='en',
+                          minworkers=3, maxworkers=2)
+
+
+class RecyclingTestsMixin(object):
+    def check_recycling(self, **kwargs):
+        # Expected results are computed before the poll starts process
+        # (with the fork start method, a TreeTagger process started while a
+        # worker is forked would wait for the worker end).
+        tt = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        expected = [tt.tag_text(t) for t in TEXTS]
+        poll = self.make_poll(**kwargs)
+        try:
+            jobs = [poll.tag_text_async(t) for t in TEXTS]
+            for job, res in zip(jobs, expected):
+                self.assertTrue(job.wait_finished(30))
+                self.assertEqual(job.result, res)
+            # Replacements are started in background.
+            deadline = time.time() + 10
+            while not poll.metrics()[self.recycledkey] and time.time() < deadline:
+                time.sleep(0.05)
+            return poll.metrics()
+        finally:
+            poll.stop_poll()
+
+    def test_max_jobs(self):
+        metrics = self.check_recycling(maxworkerjobs=5)
+        self.assertGreater(metrics[self.recycledkey], 0)
+
+    @unittest.skipIf(treetaggerwrapper.process_rss_mb(os.getpid()) is None,
+                     "need /proc to get memory size")
+    def test_max_rss(self):
+        metrics = self.check_recycling(maxrssmb=0.001)
+        self.assertGreater(metrics[self.recycledkey], 0)
+
+
+class ThreadRecyclingTests(RecyclingTestsMixin, unittest.TestCase):
+    recycledkey = 'taggers_recycled'
+
+    def make_poll(self, **kwargs):
+        return treetaggerwrapper.TaggerPoll(workerscount=4, taggerscount=2, TAGLANG='en',
+                                            **kwargs)
+
+
+class ProcessRecyclingTests(RecyclingTestsMixin, unittest.TestCase):
+    recycledkey = 'workers_recycled'
+
+    def make_poll(self, **kwargs):
+        return treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en', **kwargs)
+
+    def test_workers_count(self):
+        metrics = self.check_recycling(maxworkerjobs=3)
+        self.assertEqual(metrics['workers'], 2)
+
+    def test_taggers_started_meanwhile(self):
+        # TreeTagger process started by the caller while workers are
+        # replaced must not inherit workers pipes.
+        poll = self.make_poll(maxworkerjobs=1)
+        results = []
+
+        def start_taggers():
+            for t in TEXTS[:10]:
+                results.append(treetaggerwrapper.TreeTagger(TAGLANG='en').tag_text(t))
+        try:
+            jobs = [poll.tag_text_async(t) for t in TEXTS]
+            starter = threading.Thread(target=start_taggers)
+            starter.daemon = True
+            starter.start()
+            starter.join(60)
+            self.assertFalse(starter.is_alive())
+            for job in jobs:
+                self.assertTrue(job.wait_finished(30))
+            self.assertEqual(len(results), 10)
+        finally:
+            poll.stop_poll()
+
+
+@unittest.skipUnless(hasattr(signal, "SIGKILL"), "need SIGKILL to crash workers")
+@need_futures
+class CrashRecoveryTests(unittest.TestCase):
+    def warm_up(self, poll, count):
+        # Process import this module when unpickling their first work, a
+        # work is lost if they are killed before it is known as processed.
+        for f in [poll.submit(sleeping_job, 0.5) for i in range(count)]:
+            self.assertEqual(f.result(30), 0.5)
+
+    def test_killed_workers(self):
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en')
+        try:
+            self.warm_up(poll, 2)
+            fs = [poll.submit(sleeping_job, 0.05) for i in range(60)]
+            for i in range(2):
+                time.sleep(0.3)
+                os.kill(poll._workers[0].pid, signal.SIGKILL)
+            for f in fs:
+                self.assertEqual(f.result(30), 0.05)
+            deadline = time.time() + 10
+            while len(poll._workers) != 2 and time.time() < deadline:
+                time.sleep(0.1)
+            metrics = poll.metrics()
+            self.assertEqual(metrics['workers'], 2)
+            self.assertEqual(metrics['workers_crashed'], 2)
+            self.assertEqual(metrics['jobs_in_flight'], 0)
+            self.assertEqual(len(poll._workers), 2)
+        finally:
+            poll.stop_poll()
+
+    def test_retried_job(self):
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=1, TAGLANG='en')
+        tmpdir = tempfile.mkdtemp()
+        try:
+            markerpath = path.join(tmpdir, "crashed")
+            self.assertEqual(poll.submit(crashing_job, markerpath).result(30), "survived")
+            self.assertEqual(poll.metrics()['workers_crashed'], 1)
+        finally:
+            poll.stop_poll()
+            os.remove(markerpath)
+            os.rmdir(tmpdir)
+
+    def test_failed_job(self):
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en', crashretries=1)
+        try:
+            f = poll.submit(crashing_job)
+            self.assertIsInstance(f.exception(30), treetaggerwrapper.TreeTaggerError)
+            self.assertEqual(poll.metrics()['workers_crashed'], 2)
+            # Poll is still working.
+            self.assertEqual(poll.submit(sleeping_job, 0).result(30), 0)
+        finally:
+            poll.stop_poll()
+
+    def test_pipeline(self):
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=1, chunkerscount=1,
+                                                TAGLANG='en')
+        try:
+            self.warm_up(poll, 1)
+            fs = [poll.submit(sleeping_job, 0.05) for i in range(20)]
+            time.sleep(0.3)
+            os.kill(poll._workers[0].pid, signal.SIGKILL)
+            for f in fs:
+                self.assertEqual(f.result(30), 0.05)
+        finally:
+            poll.stop_poll()
+
+
+@need_futures
+class RoutingPollTests(unittest.TestCase):
+    # Only english is available in tests, routes differ by TreeTagger options.
+    ROUTES = [{}, {'TAGOPT': "-token -lemma -sgml -quiet"}, {'TAGOPT': "-token -sgml -quiet"}]
+
+    def setUp(self):
+        tt = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        self.expected = [tt.tag_text(t) for t in TEXTS]
+
+    def test_routes(self):
+        poll = treetaggerwrapper.TaggerRoutingPoll(workerscount=4, maxtaggers=2, TAGLANG='en')
+        try:
+            jobs = [poll.tag_text_async(t, taggerargs=self.ROUTES[i % 3])
+                    for i, t in enumerate(TEXTS)]
+            # Without -lemma TreeTagger output lines have no lemma column.
+            taggers = [treetaggerwrapper.TreeTagger(TAGLANG='en', **route)
+                       for route in self.ROUTES]
+            expected = [taggers[i % 3].tag_text(t) for i, t in enumerate(TEXTS)]
+            for job, res in zip(jobs, expected):
+                self.assertTrue(job.wait_finished(30))
+                self.assertEqual(job.result, res)
+            self.assertEqual(list(poll.imap(TEXTS[:4], lang='en')), self.expected[:4])
+            metrics = poll.metrics()
+            self.assertLessEqual(metrics['taggers'], 2)
+            self.assertEqual(len(metrics['routes']), 3)
+            self.assertLessEqual(sum(metrics['routes'].values()), 2)
+            self.assertGreater(metrics['taggers_stopped'], 0)
+            self.assertEqual(metrics['taggers_started'] - metrics['taggers_stopped'],
+                             metrics['taggers'])
+        finally:
+            poll.stop_poll()
+
+    def test_bad_route(self):
+        poll = treetaggerwrapper.TaggerRoutingPoll(workerscount=2, maxtaggers=2, TAGLANG='en')
+        try:
+            bad = poll.tag_text_async(TEXTS[0], lang='xx')
+            good = poll.tag_text_async(TEXTS[0])
+            self.assertIsInstance(bad.future.exception(30), treetaggerwrapper.TreeTaggerError)
+            self.assertEqual(good.future.result(30), self.expected[0])
+        finally:
+            poll.stop_poll()
+
+    @unittest.skipIf(treetaggerwrapper.process_rss_mb(os.getpid()) is None,
+                     "need /proc to get memory size")
+    def test_memory_limit(self):
+        poll = treetaggerwrapper.TaggerRoutingPoll(workerscount=2, maxtaggers=2,
+                                                   memorymb=0.001, TAGLANG='en')
+        try:
+            for f in [poll.submit('tag_text', t) for t in TEXTS[:6]]:
+                f.result(30)
+            # Idle taggers are stopped as soon as given back.
+            self.assertEqual(poll.metrics()['taggers'], 0)
+        finally:
+            poll.stop_poll()
+
+
+class CachedPollTestsMixin(object):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        tt = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        self.expected = [tt.tag_text(t) for t in TEXTS]
+        self.poll = self.make_poll(TAGCACHE=os.path.join(self.tmpdir, "tags.cache"))
+
+    def tearDown(self):
+        self.poll.stop_poll()
+        shutil.rmtree(self.tmpdir)
+
+    def test_cached_results(self):
+        for i in range(2):
+            jobs = [self.poll.tag_text_async(t) for t in TEXTS]
+            for job, res in zip(jobs, self.expected):
+                self.assertTrue(job.wait_finished(30))
+                self.assertEqual(job.result, res)
+        stats = self.poll.metrics()['cache']
+        self.assertEqual(stats['hits'], len(TEXTS))
+        self.assertEqual(stats['entries'], len(TEXTS))
+
+
+class ThreadCachedPollTests(CachedPollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerwrapper.TaggerPoll(workerscount=4, taggerscount=2, TAGLANG='en',
+                                            **kwargs)
+
+
+class ProcessCachedPollTests(CachedPollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en', **kwargs)
+
+    def test_cached_batches(self):
+        self.test_cached_results()
+        jobs = self.poll.tag_texts_async(TEXTS[:5] + ["A new text."], batch_size=4)
+        for job, res in zip(jobs, self.expected[:5]):
+            self.assertTrue(job.wait_finished(30))
+            self.assertEqual(job.result, res)
+        self.assertTrue(jobs[-1].wait_finished(30))
+        self.assertEqual(self.poll.metrics()['cache']['hits'], len(TEXTS) + 5)
+
+
+class AffinityTests(unittest.TestCase):
+    @staticmethod
+    def topology(cpu):
+        # Two packages of four cores with two hardware threads.
+        return (cpu // 4) % 2, cpu % 4
+
+    def test_layouts(self):
+        cpus = range(16)
+        self.assertEqual(treetaggerpoll.affinity_layout("compact", cpus, self.topology)[:6],
+                         [{0}, {1}, {2}, {3}, {4}, {5}])
+        self.assertEqual(treetaggerpoll.affinity_layout("scatter", cpus, self.topology)[:6],
+                         [{0}, {4}, {1}, {5}, {2}, {6}])
+        self.assertEqual(treetaggerpoll.affinity_layout("pair", cpus, self.topology)[:3],
+                         [{0, 8}, {1, 9}, {2, 10}])
+        # Without hardware threads, pairs of cores.
+        self.assertEqual(treetaggerpoll.affinity_layout("pair", range(4), lambda cpu: None),
+                         [{0, 1}, {2, 3}])
+        self.assertRaises(ValueError, treetaggerpoll.affinity_layout, "random", cpus)
+
+    @unittest.skipUnless(hasattr(os, "sched_setaffinity"), "need sched_setaffinity")
+    @need_futures
+    def test_pinned_workers(self):
+        cpu = min(os.sched_getaffinity(0))
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en',
+                                                affinity=[{cpu}])
+        try:
+            for f in [poll.submit(affinity_job) for i in range(4)]:
+                self.assertEqual(f.result(30), ({cpu}, {cpu}))
+        finally:
+            poll.stop_poll()
+
+
+class PipelinePollTests(PollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerpoll.TaggerProcessPoll(workerscount=1, chunkerscount=2,
+                                                TAGLANG='en', **kwargs)
+
+    def test_options(self):
+        text = "Line one.\n\nLine   three, with http://www.example.com"
+        job = self.poll.tag_text_async(text, numlines=True, tagblanks=True)
+        self.assertTrue(job.wait_finished(30))
+        self.assertEqual(job.result, self.tt.tag_text(text, numlines=True, tagblanks=True))
+        job = self.poll.tag_text_async(text, prepronly=True)
+        self.assertTrue(job.wait_finished(30))
+        self.assertEqual(job.result, self.tt.tag_text(text, prepronly=True))
+
+    def test_tag_file(self):
+        filepath = path.join(thedir, "test", "english.txt")
+        job = self.poll.tag_file_async(filepath)
+        self.assertTrue(job.wait_finished(30))
+        self.assertEqual(job.result, self.tt.tag_file(filepath))
+
+    @need_futures
+    def test_tag_texts_batches(self):
+        jobs = self.poll.tag_texts_async(TEXTS + [b"binary string"], batch_size=7)
+        for job, res in zip(jobs, self.expected):
+            self.assertTrue(job.wait_finished(30))
+            self.assertEqual(job.result, res)
+        self.assertIsInstance(jobs[-1].future.exception(30), treetaggerwrapper.TreeTaggerError)
+
+
+class CoalescingPollTests(PollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        return treetaggerpoll.TaggerProcessPoll(workerscount=1, TAGLANG='en',
+                                                coalescejobs=16, **kwargs)
+
+    @need_futures
+    def test_coalesced_exchanges(self):
+        # Works wait while the worker sleeps, then are tagged together.
+        sleeping = self.poll.submit(sleeping_job, 0.5)
+        jobs = [self.poll.tag_text_async(t) for t in TEXTS]
+        jobs.append(self.poll.tag_text_async(b"binary string"))
+        jobs.extend(self.poll.tag_texts_async(TEXTS[:10], batch_size=4))
+        self.assertEqual(sleeping.result(30), 0.5)
+        for job, res in zip(jobs, self.expected + [None] + self.expected[:10]):
+            self.assertTrue(job.wait_finished(30))
+            if res is not None:
+                self.assertEqual(job.result, res)
+        self.assertIsInstance(jobs[len(TEXTS)].future.exception(30),
+                              treetaggerwrapper.TreeTaggerError)
+        exchanges = self.poll.submit(exchanges_job).result(30)
+        self.assertLess(exchanges, 10)
+
+    @need_futures
+    def test_coalesced_isolation(self):
+        # Texts without final punctuation, first token tagging would use
+        # the end of previous text as context.
+        texts = ["hello {}".format(i) if i % 2 else "world {}".format(i) for i in range(30)]
+        expected = [self.tt.tag_text(t) for t in texts]
+        sleeping = self.poll.submit(sleeping_job, 0.5)
+        jobs = [self.poll.tag_text_async(t) for t in texts]
+        self.assertEqual(sleeping.result(30), 0.5)
+        for job, res in zip(jobs, expected):
+            self.assertTrue(job.wait_finished(30))
+            self.assertEqual(job.result, res)
+        self.assertLess(self.poll.submit(exchanges_job).result(30), len(texts))
+
+    @need_futures
+    @unittest.skipUnless(hasattr(signal, "SIGKILL"), "need SIGKILL")
+    def test_crash_recovery(self):
+        markerpath = path.join(tempfile.mkdtemp(), "crashed")
+        sleeping = self.poll.submit(sleeping_job, 0.5)
+        jobs = [self.poll.tag_text_async(t) for t in TEXTS[:5]]
+        crashing = self.poll.submit(crashing_job, markerpath)
+        jobs.extend(self.poll.tag_text_async(t) for t in TEXTS[5:10])
+        self.assertEqual(sleeping.result(30), 0.5)
+        self.assertEqual(crashing.result(30), "survived")
+        for job, res in zip(jobs, self.expected[:10]):
+            self.assertTrue(job.wait_finished(30))
+            self.assertEqual(job.result, res)
+        self.assertEqual(self.poll.metrics()['workers_crashed'], 1)
+        os.remove(markerpath)
+
+    @unittest.skipUnless(hasattr(signal, "SIGKILL"), "need SIGKILL")
+    @unittest.skipIf(treetaggerpoll.shared_memory is None or not path.isdir("/dev/shm"),
+                     "need multiprocessing.shared_memory in /dev/shm")
+    @need_futures
+    def test_crash_shared_memory(self):
+        segments = set(os.listdir("/dev/shm"))
+        poll = self.make_poll(shmthreshold=16)
+        try:
+            markerpath = path.join(tempfile.mkdtemp(), "crashed")
+            sleeping = poll.submit(sleeping_job, 0.5)
+            before = [poll.tag_text_async(t) for t in TEXTS[:5]]
+            crashing = poll.submit(crashing_job, markerpath)
+            after = [poll.tag_text_async(t) for t in TEXTS[5:10]]
+            self.assertEqual(sleeping.result(30), 0.5)
+            self.assertEqual(crashing.result(30), "survived")
+            # Texts consumed before the crash are lost, others are queued again.
+            for job in before:
+                self.assertIsInstance(job.future.exception(30), treetaggerwrapper.TreeTaggerError)
+            for job, res in zip(after, self.expected[5:10]):
+                self.assertTrue(job.wait_finished(30))
+                self.assertEqual(job.result, res)
+            os.remove(markerpath)
+        finally:
+            poll.stop_poll()
+        # Poll semaphores (sem.*) remain until the poll is released.
+        self.assertEqual(set(n for n in os.listdir("/dev/shm") if not n.startswith("sem."))
+                         - segments, set())
+
+    def test_budget(self):
+        self.assertEqual(treetaggerpoll.work_size((1, 'tag_text', (), {'text': "abc"})), 3)
+        q = treetaggerwrapper.queue.Queue()
+        for i in range(5):
+            q.put((i + 2, 'tag_text', (), {'text': "x" * 10}))
+        q.put(None)
+        messages = [(1, 'tag_text', (), {'text': "x" * 10})]
+        self.assertFalse(treetaggerpoll.drain_works(q, messages, 10, maxbytes=25))
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(treetaggerpoll.drain_works(q, messages, 10))
+        self.assertEqual(len(messages), 6)
+
+
+class CorpusTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.files = []
+        for i, text in enumerate([TEXTS[0] * 50] + TEXTS[1:8]):
+            fpath = path.join(self.tmpdir, "doc{}.txt".format(i))
+            with open(fpath, "w") as f:
+                f.write(text)
+            self.files.append(fpath)
+        tt = treetaggerwrapper.TreeTagger(TAGLANG='en')
+        self.expected = dict((f, "\n".join(tt.tag_file(f))) for f in self.files)
+        self.poll = treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en')
+
+    def tearDown(self):
+        self.poll.stop_poll()
+        shutil.rmtree(self.tmpdir)
+
+    def test_tag_corpus(self):
+        # First file is alone, others are sent by packs of 3.
+        stats = treetaggerpoll.tag_corpus(self.poll, self.files, packbytes=1000, packfiles=3)
+        self.assertEqual(stats['files'], 8)
+        self.assertEqual(stats['failed'], 0)
+        self.assertGreater(stats['tokens'], 0)
+        for f in self.files:
+            with open(f + ".ttr") as fres:
+                self.assertEqual(fres.read(), self.expected[f])
+
+    @need_futures
+    def test_coalesced_packs(self):
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=1, TAGLANG='en', coalescejobs=64)
+        try:
+            stats = treetaggerpoll.tag_corpus(poll, self.files, packbytes=1000)
+            self.assertEqual(stats['failed'], 0)
+            # The big file, then all small ones at once.
+            self.assertEqual(poll.submit(exchanges_job).result(30), 2)
+        finally:
+            poll.stop_poll()
+        for f in self.files:
+            with open(f + ".ttr") as fres:
+                self.assertEqual(fres.read(), self.expected[f])
+
+    def test_main_store(self):
+        storepath = path.join(self.tmpdir, "corpus.ttb")
+        self.assertEqual(treetaggerwrapper.main("-l", "en", "-j", "2", "--store", storepath,
+                                                *self.files), 0)
+        self.assertFalse(path.exists(storepath + ".tmp"))
+        with treetaggerstore.TaggedStore(storepath) as store:
+            docs = dict((doc.name, "\n".join("\t".join(tag) for tag in doc))
+                        for doc in store)
+        self.assertEqual(docs, self.expected)
+
+    def test_failed_file(self):
+        with open(self.files[1], "wb") as f:
+            f.write(b"\xff\xfe bad utf-8")
+        stats = treetaggerpoll.tag_corpus(self.poll, self.files, packbytes=1000)
+        self.assertEqual(stats['failed'], 1)
+        self.assertFalse(path.exists(self.files[1] + ".ttr"))
+        self.assertTrue(path.exists(self.files[2] + ".ttr"))
+
+    def test_missing_file(self):
+        os.remove(self.files[3])
+        done = {}
+        stats = treetaggerpoll.tag_corpus(self.poll, self.files, packbytes=1000,
+                                          filedone=done.__setitem__)
+        self.assertEqual(stats['files'], 8)
+        self.assertEqual(stats['failed'], 1)
+        self.assertIsInstance(done.pop(self.files[3]), OSError)
+        self.assertEqual(set(done.values()), set([None]))
+        for f in self.files[:3] + self.files[4:]:
+            with open(f + ".ttr") as fres:
+                self.assertEqual(fres.read(), self.expected[f])
+        self.assertFalse([f for f in os.listdir(self.tmpdir) if f.endswith(".tmp")])
+
+    def test_write_failure(self):
+        # A directory in place of the result file, it cannot be replaced.
+        os.mkdir(self.files[2] + ".ttr")
+        with open(path.join(self.files[2] + ".ttr", "keep"), "w"):
+            pass
+        done = {}
+        stats = treetaggerpoll.tag_corpus(self.poll, self.files, packbytes=1000,
+                                          filedone=done.__setitem__)
+        self.assertEqual(stats['failed'], 1)
+        self.assertIsInstance(done.pop(self.files[2]), OSError)
+        self.assertEqual(set(done.values()), set([None]))
+        self.assertTrue(path.exists(self.files[3] + ".ttr"))
+        self.assertFalse([f for f in os.listdir(self.tmpdir) if f.endswith(".tmp")])
+
+
+@unittest.skipIf(treetaggerpoll.shared_memory is None, "need multiprocessing.shared_memory")
+class SharedMemoryPollTests(PollTestsMixin, unittest.TestCase):
+    def make_poll(self, **kwargs):
+        # Small threshold, all texts and results go via shared memory.
+        return treetaggerpoll.TaggerProcessPoll(workerscount=2, TAGLANG='en',
+                                                shmthreshold=16, **kwargs)
+
+    def test_large_text(self):
+        text = "Here is a longer text, with more words. " * 5000
+        job = self.poll.tag_text_async(text)
+        self.assertTrue(job.wait_finished(30))
+        self.assertEqual(job.result, self.tt.tag_text(text))
+
+    def test_payload_cleanup(self):
+        payload = treetaggerpoll.shm_put("héhé\nho".encode("utf-8"), "lines")
+        self.assertEqual(treetaggerpoll.shm_get(payload), ["héhé", "ho"])
+        self.assertRaises(FileNotFoundError, treetaggerpoll.shm_get, payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
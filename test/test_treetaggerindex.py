@@ -0,0 +1,135 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""TreeTagger Python wrapper test module for inverted index of tagged texts.
+
+These tests don't need TreeTagger (they work on tagger output strings).
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+# Setup parent directory in sys.path.
+import sys
+from os import path
+
+thedir = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, thedir)
+
+# Now, import the module to test
+import treetaggerwrapper
+import treetaggerstore
+import treetaggerindex
+from treetaggerindex import Hit
+
+
+DOC1 = ['The\tDT\tthe',
+        'house\tNN\thouse',
+        'is\tVBZ\tbe',
+        'big\tJJ\tbig',
+        '<repdns text="www.truc.com" />',
+        '.\tSENT\t.']
+DOC2 = ['They\tPP\tthey',
+        'house\tVVP\thouse',
+        'people\tNNS\tpeople',
+        '.\tSENT\t.']
+DOC3 = ['Houses\tNNS\thouse',
+        'are\tVBP\tbe',
+        'big\tJJ\tbig',
+        '.\tSENT\t.']
+
+
+class IndexQueries(unittest.TestCase):
+    """Build an index and query it."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.indexpath = os.path.join(self.tmpdir, "test.tti")
+        with treetaggerindex.IndexWriter(self.indexpath) as w:
+            w.add_document("doc1", DOC1)
+            w.add_document("doc2", treetaggerwrapper.make_tags(DOC2))
+            ttrpath = os.path.join(self.tmpdir, "doc3.ttr")
+            with open(ttrpath, "w") as f:
+                f.write("\n".join(DOC3))
+            w.add_ttr_file(ttrpath, name="doc3")
+        self.index = treetaggerindex.TagIndex(self.indexpath)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_search(self):
+        idx = self.index
+        self.assertEqual(idx.names, ["doc1", "doc2", "doc3"])
+        self.assertEqual(idx.ntokens, 13)     # SGML line not indexed.
+        self.assertEqual(idx.search(lemma="house"), [Hit(0, 1), Hit(1, 1), Hit(2, 0)])
+        self.assertEqual(idx.search(lemma="house", pos="NN"), [Hit(0, 1)])
+        self.assertEqual(idx.search(word="big", pos="JJ"), [Hit(0, 3), Hit(2, 2)])
+        self.assertEqual(idx.search(lemma="unknown"), [])
+        self.assertEqual(idx.count("pos", "SENT"), 3)
+
+    def test_search_intersection(self):
+        # Many documents so that postings intersection seeks over long lists.
+        indexpath = os.path.join(self.tmpdir, "big.tti")
+        docs = []
+        with treetaggerindex.IndexWriter(indexpath) as w:
+            for i in range(200):
+                doc = [DOC1, DOC2, DOC3][i % 3]
+                if i % 7 == 0:
+                    doc = doc + ['house\tNN\thouse']
+                docs.append(doc)
+                w.add_document("doc%d" % i, doc)
+        expected = [Hit(d, p) for d, doc in enumerate(docs)
+                    for p, tag in enumerate(t for t in doc if '\t' in t)
+                    if tag.split('\t')[1:] == ['NN', 'house']]
+        with treetaggerindex.TagIndex(indexpath) as idx:
+            self.assertEqual(idx.search(lemma="house", pos="NN"), expected)
+            self.assertEqual(idx.search(word="house", pos="NN", lemma="house"), expected)
+            self.assertEqual(idx.search(pos="SENT", lemma="house"), [])
+
+    def test_documents(self):
+        idx = self.index
+        self.assertEqual(idx.documents(dict(lemma="house"), dict(lemma="be")), [0, 2])
+        self.assertEqual(idx.documents(dict(lemma="house", pos="VVP")), [1])
+        self.assertEqual(idx.documents(dict(lemma="house"), dict(word="nothing")), [])
+
+    def test_concordance(self):
+        idx = self.index
+        lines = idx.concordance(idx.search(lemma="big"), width=2)
+        self.assertEqual(lines[0], treetaggerindex.Concordance("doc1", 3, "house is", "big", "."))
+        self.assertEqual(lines[1], treetaggerindex.Concordance("doc3", 2, "Houses are", "big", "."))
+
+    def test_from_store(self):
+        storepath = os.path.join(self.tmpdir, "test.ttb")
+        indexpath = os.path.join(self.tmpdir, "test2.tti")
+        with treetaggerstore.StoreWriter(storepath) as w:
+            w.add_document("doc1", DOC1)
+        with treetaggerstore.TaggedStore(storepath) as store:
+            with treetaggerindex.IndexWriter(indexpath) as w:
+                w.add_store(store)
+        with treetaggerindex.TagIndex(indexpath) as idx:
+            self.assertEqual(idx.search(lemma="house", pos="NN"), [Hit(0, 1)])
+
+    def test_truncated_file(self):
+        with open(self.indexpath, "rb") as f:
+            data = f.read()
+        # Last bytes are padding after documents names.
+        cutpath = os.path.join(self.tmpdir, "cut.tti")
+        for size in (0, 10, len(data) // 2, len(data) - 8):
+            with open(cutpath, "wb") as f:
+                f.write(data[:size])
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                with self.assertRaises(treetaggerwrapper.TreeTaggerError):
+                    treetaggerindex.TagIndex(cutpath)
+                gc.collect()
+            self.assertEqual([w for w in caught if w.category is ResourceWarning], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
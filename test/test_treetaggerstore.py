@@ -0,0 +1,117 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""TreeTagger Python wrapper test module for binary store of tagged texts.
+
+These tests don't need TreeTagger (they work on tagger output strings).
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+# Setup parent directory in sys.path.
+import sys
+from os import path
+
+thedir = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, thedir)
+
+# Now, import the module to test
+import treetaggerwrapper
+import treetaggerstore
+from treetaggerwrapper import Tag, NotTag
+
+
+DOC1 = ['<ttpw:line num="1" />',
+        'Hello\tUH\tHello',
+        ',\t,\t,',
+        'Mr\tNP\tMr',
+        'Young\tNP\tYoung',
+        '.\tSENT\t.',
+        'Bye\tUH\tbye',
+        '.\tSENT\t.']
+DOC2 = ['Voici\tADV voici 1.000000',
+        '.\tSENT\t.']
+
+
+class StoreWriteRead(unittest.TestCase):
+    """Write a store and read it back."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storepath = os.path.join(self.tmpdir, "test.ttb")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_store(self):
+        with treetaggerstore.StoreWriter(self.storepath) as w:
+            self.assertEqual(w.add_document("doc1", DOC1), 0)
+            self.assertEqual(w.add_document("doc2", treetaggerwrapper.make_tags(DOC2, allow_extra=True)), 1)
+            ttrpath = os.path.join(self.tmpdir, "doc3.ttr")
+            with open(ttrpath, "w") as f:
+                f.write("\n".join(DOC1))
+            self.assertEqual(w.add_ttr_file(ttrpath, name="doc3"), 2)
+
+    def test_roundtrip(self):
+        self.write_store()
+        with treetaggerstore.TaggedStore(self.storepath) as store:
+            self.assertEqual(len(store), 3)
+            self.assertEqual(store.names, ["doc1", "doc2", "doc3"])
+            self.assertEqual(store.ntokens, 18)
+            doc = store.document("doc1")
+            self.assertEqual(list(doc), treetaggerwrapper.make_tags(DOC1))
+            self.assertEqual(doc[-1], Tag('.', 'SENT', '.'))
+            self.assertEqual(list(store.document(2)), list(doc))
+            # Extra informations are not stored.
+            self.assertEqual(list(store.document(1)), [Tag('Voici', 'ADV', 'voici'),
+                                                       Tag('.', 'SENT', '.')])
+
+    def test_sentences(self):
+        self.write_store()
+        with treetaggerstore.TaggedStore(self.storepath) as store:
+            doc = store.document(0)
+            self.assertEqual(doc.sentences_spans(), [(0, 6), (6, 8)])
+            sentences = doc.sentences()
+            self.assertEqual(sentences[0][0], NotTag('<ttpw:line num="1" />'))
+            self.assertEqual([t.word for t in sentences[1]], ['Bye', '.'])
+
+    def test_codes(self):
+        self.write_store()
+        with treetaggerstore.TaggedStore(self.storepath) as store:
+            doc = store.document(0)
+            codes = doc.codes
+            self.assertEqual(len(codes), 3 * len(doc))
+            tags = [store.tag(*codes[i:i + 3]) for i in range(0, len(codes), 3)]
+            codes.release()
+            self.assertEqual(tags, list(doc))
+
+    def test_bad_file(self):
+        with open(self.storepath, "wb") as f:
+            f.write(b"\0" * 100)
+        with self.assertRaises(treetaggerwrapper.TreeTaggerError):
+            treetaggerstore.TaggedStore(self.storepath)
+
+    def test_truncated_file(self):
+        self.write_store()
+        with open(self.storepath, "rb") as f:
+            data = f.read()
+        for size in range(len(data)):
+            with open(self.storepath, "wb") as f:
+                f.write(data[:size])
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                with self.assertRaises(treetaggerwrapper.TreeTaggerError):
+                    treetaggerstore.TaggedStore(self.storepath)
+                gc.collect()
+            # The file is closed even when the store cannot be read.
+            self.assertEqual([w for w in caught if w.category is ResourceWarning], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
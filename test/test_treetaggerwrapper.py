@@ -13,7 +13,10 @@ import unittest
 # from test import test_support
 
 # Setup parent directory in sys.path.
+import os
+import shutil
 import sys
+import tempfile
 from os import path
 
 thedir = path.dirname(path.dirname(path.abspath(__file__)))
@@ -94,11 +97,283 @@ class EnglishProcessing(TextPreprocessing):
         self._sample_and_res = ENGLISH_TESTS
 
 
+class ProbsParsing(unittest.TestCase):
+    """Parse TreeTagger output with probabilities (no tagger needed)."""
+
+    def test_make_probs(self):
+        res = treetaggerwrapper.make_probs(PROBS_OUTPUT)
+        self.assertEqual(res[0], treetaggerwrapper.TagProbs('Voici', [('ADV', 'voici', 1.0)]))
+        self.assertEqual(res[1].candidates, [('PRP', 'pour', 0.663202),
+                                             ('ADV', 'pour', 0.336798)])
+        self.assertEqual(res[2], treetaggerwrapper.NotTag('<repdns text="a.b" />'))
+        res = treetaggerwrapper.make_probs(PROBS_OUTPUT, exclude_nottags=True)
+        self.assertEqual([x.word for x in res], ['Voici', 'pour', '.'])
+
+    def test_make_probs_nolemma(self):
+        res = treetaggerwrapper.make_probs(['pour\tPRP 0.6 ADV 0.4'], lemma=False)
+        self.assertEqual(res[0].candidates, [('PRP', None, 0.6), ('ADV', None, 0.4)])
+
+    def test_make_probs_arrays(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy not available")
+        res = treetaggerwrapper.make_probs_arrays(PROBS_OUTPUT + ['bad\tNN bad xx'])
+        self.assertEqual(res.words, ['Voici', 'pour', '<repdns text="a.b" />', '.',
+                                     'bad\tNN bad xx'])
+        self.assertEqual(list(res.offsets), [0, 1, 3, 3, 4, 4])
+        self.assertEqual(list(res.pos), ['ADV', 'PRP', 'ADV', 'SENT'])
+        self.assertEqual(list(res.lemmas), ['voici', 'pour', 'pour', '.'])
+        self.assertEqual(list(res.probs), [1.0, 0.663202, 0.336798, 1.0])
+
+
+class ResultCaching(unittest.TestCase):
+    """Tag texts with a results cache."""
+    TEXT = "This is a text to tag, and another sentence to tag."
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachepath = path.join(self.tmpdir, "tags.cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hits(self):
+        tt = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGCACHE=self.cachepath)
+        res = tt.tag_text(self.TEXT)
+        self.assertEqual(tt.tag_text(self.TEXT), res)
+        self.assertEqual(tt.tag_text(self.TEXT, numlines=True),
+                         treetaggerwrapper.TreeTagger(TAGLANG="en").tag_text(self.TEXT, numlines=True))
+        self.assertEqual(tt.tag_text(""), [])
+        self.assertEqual(tt.tag_text(""), [])
+        stats = tt.tagcache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 3, 3))
+        # Cache is persistent.
+        tt2 = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGCACHE=self.cachepath)
+        self.assertEqual(tt2.tag_text(self.TEXT), res)
+        self.assertEqual(tt2.tagcache.stats()['hits'], 1)
+
+    def test_keys(self):
+        tt = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGCACHE=self.cachepath)
+        key = tt.cache_key(self.TEXT, {})
+        self.assertEqual(tt.cache_key([self.TEXT], {'numlines': False}), key)
+        self.assertNotEqual(tt.cache_key(self.TEXT + " ", {}), key)
+        self.assertNotEqual(tt.cache_key(self.TEXT, {'notagurl': True}), key)
+        self.assertIsNone(tt.cache_key(b"binary", {}))
+        tt2 = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGCACHE=tt.tagcache,
+                                           TAGOPT="-token -lemma -sgml")
+        self.assertNotEqual(tt2.cache_key(self.TEXT, {}), key)
+        # A modified parameter file.
+        parfile = path.join(self.tmpdir, "english.par")
+        shutil.copy(tt.tagparfile, parfile)
+        tt3 = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGCACHE=tt.tagcache,
+                                           TAGPARFILE=parfile)
+        self.assertEqual(tt3.cache_key(self.TEXT, {}), key)
+        with open(parfile, "ab") as f:
+            f.write(b"\0")
+        os.utime(parfile, (0, 0))
+        self.assertNotEqual(tt3.cache_key(self.TEXT, {}), key)
+
+    def test_eviction(self):
+        cache = treetaggerwrapper.ResultCache(self.cachepath, maxsize=2000)
+        for i in range(100):
+            cache.put("key%d" % i, ["line {} of result {}".format(j, i * i) for j in range(10)])
+            # Keep first entry recently used.
+            self.assertIsNotNone(cache.get("key0"))
+        stats = cache.stats()
+        self.assertGreater(stats['evictions'], 0)
+        self.assertLessEqual(stats['size'], 2000)
+        self.assertEqual(stats['entries'], 100 - stats['evictions'])
+        self.assertIsNotNone(cache.get("key99"))
+        self.assertIsNotNone(cache.get("key0"))
+        self.assertIsNone(cache.get("key1"))
+        cache.clear()
+        self.assertEqual(cache.stats()['entries'], 0)
+        cache.close()
+
+
+class SentenceCaching(unittest.TestCase):
+    """Tag texts with a sentences cache."""
+    BOILERPLATE = "We use cookies to improve your experience. All rights reserved."
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.plain = treetaggerwrapper.TreeTagger(TAGLANG="en")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_repeated_sentences(self):
+        cache = treetaggerwrapper.SentenceCache(memsize=100)
+        tt = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGSENTCACHE=cache)
+        text1 = "A first article about cats. " + self.BOILERPLATE
+        text2 = "Another one, about dogs! " + self.BOILERPLATE + " " + self.BOILERPLATE
+        self.assertEqual(tt.tag_text(text1), self.plain.tag_text(text1))
+        tokens = tt._tagtokens
+        self.assertEqual(tt.tag_text(text2), self.plain.tag_text(text2))
+        # Only the new sentence was sent to TreeTagger.
+        self.assertEqual(tt._tagtokens - tokens,
+                         len(self.plain.tag_text("Another one, about dogs!")))
+        stats = cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['misses']), (4, 4))
+        self.assertEqual(stats['memory_entries'], 4)
+        self.assertIsNone(stats['disk'])
+        self.assertEqual(tt.tag_text(""), [])
+
+    def test_tiers(self):
+        cachepath = path.join(self.tmpdir, "sentences.cache")
+        cache = treetaggerwrapper.SentenceCache(memsize=1, path=cachepath)
+        tt = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGSENTCACHE=cache)
+        text = "One sentence. " + self.BOILERPLATE
+        res = tt.tag_text(text)
+        self.assertEqual(cache.stats()['memory_evictions'], 2)
+        self.assertEqual(tt.tag_text(text), res)
+        stats = cache.stats()
+        # Last sentence is still in memory.
+        self.assertEqual((stats['memory_hits'], stats['disk_hits']), (1, 2))
+        self.assertEqual(stats['disk']['entries'], 3)
+        # Disk tier is persistent.
+        tt2 = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGSENTCACHE=cachepath)
+        self.assertEqual(tt2.tag_text(text), res)
+        self.assertEqual(tt2.sentcache.stats()['disk_hits'], 3)
+
+
+class FileTagging(unittest.TestCase):
+    """Tag files by blocks of paragraphs."""
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.inpath = path.join(self.tmpdir, "big.txt")
+        self.outpath = self.inpath + ".ttr"
+        # Several blocks of STREAM_BLOCKSIZE.
+        self.text = "\n".join("Paragraph {}, with one sentence.\nAnd another one!\n".format(i)
+                              for i in range(6000))
+        with open(self.inpath, "w") as f:
+            f.write(self.text)
+        self.tt = treetaggerwrapper.TreeTagger(TAGLANG="en")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_blocks(self):
+        self.assertGreater(len(self.text), 3 * treetaggerwrapper.STREAM_BLOCKSIZE)
+        for options in ({}, {'numlines': True}, {'prepronly': True}):
+            expected = self.tt.tag_text(self.text, **options)
+            self.assertEqual(self.tt.tag_file(self.inpath, **options), expected)
+            self.tt.tag_file_to(self.inpath, self.outpath, **options)
+            with open(self.outpath) as f:
+                self.assertEqual(f.read(), "\n".join(expected))
+
+    def test_form_feeds(self):
+        # Form feeds are lines ends for text preparation, line numbers must
+        # stay right after the first block.
+        text = "\n".join("Page {}, with one sentence.\fAnd another one!\n".format(i)
+                         for i in range(6000))
+        with open(self.inpath, "w") as f:
+            f.write(text)
+        for options in ({'numlines': True}, {'numlines': True, 'prepronly': True}):
+            self.assertEqual(self.tt.tag_file(self.inpath, **options),
+                             self.tt.tag_text(text, **options))
+
+    def test_empty_and_failed(self):
+        with open(self.inpath, "w") as f:
+            f.write("")
+        self.assertEqual(self.tt.tag_file(self.inpath), self.tt.tag_text(""))
+        self.tt.tag_file_to(self.inpath, self.outpath)
+        with open(self.inpath, "wb") as f:
+            f.write(b"Valid line.\n\xff\xfe bad utf-8")
+        self.assertRaises(UnicodeDecodeError, self.tt.tag_file_to, self.inpath, self.outpath)
+        # Previous result is kept.
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["big.txt", "big.txt.ttr"])
+
+
+class CorpusManifests(unittest.TestCase):
+    """Incremental command line runs over files."""
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manifestpath = path.join(self.tmpdir, "run.manifest")
+        self.files = []
+        for i in range(4):
+            fpath = path.join(self.tmpdir, "doc{}.txt".format(i))
+            with open(fpath, "w") as f:
+                f.write("This is document number {}.".format(i))
+            self.files.append(fpath)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_main(self, *args):
+        return treetaggerwrapper.main("-l", "en", "--manifest", self.manifestpath,
+                                      *(args + (path.join(self.tmpdir, "*.txt"),)))
+
+    def test_skip_unchanged(self):
+        self.assertEqual(self.run_main(), 0)
+        for f in self.files[:3]:
+            os.utime(f + ".ttr", (0, 0))
+        os.remove(self.files[3] + ".ttr")
+        with open(self.files[1], "w") as f:
+            f.write("This document changed.")
+        self.assertEqual(self.run_main(), 0)
+        mtimes = [os.stat(f + ".ttr").st_mtime for f in self.files]
+        # Unchanged files are not tagged again, changed and missing ones are.
+        self.assertEqual(mtimes[0], 0)
+        self.assertEqual(mtimes[2], 0)
+        self.assertNotEqual(mtimes[1], 0)
+        self.assertNotEqual(mtimes[3], 0)
+        # Other options, all files are tagged again.
+        self.assertEqual(self.run_main("--numlines"), 0)
+        self.assertNotEqual(os.stat(self.files[0] + ".ttr").st_mtime, 0)
+
+    def test_resume(self):
+        manifest = treetaggerwrapper.CorpusManifest(self.manifestpath, {'a': 1})
+        manifest.record(self.files[0])
+        manifest.record(self.files[1], ValueError("bad"))
+        manifest.close()
+        with open(self.manifestpath, "a") as f:
+            f.write('{"path": "interrupted')
+        manifest = treetaggerwrapper.CorpusManifest(self.manifestpath, {'a': 1}, usehash=True)
+        # Entries without hash are not up to date when comparing hashes.
+        self.assertFalse(manifest.uptodate(self.files[0]))
+        manifest.close()
+        manifest = treetaggerwrapper.CorpusManifest(self.manifestpath, {'a': 1})
+        self.assertTrue(manifest.uptodate(self.files[0]))
+        self.assertFalse(manifest.uptodate(self.files[0], self.files[0] + ".ttr"))
+        self.assertFalse(manifest.uptodate(self.files[1]))
+        self.assertFalse(manifest.uptodate(self.files[2]))
+        manifest.close()
+        with open(self.manifestpath) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_removed_file(self):
+        manifest = treetaggerwrapper.CorpusManifest(self.manifestpath, {'a': 1})
+        os.remove(self.files[0])
+        # File removed during the run is not recorded (and not an error).
+        manifest.record(self.files[0])
+        manifest.record(self.files[1])
+        # Nor checked.
+        self.assertFalse(manifest.uptodate(self.files[0]))
+        self.assertTrue(manifest.uptodate(self.files[1]))
+        manifest.close()
+        with open(self.manifestpath) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_shards(self):
+        files = ["corpus/doc{}.txt".format(i) for i in range(100)]
+        shards = [treetaggerwrapper.shard_files(files, i, 3) for i in (1, 2, 3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(files))
+        self.assertTrue(all(shards))
+        self.assertEqual(treetaggerwrapper.shard_files(files, 2, 3), shards[1])
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(TTStartTestCase('test_start_tagger'))
     suite.addTest(EnglishPreprocessing())
     suite.addTest(EnglishProcessing())
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ProbsParsing))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ResultCaching))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(SentenceCaching))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(FileTagging))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CorpusManifests))
     return suite
 
 
@@ -111,6 +386,12 @@ def test_main():
     # )
 
 
+# TreeTagger output with -threshold option.
+PROBS_OUTPUT = ['Voici\tADV voici 1.000000',
+                'pour\tPRP pour 0.663202 ADV pour 0.336798',
+                '<repdns text="a.b" />',
+                '.\tSENT . 1.000000']
+
 # Each set of test strings must include three parts:
 # 1) input sentence
 # 2) attended chunking
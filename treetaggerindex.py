@@ -0,0 +1,502 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Searching tagged texts (ex. all documents where a lemma appears with
+a given POS) by scanning all ``.ttr`` files is slow as soon as a corpus
+contains many documents.
+
+The :mod:`treetaggerindex` module builds an on-disk inverted index of tagged
+documents with its :class:`IndexWriter` class: for each word, POS and lemma,
+the list of documents and positions where it appears.
+The :class:`TagIndex` class memory-maps this index and provides queries on
+tokens (conjunction of word/pos/lemma on the same token), on documents
+(conjunction of several token queries), and KWIC concordance lines.
+
+Building an index::
+
+    import treetaggerwrapper
+    import treetaggerindex
+
+    tagger = treetaggerwrapper.TreeTagger(TAGLANG="en")
+    with treetaggerindex.IndexWriter("corpus.tti") as idx:
+        idx.add_document("inline", tagger.tag_text("This is a text."))
+        idx.add_ttr_file("a.txt.ttr")       # Already tagged files.
+
+Querying it::
+
+    idx = treetaggerindex.TagIndex("corpus.tti")
+    # Tokens where lemma "house" is tagged NN.
+    hits = idx.search(lemma="house", pos="NN")
+    # Documents containing both tokens.
+    docs = idx.documents(dict(lemma="house", pos="NN"), dict(lemma="be"))
+    for line in idx.concordance(hits[:10], width=5):
+        print(line.name, line.left, "[", line.keyword, "]", line.right)
+    idx.close()
+
+Positions are indexes of tags within their document, tagger output lines
+which are not tags (ex. SGML tags) are not indexed.
+
+.. note:: Postings are accumulated in memory until the index is closed
+    (about 24 bytes by token), for very large corpora you may build several
+    indexes.
+
+.. note:: This module requires Python 3 (it uses memoryview casts).
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import array
+import collections
+import io
+import logging
+import mmap
+import struct
+import sys
+
+import six
+
+import treetaggerwrapper
+from treetaggerwrapper import TreeTaggerError, NotTag
+from treetaggerstore import _pad8, _write_array, _write_strings, _read_strings, \
+    _check_section
+
+
+# We don't print for errors/warnings, we use Python logging system.
+logger = logging.getLogger("TreeTagger.Index")
+# Avoid No handlers could be found for logger "TreeTagger" message.
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['IndexWriter', 'TagIndex', 'Hit', 'Concordance']
+
+# Extension for index files (TreeTagger index => tti).
+INDEXEXT = "tti"
+
+INDEX_MAGIC = b"TTPWIDX1"
+INDEX_VERSION = 1
+# magic, version, flags, ntokens, ndocs, fieldsoffset, docsoffset
+INDEX_HEADER = struct.Struct("<8sIIQQQQ")
+
+# Indexed fields, in their storage order.
+FIELDS = ("word", "pos", "lemma")
+
+Hit = collections.namedtuple("Hit", "doc position")
+"""
+A named tuple for a token found by :meth:`TagIndex.search`, with document
+index and tag position in the document.
+"""
+
+Concordance = collections.namedtuple("Concordance", "name position left keyword right")
+"""
+A named tuple for a KWIC line built by :meth:`TagIndex.concordance`.
+"""
+
+
+# ==============================================================================
+class IndexWriter(object):
+    """Build an inverted index of tagged documents.
+
+    Words codes of each document are written as documents are added (they
+    are used to build concordance lines), postings are written when the
+    index is closed.
+    """
+    def __init__(self, path):
+        """Creation of a new index file.
+
+        :param path: pathname of the index file to write (overwritten if it
+            exists).
+        :type path: str
+        """
+        if sys.byteorder != "little":
+            raise TreeTaggerError("Tags index only supported on little-endian platforms.")
+        self.path = path
+        self._file = io.open(path, "wb")
+        self._file.write(b"\0" * INDEX_HEADER.size)
+        # For each field: dict term => code, and list of postings arrays.
+        self._vocabs = [{}, {}, {}]
+        self._postings = [[], [], []]
+        self._names = []
+        self._docoffsets = array.array('Q', [0])
+        self._ntokens = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_document(self, name, tags):
+        """Add a tagged document to the index.
+
+        :param name: document name (ex. source file path).
+        :type name: str
+        :param tags: tagger output lines (as returned by
+            :meth:`treetaggerwrapper.TreeTagger.tag_text`), or ``Tag``
+            / ``NotTag`` named tuples (as returned by
+            :func:`treetaggerwrapper.make_tags`).
+        :return: index of the document.
+        :rtype: int
+        """
+        if self._file is None:
+            raise TreeTaggerError("IndexWriter is closed.")
+        docid = len(self._names)
+        vocabs = self._vocabs
+        postings = self._postings
+        wordcodes = array.array('I')
+        position = 0
+        for tag in tags:
+            if isinstance(tag, six.string_types):
+                items = tag.split('\t')
+                if len(items) != 3:
+                    items = treetaggerwrapper.make_tags([tag], allow_extra=True)[0]
+            else:
+                items = tag
+            if isinstance(items, NotTag):
+                continue
+            for field in range(3):
+                term = items[field]
+                vocab = vocabs[field]
+                code = vocab.get(term)
+                if code is None:
+                    code = vocab[term] = len(vocab)
+                    postings[field].append(array.array('I'))
+                plist = postings[field][code]
+                plist.append(docid)
+                plist.append(position)
+                if field == 0:
+                    wordcodes.append(code)
+            position += 1
+        _write_array(self._file, wordcodes)
+        self._ntokens += position
+        self._names.append(name)
+        self._docoffsets.append(self._ntokens)
+        return docid
+
+    def add_ttr_file(self, path, encoding=treetaggerwrapper.USER_ENCODING, name=None):
+        """Add a document from a tagger output text file (ex. ``.ttr`` file).
+
+        :param path: pathname of the file to read.
+        :type path: str
+        :param encoding: encoding of the file, default to utf-8.
+        :type encoding: str
+        :param name: document name, default to the file path.
+        :type name: str
+        :return: index of the document.
+        :rtype: int
+        """
+        with io.open(path, "r", encoding=encoding) as f:
+            lines = [line.rstrip("\n") for line in f]
+        return self.add_document(path if name is None else name,
+                                 [line for line in lines if line])
+
+    def add_store(self, store):
+        """Add all documents of a :class:`treetaggerstore.TaggedStore`.
+
+        :param store: the opened store.
+        :type store: :class:`treetaggerstore.TaggedStore`
+        """
+        for doc in store:
+            self.add_document(doc.name, doc)
+
+    def close(self):
+        """Write vocabularies and postings, and close the index file.
+        """
+        if self._file is None:
+            return
+        f = self._file
+        fieldsoffset = _pad8(f)
+        for vocab, postings in zip(self._vocabs, self._postings):
+            strings = [None] * len(vocab)
+            for term, code in six.iteritems(vocab):
+                strings[code] = term
+            _write_strings(f, strings)
+            # Offsets are in count of (doc, position) pairs.
+            offsets = array.array('Q', [0])
+            total = 0
+            for plist in postings:
+                total += len(plist) // 2
+                offsets.append(total)
+            _write_array(f, offsets)
+            for plist in postings:
+                _write_array(f, plist)
+            _pad8(f)
+        docsoffset = f.tell()
+        _write_array(f, self._docoffsets)
+        _write_strings(f, self._names)
+        f.seek(0)
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, self._ntokens,
+                                  len(self._names), fieldsoffset, docsoffset))
+        f.close()
+        self._file = None
+        self._vocabs = self._postings = None
+        logger.info("Index %s written: %d documents, %d tokens.", self.path,
+                    len(self._names), self._ntokens)
+
+
+# ==============================================================================
+def _seek_posting(plist, count, key, lo):
+    """Find the first occurrence at or after ``lo`` in a postings list which
+    is not before ``key``.
+
+    Galloping search: steps are doubled until an occurrence after ``key``
+    is found, then a binary search is done within the last step, so seeking
+    near occurrences is cheap.
+
+    :param plist: flat postings list (document index, tag position).
+    :param int count: number of occurrences in the list.
+    :param int key: searched ``(doc << 32) | position`` value.
+    :param int lo: index of the occurrence to start from.
+    :return: index of found occurrence, ``count`` if all are before ``key``.
+    :rtype: int
+    """
+    hi = lo
+    step = 1
+    while hi < count and (plist[hi * 2] << 32) | plist[hi * 2 + 1] < key:
+        lo = hi + 1
+        hi += step
+        step *= 2
+    hi = min(hi, count)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (plist[mid * 2] << 32) | plist[mid * 2 + 1] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+# ==============================================================================
+class TagIndex(object):
+    """Query an inverted index built by :class:`IndexWriter`.
+
+    The file is memory-mapped, postings lists are read without copy.
+    Vocabularies are read when opening the index.
+
+    :ivar names: documents names.
+    """
+    def __init__(self, path):
+        """Open an index file.
+
+        :param path: pathname of the index file.
+        :type path: str
+        """
+        if sys.byteorder != "little":
+            # Sections are read as native integers.
+            raise TreeTaggerError("Tags index only supported on little-endian platforms.")
+        self.path = path
+        self._file = io.open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            _check_section(self._mmap, 0, INDEX_HEADER.size)
+            (magic, version, flags, self._ntokens, ndocs, fieldsoffset,
+             docsoffset) = INDEX_HEADER.unpack_from(self._mmap, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                self.close()
+                logger.error("Not a tags index file (or bad version): %s", path)
+                raise TreeTaggerError("Not a tags index file (or bad version): " + path)
+
+            # Sections are checked before building views, a failure must not
+            # leave an exported view of the mapping.
+            buf = self._mmap
+            start = INDEX_HEADER.size
+            _check_section(buf, start, self._ntokens * 4)
+            view = self._view = memoryview(buf)
+            self._words = view[start:start + self._ntokens * 4].cast('I')
+            self._terms = {}
+            self._vocabs = {}
+            self._offsets = {}
+            self._postings = {}
+            offset = fieldsoffset
+            for field in FIELDS:
+                strings, offset = _read_strings(buf, offset)
+                count = len(strings)
+                self._vocabs[field] = strings
+                self._terms[field] = dict((s, i) for i, s in enumerate(strings))
+                _check_section(buf, offset, (count + 1) * 8)
+                self._offsets[field] = view[offset:offset + (count + 1) * 8].cast('Q')
+                offset += (count + 1) * 8
+                total = self._offsets[field][count]
+                _check_section(buf, offset, total * 8)
+                self._postings[field] = view[offset:offset + total * 8].cast('I')
+                offset += total * 8
+                if offset % 8:
+                    offset += 8 - offset % 8
+            _check_section(buf, docsoffset, (ndocs + 1) * 8)
+            self._docoffsets = view[docsoffset:docsoffset + (ndocs + 1) * 8].cast('Q')
+            self.names, _ = _read_strings(buf, docsoffset + (ndocs + 1) * 8)
+        except (ValueError, struct.error) as e:
+            # Empty or truncated file, or offsets of another file format.
+            self.close()
+            logger.error("Corrupted tags index file %s: %s", path, e)
+            raise TreeTaggerError("Corrupted tags index file: %s (%s)" % (path, e))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the memory mapping and close the file.
+
+        Views returned by :meth:`postings` must have been released before.
+        """
+        views = []
+        for name in ("_offsets", "_postings"):
+            views.extend(getattr(self, name, {}).values())
+        views.extend([getattr(self, "_words", None), getattr(self, "_docoffsets", None),
+                      getattr(self, "_view", None)])
+        for view in views:
+            if view is not None:
+                view.release()
+        self._offsets = self._postings = {}
+        self._words = self._docoffsets = self._view = None
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def ntokens(self):
+        return self._ntokens
+
+    def terms(self, field):
+        """Get the vocabulary of a field.
+
+        :param field: ``"word"``, ``"pos"`` or ``"lemma"``.
+        :type field: str
+        :return: terms list.
+        :rtype: [ str ]
+        """
+        return self._vocabs[field]
+
+    def postings(self, field, term):
+        """Get the postings list of a term.
+
+        :param field: ``"word"``, ``"pos"`` or ``"lemma"``.
+        :type field: str
+        :param term: the searched term.
+        :type term: str
+        :return: memoryview (no copy) of flat ``uint32`` values, two by
+            occurrence: document index, tag position. Empty if the term
+            is unknown.
+        :rtype: memoryview
+        """
+        if field not in self._terms:
+            raise ValueError("Unknown index field: %r" % (field,))
+        code = self._terms[field].get(term)
+        if code is None:
+            return self._postings[field][0:0]
+        offsets = self._offsets[field]
+        return self._postings[field][offsets[code] * 2:offsets[code + 1] * 2]
+
+    def count(self, field, term):
+        """Get the number of occurrences of a term.
+        """
+        code = self._terms[field].get(term)
+        if code is None:
+            return 0
+        offsets = self._offsets[field]
+        return offsets[code + 1] - offsets[code]
+
+    def search(self, word=None, pos=None, lemma=None):
+        """Search tokens matching all given fields values.
+
+        Ex. ``search(lemma="house", pos="NN")`` find all tokens with lemma
+        *house* tagged as *NN*.
+
+        :return: list of found tokens, sorted by document and position.
+        :rtype: [ Hit ]
+        """
+        query = [(f, t) for f, t in zip(FIELDS, (word, pos, lemma)) if t is not None]
+        if not query:
+            raise ValueError("Need at least one of word, pos or lemma to search.")
+        # Start from the smaller postings list, and only seek its
+        # occurrences in other (sorted) postings lists.
+        query.sort(key=lambda ft: self.count(*ft))
+        plist = self.postings(*query[0])
+        hits = [(plist[i] << 32) | plist[i + 1] for i in range(0, len(plist), 2)]
+        plist.release()
+        for field, term in query[1:]:
+            if not hits:
+                break
+            plist = self.postings(field, term)
+            count = len(plist) // 2
+            found = []
+            index = 0
+            for h in hits:
+                index = _seek_posting(plist, count, h, index)
+                if index == count:
+                    break
+                if (plist[index * 2] << 32) | plist[index * 2 + 1] == h:
+                    found.append(h)
+            plist.release()
+            hits = found
+        return [Hit(h >> 32, h & 0xFFFFFFFF) for h in hits]
+
+    def documents(self, *queries):
+        """Search documents containing tokens for all queries.
+
+        Each query is a dict with ``word``, ``pos`` and/or ``lemma`` keys,
+        as for :meth:`search`.
+
+        :return: sorted list of documents indexes.
+        :rtype: [ int ]
+        """
+        if not queries:
+            raise ValueError("Need at least one query to search documents.")
+        docs = None
+        for query in queries:
+            found = set(hit.doc for hit in self.search(**query))
+            docs = found if docs is None else (docs & found)
+            if not docs:
+                break
+        return sorted(docs)
+
+    def words(self, doc, start=0, end=None):
+        """Get words of a document tags.
+
+        :param doc: document index.
+        :type doc: int
+        :param start: first tag position.
+        :type start: int
+        :param end: position after last tag, default to document end.
+        :type end: int
+        :return: list of words.
+        :rtype: [ str ]
+        """
+        docstart = self._docoffsets[doc]
+        docend = self._docoffsets[doc + 1]
+        start = max(docstart, docstart + start)
+        if end is None:
+            end = docend
+        else:
+            end = min(docend, docstart + end)
+        vocab = self._vocabs["word"]
+        words = self._words
+        return [vocab[words[i]] for i in range(start, end)]
+
+    def concordance(self, hits, width=5):
+        """Build KWIC (keyword in context) lines for found tokens.
+
+        :param hits: tokens found by :meth:`search`.
+        :type hits: [ Hit ]
+        :param width: number of words of context on each side.
+        :type width: int
+        :return: concordance lines, with left and right contexts as
+            space separated words.
+        :rtype: [ Concordance ]
+        """
+        lines = []
+        for doc, position in hits:
+            words = self.words(doc, max(0, position - width), position + width + 1)
+            center = min(position, width)
+            lines.append(Concordance(self.names[doc], position,
+                                     " ".join(words[:center]), words[center],
+                                     " ".join(words[center + 1:])))
+        return lines
@@ -107,16 +107,209 @@ If you have a graphical CPU usage, you should see a high average load on each CP
 
 .. _multiprocessing docs: https://docs.python.org/2/library/multiprocessing.html#windows
 
+
+Process start method
+--------------------
+
+Workers may be started from background threads of the poll (autoscaling,
+recycling, crashed workers replacement). A process forked from the main
+process at the same time another thread starts a TreeTagger process (or any
+subprocess) could inherit its pipes, and this subprocess would then wait for
+the worker end.
+So, with Python 3.4 and later, poll process are started with the
+``"forkserver"`` method where available (the platform default else, ex.
+``"spawn"`` on Windows): they are forked from a clean server process.
+As with Windows, the main module must then be safely importable, and
+tagger parameters (ex. a ``chunkerproc`` function) must be picklable.
+Another :mod:`multiprocessing` start method can be given with the
+``startmethod`` parameter — with ``"fork"``, don't start subprocess in other
+threads while the poll may start workers::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", startmethod="fork")
+
+
+Shared memory transport
+-----------------------
+
+Texts to tag and tagging results are normally pickled through the poll
+queues, which copies them through pipes.
+With Python 3.8 and later, you can give a ``shmthreshold`` size (in bytes) when
+creating the :class:`TaggerProcessPoll`: texts and results whose UTF-8
+encoded size reach this threshold are written into
+:mod:`multiprocessing.shared_memory` segments, and only small handles go
+through the queues.
+The receiving side decode the data directly from the segment, then
+release and unlink it (so segments are cleaned up as soon as a text has been
+picked up by a worker, or a result has been stored in its :class:`ProcJob`)::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", shmthreshold=1024 * 1024)
+
+
+Pipeline mode
+-------------
+
+By default each worker process does both the Python chunking of texts and
+the round trip with its own TreeTagger process, so chunking CPU and
+TreeTagger CPU are tied 1:1.
+Giving a ``chunkerscount`` when creating the :class:`TaggerProcessPoll`
+enable a two stages pipeline: ``chunkerscount`` chunker processes prepare
+texts (and read files for :meth:`TaggerProcessPoll.tag_file_async`) and
+send prepared token lines to ``workerscount`` tagger feeder processes, which
+only stream these lines into their TreeTagger process.
+Each stage can be sized to its measured cost::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", chunkerscount=6, workerscount=2)
+
+
+Autoscaling
+-----------
+
+Giving ``minworkers`` and/or ``maxworkers`` when creating the
+:class:`TaggerProcessPoll` enable autoscaling of workers count between
+these bounds.
+A supervisor thread regularly checks the poll load: when there are more jobs
+in flight than workers (or when jobs mean latency goes over
+``scalelatency`` seconds), a new worker is started; when some workers
+stay without job during ``idletimeout`` seconds, a worker is retired.
+Workers counts and scaling changes are available in
+:meth:`TaggerProcessPoll.metrics`::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", minworkers=1, maxworkers=8,
+                                         idletimeout=300)
+
+
+Crashed workers
+---------------
+
+A supervisor thread watches worker (and chunker) processes.
+When one of them exits abnormally (killed by a signal, by the system out of
+memory killer, a TreeTagger crash bringing down the worker…), a new process
+is started to replace it, and the works it was processing are queued again
+(in front of other waiting works with ``"lpt"`` and ``"spt"`` schedules, at
+the end of the works queue with ``"fifo"``) — up to ``crashretries`` times, after
+which their :class:`ProcJob` finish with a :class:`treetaggerwrapper.TreeTaggerError`.
+Works of a message (batch, coalesced works) that the crashed process had not
+started yet are queued again without counting a retry.
+Started works whose text was transmitted via shared memory, and works lost
+while the poll is stopping, are not queued again and fail directly (their
+shared memory segments being removed).
+The count of crashed processes is available in :meth:`TaggerProcessPoll.metrics`.
+
+.. note::
+
+    Only works followed by the poll (``keepjobs`` True) can be recovered.
+    A process killed while it is waiting on the works queue may leave the
+    queue lock acquired: recovery is aimed to crashes during processing.
+    A work is known as processed once the process has unpickled it — which
+    may import the module of a :meth:`submit` function the first time.
+
+
+CPU affinity
+------------
+
+On Linux, giving an ``affinity`` layout when creating the
+:class:`TaggerProcessPoll` pin each worker process on some CPUs, its
+TreeTagger process inheriting the same affinity — so the scheduler don't
+move them across cores or packages, keeping their caches warm.
+Layouts are built by :func:`affinity_layout` from the CPUs available to the
+main process: ``"compact"`` (one CPU by worker, filling a package before
+the next one), ``"scatter"`` (one CPU by worker, packages in turn) and
+``"pair"`` (two CPUs — hardware threads of a core — by worker and its
+TreeTagger). An explicit list of CPU sets can also be given.
+Workers replacing others (autoscaling, recycling, crashes) take the first
+free place in the layout::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", workerscount=16, affinity="pair")
+
+.. note::
+
+    The workers count comparison table above was measured without CPU
+    affinity. Benefits of pinning depend on the hardware (count of packages,
+    hardware threads) and on other loads of the computer: compare layouts on
+    your own hardware with the :file:`test/procaffinity.py` script.
+
+
+Works coalescing
+----------------
+
+When many small texts wait in the works queue, the cost of each exchange
+with TreeTagger (and of the flush sentence sent after each text) may be
+greater than the tagging itself. With a ``coalescejobs`` count, a worker
+picking a work also pick works already waiting (up to this count, or up to
+``coalescebytes`` characters of texts), prepares their texts one after the
+other, and tags them as frames of one exchange with its TreeTagger process.
+Each job still get its own result, texts being separated so that TreeTagger
+don't use the end of a text as context of the next one (results are the same
+as without coalescing)::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", coalescejobs=64)
+
+Only ``tag_text`` works are framed (including works prepared by chunkers in
+pipeline mode), and only when taggers don't use a results or sentences
+cache.
+
+
+Results cache
+-------------
+
+With a ``TAGCACHE`` tagger parameter (see
+:class:`treetaggerwrapper.ResultCache`), all process of the poll use the
+same cache file. Texts of ``tag_text`` jobs are searched in the cache by the
+main process, and a job already in the cache is finished immediately without
+being sent to a worker. Other jobs (ex. ``tag_file``) use the cache within
+workers::
+
+    p = treetaggerpoll.TaggerProcessPoll(TAGLANG="en", TAGCACHE="tags.cache")
+
+
+Tagging a corpus of files
+-------------------------
+
+The :func:`tag_corpus` function tags a set of files with a poll, writing
+results in ``.ttr`` files (or in a :class:`treetaggerstore.StoreWriter`).
+Files are sent largest first, so that a big file is not processed alone at
+the end of the run, and small files are read by the main process and sent
+by packs of texts in one message to a worker — with a ``coalescejobs``
+poll, the texts of a pack are tagged in one exchange with TreeTagger (see
+works coalescing above). This is what the command line
+``-j`` option use (with ``--manifest``, see
+:class:`treetaggerwrapper.CorpusManifest`, a function called as files are
+done records their status)::
+
+    python -m treetaggerwrapper -l en -j 8 "corpus/*.txt"
+
 """
 
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import codecs
+import collections
+import ctypes
+import heapq
+import io
+import itertools
 import logging
 import multiprocessing
+import os
+import pickle
 import threading
+import time
+
+import six
+from six.moves import queue
 
 import treetaggerwrapper
+from treetaggerwrapper import futures
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:     # Python < 3.8
+    resource_tracker = shared_memory = None
+try:
+    from multiprocessing.connection import wait as wait_connections
+except ImportError:     # Python < 3.3
+    wait_connections = None
 
 
 # We don't print for errors/warnings, we use Python logging system.
@@ -131,8 +324,22 @@ __all__ = ['TaggerProcessPoll']
 
 
 
+# Marker to stop the dispatcher thread (after all works).
+DISPATCH_END = "dispatch-end"
+# Marker of worker messages requesting their replacement.
+WORKER_RECYCLE = "worker-recycle"
+#: Layouts of workers CPU affinity: consecutive cores, cores spread over
+#: CPU packages, pair of hardware threads (or of cores) by worker.
+AFFINITY_LAYOUTS = ("compact", "scatter", "pair")
+#: Size (in bytes) under which files are packed with others by
+#: :func:`tag_corpus`.
+CORPUS_PACKBYTES = 65536
+#: Maximum count of files in a pack.
+CORPUS_PACKFILES = 64
+
+
 # ==============================================================================
-class TaggerProcessPoll(object):
+class TaggerProcessPoll(treetaggerwrapper.TaggerPollBase):
     """Keep a poll of TreeTaggers process for processing with different threads.
 
     Each poll manage a set of processes, able to do parallel chunking and tagging.
@@ -145,18 +352,35 @@ class TaggerProcessPoll(object):
     allowing to know if processing is finished, to wait for it, and to get the
     result.
 
+    The poll is also a :class:`concurrent.futures.Executor` (see
+    :class:`treetaggerwrapper.TaggerPollBase`), with :meth:`submit` and
+    :meth:`map` methods returning standard futures (this need ``keepjobs``
+    to be True). Futures of a :class:`TaggerProcessPoll` are set running as
+    soon as submitted, they cannot be cancelled.
+
     If you want to **properly terminate** a :class:`TaggerProcessPoll`, you must
     call its :func:`TaggerProcessPoll.stop_poll` method.
     """
     def __init__(self, workerscount=None, keepjobs=True, wantresult=True,
-                 keeptagargs=True, **kwargs):
+                 keeptagargs=True, shmthreshold=None, maxinflight=None,
+                 chunkerscount=None, schedule="fifo", minworkers=None,
+                 maxworkers=None, idletimeout=60.0, scalelatency=None,
+                 scaleinterval=1.0, maxworkerjobs=None, maxrssmb=None,
+                 crashretries=1, metricscallback=None, metricsinterval=10.0,
+                 affinity=None, coalescejobs=None, coalescebytes=65536,
+                 startmethod=None, **kwargs):
         """Creation of a new TaggerProcessPoll.
 
         By default a :class:`TaggerProcessPoll` creates same count of process than there
         are CPU cores on your computer .
 
-        :param workerscount: number of worker process (and taggers) to create.
+        :param workerscount: number of worker process (and taggers) to create
+            (with autoscaling, default to ``minworkers``).
         :type workerscount: int
+        :param chunkerscount: number of chunker process to create for the
+            pipeline mode, then workers only do tagging of prepared texts —
+            default to None (workers do chunking and tagging).
+        :type chunkerscount: int
         :param keepjobs: poll keep references to Jobs to manage signal of
             their processing and store back processing results — default to True.
         :type keepjobs: bool
@@ -164,16 +388,120 @@ class TaggerProcessPoll(object):
             in the job — default to True.
         :type wantresult: bool
         :param keeptagargs: must keep tagging arguments in :class:`ProcJob` synchronization object
-            — default to True.
+            until it is finished — default to True.
         :type keeptagargs: bool
+        :param shmthreshold: size in bytes from which texts and results
+            are transmitted via shared memory segments — default to None
+            (always use queues).
+        :type shmthreshold: int
+        :param maxinflight: maximum count of jobs submitted and not finished,
+            jobs creation block when it is reached (need ``keepjobs``) —
+            default to None (unbounded).
+        :type maxinflight: int
+        :param schedule: waiting jobs scheduling policy, ``"fifo"``,
+            ``"lpt"`` or ``"spt"`` (see :class:`treetaggerwrapper.TaggerPollBase`)
+            — default to ``"fifo"``.
+        :type schedule: str
+        :param minworkers: minimum count of workers with autoscaling (need
+            ``keepjobs``) — default to None (1 if ``maxworkers`` is given).
+        :type minworkers: int
+        :param maxworkers: maximum count of workers with autoscaling (need
+            ``keepjobs``) — default to None (CPU count if ``minworkers`` is
+            given).
+        :type maxworkers: int
+        :param idletimeout: time (in seconds) during which some workers must
+            stay idle to retire one of them — default to 60.
+        :type idletimeout: float
+        :param scalelatency: jobs mean latency (in seconds) from which a
+            worker is added — default to None (only scale on jobs count).
+        :type scalelatency: float
+        :param scaleinterval: time (in seconds) between checks of the load —
+            default to 1.
+        :type scaleinterval: float
+        :param maxworkerjobs: count of jobs after which a worker is replaced
+            by a new one (need ``keepjobs``) — default to None (never
+            replaced).
+        :type maxworkerjobs: int
+        :param maxrssmb: size of resident memory (in MB) of a worker process
+            and its TreeTagger process from which the worker is replaced by a
+            new one (need ``keepjobs``) — default to None (never replaced).
+        :type maxrssmb: float
+        :param crashretries: count of times works lost in a crashed worker
+            process are queued again before failing — default to 1.
+        :type crashretries: int
+        :param metricscallback: function called with :meth:`metrics` result
+            every ``metricsinterval`` seconds — default to None.
+        :type metricscallback: callable
+        :param metricsinterval: time (in seconds) between calls of
+            ``metricscallback`` — default to 10.
+        :type metricsinterval: float
+        :param affinity: CPU affinity layout of workers and their TreeTagger
+            process, one of :data:`AFFINITY_LAYOUTS`, or a list of CPU sets
+            used in turn by workers (need Linux) — default to None (no
+            pinning).
+        :type affinity: str or [ set ]
+        :param coalescejobs: maximum count of waiting works a worker pick to
+            process them together, texts to tag being sent to TreeTagger in
+            one exchange — default to None (one works message at a time).
+        :type coalescejobs: int
+        :param coalescebytes: maximum size of texts of works processed
+            together — default to 65536.
+        :type coalescebytes: int
+        :param startmethod: :mod:`multiprocessing` start method of poll
+            process (Python 3.4 or later) — default to None
+            (``"forkserver"`` where available, else platform default).
+        :type startmethod: str
         :param kwargs: same parameters as :func:`treetaggerwrapper.TreeTagger.__init__`
             for :class:`TreeTagger` creation.
         """
+        autoscale = minworkers is not None or maxworkers is not None
+        if autoscale:
+            if minworkers is None:
+                minworkers = 1
+            if maxworkers is None:
+                maxworkers = max(minworkers, multiprocessing.cpu_count())
+            if minworkers < 1 or maxworkers < minworkers:
+                raise ValueError("Invalid minworkers/maxworkers %s/%s" % (minworkers, maxworkers))
+            if not keepjobs:
+                logger.error("TaggerProcessPoll can't autoscale without keepjobs.")
+                raise treetaggerwrapper.TreeTaggerError("Can't autoscale without keepjobs.")
+            if workerscount is None:
+                workerscount = minworkers
+            workerscount = min(max(workerscount, minworkers), maxworkers)
         if workerscount is None:
             workerscount = multiprocessing.cpu_count()
         # Security, we need at least one worker and one tagger.
         if workerscount < 1:
             raise ValueError("Invalid workerscount %s", workerscount)
+        if chunkerscount is not None and chunkerscount < 1:
+            raise ValueError("Invalid chunkerscount %s" % (chunkerscount,))
+        if crashretries < 0:
+            raise ValueError("Invalid crashretries %s" % (crashretries,))
+        if coalescejobs is not None and coalescejobs < 1:
+            raise ValueError("Invalid coalescejobs %s" % (coalescejobs,))
+        if affinity is not None:
+            if not hasattr(os, "sched_setaffinity"):
+                logger.error("TaggerProcessPoll CPU affinity need Linux sched_setaffinity().")
+                raise treetaggerwrapper.TreeTaggerError(
+                            "CPU affinity need Linux sched_setaffinity().")
+            if isinstance(affinity, six.string_types):
+                affinity = affinity_layout(affinity)
+            else:
+                affinity = [set(cpus) for cpus in affinity]
+                if not affinity or not all(affinity):
+                    raise ValueError("Invalid affinity %r" % (affinity,))
+        if shmthreshold is not None:
+            if shared_memory is None:
+                logger.error("Shared memory transport need Python 3.8 or later.")
+                raise treetaggerwrapper.TreeTaggerError(
+                            "Shared memory transport need Python 3.8 or later.")
+            if shmthreshold < 1:
+                raise ValueError("Invalid shmthreshold %s" % (shmthreshold,))
+            # Segments are created and unlinked by different process, they
+            # must share the same resource tracker.
+            resource_tracker.ensure_running()
+
+        mpcontext = process_context(startmethod)
 
         if DEBUG_MULTITHREAD:
             logger.debug("Creating TaggerProcessPoll, %d workers", workerscount )
@@ -181,22 +509,84 @@ class TaggerProcessPoll(object):
         if wantresult and not keepjobs:
             logger.debug("TaggerProcessPoll can't wantresult without keepjobs." )
             raise treetaggerwrapper.TreeTaggerError("Can't have wantresult without keepjobs.")
+        if (maxworkerjobs is not None or maxrssmb is not None) and not keepjobs:
+            logger.error("TaggerProcessPoll can't recycle workers without keepjobs.")
+            raise treetaggerwrapper.TreeTaggerError("Can't recycle workers without keepjobs.")
+        if maxinflight is not None and not keepjobs:
+            logger.error("TaggerProcessPoll can't bound in-flight jobs without keepjobs.")
+            raise treetaggerwrapper.TreeTaggerError("Can't have maxinflight without keepjobs.")
+
+        # All process use the same results cache (each with its connection).
+        kwargs = treetaggerwrapper.share_cache_args(kwargs)
 
         # We create a temporary tagger and tag a small text to be able to detect any
         # problem and raise exception from here (and not in created subprocess).
         tmptagger = treetaggerwrapper.TreeTagger(**kwargs)
-        tmptagger.tag_text(tmptagger.dummysequence)
+        tmptagger._tag_lines(tmptagger.dummysequence.split("\n"))
         del tmptagger
+        if kwargs['TAGCACHE'] is not None and keepjobs:
+            # Texts already tagged are searched in the cache before sending
+            # jobs to process (this tagger never start its TreeTagger process).
+            self._cachetagger = treetaggerwrapper.TreeTagger(**kwargs)
+        else:
+            self._cachetagger = None
 
+        self._mpcontext = mpcontext
         self._keepjobs = keepjobs
         self._wantresult = wantresult
         self._keeptagargs = keeptagargs
+        self._shmthreshold = shmthreshold
+        self._init_inflight(maxinflight)
+        self._init_schedule(schedule)
         self._stopping = False
         self._workers = []
-        self._pendingjobs = multiprocessing.Queue()
-        self._finishedjobs = multiprocessing.Queue()
+        self._workerscount = 0      # Workers not requested to stop.
+        # Reentrant: the supervisor start workers while holding it.
+        self._workerslock = threading.RLock()
+        self._taggerargs = kwargs
+        self._stats = collections.Counter()
+        self._metrics = treetaggerwrapper.PollMetrics()
+        self._maxworkerjobs = maxworkerjobs
+        self._maxrssmb = maxrssmb
+        self._workerids = itertools.count()
+        self._retireevents = {}     # Workers events to exit, by worker id.
+        # Events given to workers, by worker id: they are kept until the
+        # worker exits (a process started by a fork server get them after
+        # its start, they must not be released before).
+        self._procevents = {}
+        self._affinity = affinity
+        self._affinityslots = {}    # Workers index in affinity layout, by worker id.
+        self._chunkers = []
+        # Process -> (worker or chunker id, shared value of the work id being
+        # processed or 0 when waiting, chunker flag).
+        self._procinfos = {}
+        self._crashretries = crashretries
+        self._coalescejobs = coalescejobs
+        self._coalescebytes = coalescebytes
+        self._messages = {}         # Works messages being processed, by message id.
+        self._worksmessage = {}     # Message id, by work id.
+        if schedule == "fifo":
+            self._pendingjobs = self._mpcontext.Queue()
+            self._dispatcher = None
+        else:
+            # Works wait in a heap, ordered by their schedule key, and are
+            # moved to the (small) pending queue by a dispatcher thread
+            # when process pick them up.
+            self._schedheap = []
+            self._schedcond = threading.Condition()
+            self._pendingjobs = self._mpcontext.Queue(chunkerscount or workerscount)
+            self._dispatcher = threading.Thread(target=self._dispatch_main)
+            self._dispatcher.daemon = True
+            self._dispatcher.start()
+        self._finishedjobs = self._mpcontext.Queue()
+        if chunkerscount is not None:
+            # Chunkers get works from pending queue and put prepared works
+            # in tagging queue.
+            self._taggingjobs = self._mpcontext.Queue()
+        else:
+            self._taggingjobs = self._pendingjobs
         self._jobsrefs = {}
-        self._jobslock = multiprocessing.Lock()
+        self._jobslock = self._mpcontext.Lock()
 
         if self._keepjobs:
             # Following thread retrieve results, store them in corresponding ProcJob, and
@@ -207,43 +597,494 @@ class TaggerProcessPoll(object):
         else:
            self._jobsmonitor = None
 
+        if chunkerscount is not None:
+            self._build_chunkers(chunkerscount, kwargs)
         self._build_workers(workerscount, kwargs)
 
+        self._autoscale = autoscale
+        if autoscale:
+            self._minworkers = minworkers
+            self._maxworkers = maxworkers
+            self._idletimeout = idletimeout
+            self._scalelatency = scalelatency
+        else:
+            self._minworkers = self._maxworkers = workerscount
+        self._latency = [0.0, 0]    # Sum and count of jobs latencies.
+        # Supervisor watch processes (and scale them), the pipe allow to
+        # awake it when stopping.
+        self._supervisorstop = threading.Event()
+        self._supervisorwake = self._mpcontext.Pipe(duplex=False)
+        self._supervisor = threading.Thread(target=self._supervisor_main,
+                                            args=(scaleinterval,))
+        self._supervisor.daemon = True
+        self._supervisor.start()
+        self._start_metrics_reporter(metricscallback, metricsinterval)
+
         if DEBUG_MULTITHREAD:
             logger.debug("TaggerProcessPoll ready")
 
+    def _build_chunkers(self, chunkerscount, taggerargs):
+        if DEBUG_MULTITHREAD:
+            logger.debug("Creating chunkers for TaggerProcessPoll")
+        for i in range(chunkerscount):
+            self._start_chunker()
+
+    def _start_chunker(self):
+        chunkerid = next(self._workerids)
+        # Id of the work being prepared, and count of started works.
+        current = self._mpcontext.Array(ctypes.c_longlong, 2, lock=False)
+        p = self._mpcontext.Process(target=chunker_main,
+                        args=(self._pendingjobs, self._taggingjobs,
+                              self._finishedjobs, self._taggerargs,
+                              self._keepjobs, self._shmthreshold),
+                        kwargs=dict(current=current, chunkerid=chunkerid))
+        with self._workerslock:
+            self._chunkers.append(p)
+            self._procinfos[p] = (chunkerid, current, True)
+        self._metrics.worker_started(chunkerid)
+        p.start()
+        return p
+
     def _build_workers(self, workerscount, taggerargs):
         if DEBUG_MULTITHREAD:
             logger.debug("Creating workers for TaggerProcessPoll")
         for i in range(workerscount):
-            p = multiprocessing.Process(target=worker_main,
-                            args=(self._pendingjobs, self._finishedjobs, taggerargs,
-                                  self._keepjobs, self._wantresult))
+            self._start_worker()
+
+    def _start_worker(self, warmedevent=None):
+        workerid = next(self._workerids)
+        if self._maxworkerjobs is not None or self._maxrssmb is not None:
+            retireevent = self._mpcontext.Event()
+            self._retireevents[workerid] = retireevent
+        else:
+            retireevent = None
+        if self._affinity is not None:
+            # A new worker take the first free place in the layout.
+            with self._workerslock:
+                used = set(self._affinityslots.values())
+                slot = next(i for i in itertools.count() if i not in used)
+                self._affinityslots[workerid] = slot
+            cpus = self._affinity[slot % len(self._affinity)]
+        else:
+            cpus = None
+        # Ids of first works of messages being processed, and count of
+        # started works.
+        current = self._mpcontext.Array(ctypes.c_longlong, (self._coalescejobs or 1) + 1,
+                                        lock=False)
+        p = self._mpcontext.Process(target=worker_main,
+                        args=(self._taggingjobs, self._finishedjobs, self._taggerargs,
+                              self._keepjobs, self._wantresult,
+                              self._shmthreshold),
+                        kwargs=dict(workerid=workerid, maxjobs=self._maxworkerjobs,
+                                    maxrssmb=self._maxrssmb, retireevent=retireevent,
+                                    warmedevent=warmedevent, current=current,
+                                    cpus=cpus, coalescejobs=self._coalescejobs,
+                                    coalescebytes=self._coalescebytes))
+        with self._workerslock:
             self._workers.append(p)
-            p.start()
+            self._procinfos[p] = (workerid, current, False)
+            self._procevents[workerid] = (retireevent, warmedevent)
+            self._workerscount += 1
+        self._metrics.worker_started(workerid)
+        p.start()
+        self._stats['workers_started'] += 1
+        return p
+
+    def _recycle_worker(self, workerid):
+        # The worker continue to process jobs until its replacement has
+        # started its TreeTagger and set its retire event.
+        if DEBUG_MULTITHREAD:
+            logger.debug("Replacing worker %d", workerid)
+        with self._workerslock:
+            retireevent = self._retireevents.pop(workerid, None)
+            if retireevent is None:     # Worker crashed and was replaced.
+                return
+            self._workerscount -= 1
+        if self._stopping:
+            retireevent.set()
+            return
+        self._start_worker(warmedevent=retireevent)
+        self._stats['workers_recycled'] += 1
+
+    def _retire_worker(self):
+        # Any idle worker will pick the None and exit.
+        with self._workerslock:
+            self._workerscount -= 1
+        self._taggingjobs.put(None)
+        self._stats['workers_retired'] += 1
+
+    def _supervisor_main(self, interval):
+        idlesince = None
+        lastcheck = time.time()
+        while not self._supervisorstop.is_set():
+            with self._workerslock:
+                procs = list(self._procinfos)
+            if wait_connections is not None:
+                wait_connections([p.sentinel for p in procs] +
+                                 [self._supervisorwake[0]], interval)
+            else:
+                self._supervisorstop.wait(min(interval, 0.1))
+            if self._supervisorstop.is_set():
+                break
+            # Forget about exited process, replace crashed ones.
+            for p in procs:
+                if p.exitcode is not None:
+                    p.join()
+                    self._process_exited(p)
+            if not self._autoscale or time.time() - lastcheck < interval:
+                continue
+            lastcheck = time.time()
+            with self._jobslock:
+                inflight = len(self._jobsrefs)
+                latencysum, latencycount = self._latency
+                self._latency = [0.0, 0]
+            # Scaling is done under the lock, to not start a worker once
+            # the poll is stopping.
+            with self._workerslock:
+                if self._stopping:
+                    continue
+                count = self._workerscount
+                overloaded = inflight > count or \
+                    (self._scalelatency is not None and latencycount and
+                     latencysum / latencycount > self._scalelatency)
+                if overloaded and count < self._maxworkers:
+                    logger.info("TaggerProcessPoll scaling up to %d workers "
+                                "(%d jobs in flight).", count + 1, inflight)
+                    self._start_worker()
+                    idlesince = None
+                elif inflight < count and count > self._minworkers:
+                    # Some workers are idle.
+                    now = time.time()
+                    if idlesince is None:
+                        idlesince = now
+                    elif now - idlesince >= self._idletimeout:
+                        logger.info("TaggerProcessPoll scaling down to %d workers.", count - 1)
+                        self._retire_worker()
+                        idlesince = now
+                else:
+                    idlesince = None
+
+    def _process_exited(self, p):
+        """Remove an exited process, replace it and recover its work if crashed.
+        """
+        with self._workerslock:
+            workerid, current, ischunker = self._procinfos.pop(p)
+            if ischunker:
+                self._chunkers.remove(p)
+            else:
+                self._workers.remove(p)
+            self._metrics.worker_stopped(workerid)
+            self._affinityslots.pop(workerid, None)
+            self._procevents.pop(workerid, None)
+            if p.exitcode == 0:
+                return
+            self._stats['workers_crashed'] += 1
+            workids = [workid for workid in current[:-1] if workid]
+            started = current[-1]
+            logger.error("TaggerProcessPoll %s process %d crashed (exit code %d)%s.",
+                         "chunker" if ischunker else "worker", p.pid, p.exitcode,
+                         " processing works %s" % workids if workids else "")
+            if self._stopping:
+                pass        # Remaining process will finish works.
+            elif ischunker:
+                self._start_chunker()
+            elif workerid in self._retireevents or self._maxworkerjobs is None and \
+                    self._maxrssmb is None:
+                # Else the worker was recycling, its replacement is started.
+                self._workerscount -= 1
+                self._retireevents.pop(workerid, None)
+                self._start_worker()
+        if workids:
+            self._recover_works(workids, started)
+
+    def _track_works(self, work):
+        """Keep a processed works message until all its works are done.
+        """
+        works = work if isinstance(work, list) else [work]
+        with self._jobslock:
+            self._messages[works[0][0]] = [work, set(w[0] for w in works), 0]
+            for w in works:
+                self._worksmessage[w[0]] = works[0][0]
+
+    def _recover_works(self, workids, started):
+        """Queue again (or fail) works of the messages lost with a process.
+
+        Works the process never started are queued again as they were.
+        Started works are queued again up to ``crashretries`` times, except
+        when their text was sent via shared memory (it may have been
+        consumed): they fail and their segment is removed.
+
+        :param workids: ids of first works of the messages.
+        :type workids: [ int ]
+        :param started: count of works started by the process, in messages
+            order.
+        :type started: int
+        """
+        position = 0
+        for workid in workids:
+            with self._jobslock:
+                message = self._messages.pop(self._worksmessage.get(workid), None)
+                if message is None:
+                    continue
+                work, remaining, retries = message
+                works = work if isinstance(work, list) else [work]
+                lost = [(w, position + i < started) for i, w in enumerate(works)
+                        if w[0] in remaining]
+                position += len(works)
+                for w, begun in lost:
+                    del self._worksmessage[w[0]]
+            failed, notstarted, retried = [], [], []
+            for w, begun in lost:
+                payload = w[3].get('text')
+                if not isinstance(payload, SharedPayload):
+                    payload = None
+                if self._stopping:
+                    failed.append(w)
+                elif not begun:
+                    # A chunker may have consumed the text in pipeline mode.
+                    if payload is None or shm_exists(payload):
+                        notstarted.append(w)
+                    else:
+                        failed.append(w)
+                elif payload is None and retries < self._crashretries:
+                    retried.append(w)
+                else:
+                    failed.append(w)
+            for lostworks, tries in ((notstarted, retries), (retried, retries + 1)):
+                if not lostworks:
+                    continue
+                logger.warning("TaggerProcessPoll queuing again %d works lost by a crash.",
+                               len(lostworks))
+                requeued = lostworks if isinstance(work, list) else lostworks[0]
+                self._track_works(requeued)
+                with self._jobslock:
+                    self._messages[lostworks[0][0]][2] = tries
+                # Lost works go before works waiting in the schedule heap
+                # (fifo schedule put them at the end of the queue).
+                self._queue_work(requeued, (float("-inf"), next(self._schedseq)))
+            for w in failed:
+                logger.error("TaggerProcessPoll work %d lost by a crashed process.", w[0])
+                if isinstance(w[3].get('text'), SharedPayload):
+                    shm_release(w[3]['text'])
+                self._job_done(w[0], None, treetaggerwrapper.TreeTaggerError(
+                                "Worker process crashed while processing the job."))
+
+    def metrics(self):
+        """Get a snapshot of the poll state.
+
+        :return: dictionnary with keys ``workers`` (count of running
+            workers), ``min_workers``, ``max_workers``, ``workers_started``,
+            ``workers_retired`` (workers stopped by autoscaling),
+            ``workers_recycled`` (workers replaced after reaching
+            ``maxworkerjobs`` or ``maxrssmb``), ``workers_crashed`` (worker
+            and chunker process which exited abnormally),
+            ``jobs_in_flight`` (submitted and not finished, when
+            ``keepjobs`` is True), ``queue_depth`` (works messages waiting
+            for a process, None if the platform cannot tell), ``cache``
+            (:meth:`treetaggerwrapper.ResultCache.stats` of ``tag_text``
+            jobs searched in the cache before being sent to workers, or None
+            without results cache), measures
+            described in :meth:`treetaggerwrapper.PollMetrics.snapshot` —
+            ``busy_ratio`` is by worker id — and ``chunkers_busy_ratio``
+            (by chunker id, in pipeline mode).
+            Measures are got from workers results, so they need
+            ``keepjobs``.
+        :rtype: dict
+        """
+        with self._jobslock:
+            inflight = len(self._jobsrefs)
+        with self._workerslock:
+            workerids = [i for i, c, ischunker in self._procinfos.values() if not ischunker]
+            chunkerids = [i for i, c, ischunker in self._procinfos.values() if ischunker]
+        metrics = self._metrics.snapshot()
+        metrics['busy_ratio'] = self._metrics.busy_ratios(workerids)
+        metrics['chunkers_busy_ratio'] = self._metrics.busy_ratios(chunkerids)
+        metrics.update({
+            'workers': self._workerscount,
+            'min_workers': self._minworkers,
+            'max_workers': self._maxworkers,
+            'workers_started': self._stats['workers_started'],
+            'workers_retired': self._stats['workers_retired'],
+            'workers_recycled': self._stats['workers_recycled'],
+            'workers_crashed': self._stats['workers_crashed'],
+            'jobs_in_flight': inflight,
+            'queue_depth': self._queue_depth(),
+            'cache': (self._cachetagger.tagcache.stats()
+                      if self._cachetagger is not None else None),
+            })
+        return metrics
+
+    def _queue_depth(self):
+        queues = [self._pendingjobs]
+        if self._taggingjobs is not self._pendingjobs:
+            queues.append(self._taggingjobs)
+        try:
+            depth = sum(q.qsize() for q in queues)
+        except NotImplementedError:     # MacOSX.
+            return None
+        if self._dispatcher is not None:
+            with self._schedcond:
+                depth += len(self._schedheap)
+        return depth
+
+    def _queue_work(self, work, key):
+        """Send a work (or list of works, or None) to process.
+        """
+        if self._dispatcher is None:
+            if work is not DISPATCH_END:
+                self._pendingjobs.put(work)
+            return
+        with self._schedcond:
+            heapq.heappush(self._schedheap, key + (work,))
+            self._schedcond.notify()
+
+    def _dispatch_main(self):
+        while True:
+            with self._schedcond:
+                while not self._schedheap:
+                    self._schedcond.wait()
+                work = heapq.heappop(self._schedheap)[-1]
+            if work is DISPATCH_END:
+                break
+            self._pendingjobs.put(work)   # Block until a process pick a work.
 
-    def _create_job(self, methname, **kwargs):
+    def _new_job(self, methname, args, kwargs, slot=True):
+        """Build a job and its work tuple (to send to workers).
+
+        With ``slot`` False, the in-flight slot of the job has already been
+        taken by caller.
+        """
         if self._stopping:
-            raise TreeTaggerError("TaggerProcessPoll is stopped working.")
+            raise treetaggerwrapper.TreeTaggerError("TaggerProcessPoll is stopped working.")
+        if slot:
+            self._acquire_slot()
         job = ProcJob(self, methname, self._keepjobs, (kwargs if self._keeptagargs else None))
         if DEBUG_MULTITHREAD:
             logger.debug("ProcJob %d created, queuing it", id(job))
         if self._keepjobs:
             with self._jobslock:
                 self._jobsrefs[id(job)] = job
+        text = kwargs.get('text')
+        if self._shmthreshold is not None and isinstance(text, six.text_type):
+            data = text.encode("utf-8")
+            if len(data) >= self._shmthreshold:
+                kwargs = dict(kwargs, text=shm_put(data, "text"))
         # We put just pickleable data inside a tuple.
-        self._pendingjobs.put((id(job), methname, kwargs))
+        return job, (id(job), methname, args, kwargs)
+
+    def _cached_job(self, methname, args, kwargs, slot=True):
+        """Build a finished job if the result of a tag_text work is in
+        the results cache, else return None.
+        """
+        if self._cachetagger is None or methname != 'tag_text' or args:
+            return None
+        if self._stopping:
+            raise treetaggerwrapper.TreeTaggerError("TaggerProcessPoll is stopped working.")
+        options = dict(kwargs)
+        key = self._cachetagger.cache_key(options.pop('text', None), options)
+        result = self._cachetagger.tagcache.get(key) if key is not None else None
+        if result is None:
+            return None
+        if slot:
+            self._acquire_slot()
+        job = ProcJob(self, methname, self._keepjobs, (kwargs if self._keeptagargs else None))
+        job._set_result(result if self._wantresult else "finished")
         return job
 
+    def _create_job(self, methname, *args, **kwargs):
+        job = self._cached_job(methname, args, kwargs)
+        if job is not None:
+            return job
+        key = self._schedule_key(methname, args, kwargs)
+        job, work = self._new_job(methname, args, kwargs)
+        if self._keepjobs:
+            self._track_works(work)
+        self._queue_work(work, key)
+        return job
+
+    def _create_jobs_batch(self, methname, kwargslist):
+        """Queue a list of works as one message, return corresponding jobs.
+        """
+        if self._stopping:
+            raise treetaggerwrapper.TreeTaggerError("TaggerProcessPoll is stopped working.")
+        # Slots of the batch are taken at once: concurrent callers each
+        # holding part of the slots would wait for each other forever.
+        self._acquire_slot(len(kwargslist))
+        jobs = []
+        works = []
+        texts = []
+        for kwargs in kwargslist:
+            job = self._cached_job(methname, (), kwargs, slot=False)
+            if job is None:
+                job, work = self._new_job(methname, (), kwargs, slot=False)
+                works.append(work)
+                texts.append(kwargs.get('text'))
+            jobs.append(job)
+        if works:
+            # Batch cost is the cost of all its texts.
+            key = self._schedule_key(methname, (), {'text': texts})
+            if self._keepjobs:
+                self._track_works(works)
+            self._queue_work(works, key)
+        return jobs
+
+    def submit(self, fn, *args, **kwargs):
+        """See :meth:`treetaggerwrapper.TaggerPollBase.submit`.
+        """
+        if not self._keepjobs:
+            raise treetaggerwrapper.TreeTaggerError("Can't submit() with keepjobs False.")
+        return super(TaggerProcessPoll, self).submit(fn, *args, **kwargs)
+
     def _monitor_main(self):
         while True:
             workresult = self._finishedjobs.get()
             if workresult is None:
                 break
-            workid, result = workresult
-            with self._jobslock:
-                job = self._jobsrefs.pop(workid)
-            job._set_result(result)
+            if isinstance(workresult, tuple) and workresult[0] == WORKER_RECYCLE:
+                self._recycle_worker(workresult[1])
+                continue
+            if not isinstance(workresult, list):
+                workresult = [workresult]
+            for workid, result, error, timings in workresult:
+                self._job_done(workid, result, error, timings)
+
+    def _job_done(self, workid, result, error, timings=None):
+        with self._jobslock:
+            # Job may have been already done, when its work is processed
+            # again after a crash.
+            job = self._jobsrefs.pop(workid, None)
+            messageid = self._worksmessage.pop(workid, None)
+            if messageid is not None:
+                remaining = self._messages[messageid][1]
+                remaining.discard(workid)
+                if not remaining:
+                    del self._messages[messageid]
+            if job is not None:
+                self._latency[0] += time.time() - job._created
+                self._latency[1] += 1
+        if isinstance(result, SharedPayload):
+            try:
+                result = shm_get(result)
+            except Exception as e:
+                logger.error("Cannot retrieve ProcJob %d result from shared memory.", workid)
+                result = None
+                error = treetaggerwrapper.TreeTaggerError(str(e))
+        if job is not None:
+            if timings is not None:
+                self._measure_job(job, timings)
+            job._set_result(result, error)
+
+    def _measure_job(self, job, timings):
+        workerid, started, prep, tag, tokens, chunking = timings
+        self._metrics.add_busy(workerid, prep + tag)
+        wait = started - job._created
+        if chunking is not None:
+            # Wait in both queues, prepared by the chunker.
+            chunkerid, chunkstarted, chunkseconds = chunking
+            self._metrics.add_busy(chunkerid, chunkseconds)
+            wait = chunkstarted - job._created + started - chunkstarted - chunkseconds
+            prep += chunkseconds
+        self._metrics.job_measured(wait, prep, tag, tokens)
 
     def stop_poll(self):
         """Properly stop a :class:`TaggerProcessPoll`.
@@ -255,33 +1096,62 @@ class TaggerProcessPoll(object):
         """
         if DEBUG_MULTITHREAD:
             logger.debug("TaggerProcessPoll stopping")
+        self._stop_metrics_reporter()
         if not self._stopping:          # Just stop one time.
             if DEBUG_MULTITHREAD:
                 logger.debug("Signaling to threads")
-            self._stopping = True       # Prevent more Jobs to be queued.
+            with self._workerslock:
+                self._stopping = True   # Prevent more Jobs (and workers) to be queued.
+                stopcount = len(self._chunkers) or self._workerscount
             # Put one None by process (will awake processes).
             stopmonitor = True
-            for x in range(len(self._workers)):
-                self._pendingjobs.put(None)
+            for x in range(stopcount):
+                self._queue_work(None, (float("inf"), next(self._schedseq)))
+            self._queue_work(DISPATCH_END, (float("inf"), next(self._schedseq)))
         else:
             stopmonitor = False
+        # In pipeline mode, chunkers are stopped first, and their prepared
+        # works are processed before stopping workers.
+        # (the supervisor may remove crashed process meanwhile).
+        chunked = bool(self._chunkers)
+        for p in list(self._chunkers):
+            if DEBUG_MULTITHREAD:
+                logger.debug("Signaling to process %s (pid %d)", p.name, p.pid)
+            p.join()
+        if chunked and stopmonitor:
+            for x in range(self._workerscount):
+                self._taggingjobs.put(None)
         # Wait for processed to be finished.
-        for p in self._workers:
+        for p in list(self._workers):
             if DEBUG_MULTITHREAD:
                 logger.debug("Signaling to process %s (pid %d)", p.name, p.pid)
             p.join()
+        if self._supervisor is not None:
+            self._supervisorstop.set()
+            self._supervisorwake[1].send(None)
+            self._supervisor.join()
+            self._supervisor = None
         # Put None for monitoring thread to be finished (we do that only
         # after the joining of workers, to retrieve all processed feeback
         # before stopping the monitoring thread).
         if self._keepjobs and stopmonitor:
             self._finishedjobs.put(None)
             self._jobsmonitor.join()
+            # Works lost in process crashed while stopping.
+            for workid in list(self._jobsrefs):
+                self._job_done(workid, None, treetaggerwrapper.TreeTaggerError(
+                                "TaggerProcessPoll stopped before processing the job."))
 
         # Remove refs to process/threads.
-        if self._workers:
+        if self._workers or self._chunkers:
             self._workers = []
+            self._chunkers = []
+            self._procinfos = {}
         if self._jobsmonitor:
             self._jobsmonitor = None
+        if self._dispatcher:
+            self._dispatcher.join()
+            self._dispatcher = None
         if DEBUG_MULTITHREAD:
             logger.debug("TaggerProcessPoll stopped")
 
@@ -304,6 +1174,47 @@ class TaggerProcessPoll(object):
                                 notagemail=notagemail, notagip=notagip,
                                 notagdns=notagdns, nosgmlsplit=nosgmlsplit)
 
+    # --------------------------------------------------------------------------
+    def tag_texts_async(self, texts, batch_size=32, numlines=False, tagonly=False,
+                 prepronly=False, tagblanks=False, notagurl=False,
+                 notagemail=False, notagip=False, notagdns=False,
+                 nosgmlsplit=False):
+        """Tag a list of texts, sending them to workers by batches.
+
+        Each batch is sent in one message to a worker process, which tag
+        its texts one after the other and send back all their results in
+        one message — this reduce queues and pickling overhead when
+        tagging many small texts (compare with :meth:`tag_text_async` using
+        :file:`test/procbatch.py`).
+        See :func:`TreeTagger.tag_text` method for other parameters.
+
+        :param texts: the texts to tag.
+        :type texts: [ str ]
+        :param batch_size: count of texts by batch, default to 32.
+        :type batch_size: int
+        :return: a list of :class:`ProcJob` objects, one by text (in the
+            texts order).
+        :rtype: [ :class:`ProcJob` ]
+        """
+        if batch_size < 1:
+            raise ValueError("Invalid batch_size %s" % (batch_size,))
+        if self._maxinflight is not None:
+            # A batch in construction must fit in in-flight slots.
+            batch_size = min(batch_size, self._maxinflight)
+        options = dict(numlines=numlines, tagonly=tagonly, prepronly=prepronly,
+                       tagblanks=tagblanks, notagurl=notagurl, notagemail=notagemail,
+                       notagip=notagip, notagdns=notagdns, nosgmlsplit=nosgmlsplit)
+        texts = list(texts)
+        jobs = []
+        for start in range(0, len(texts), batch_size):
+            kwargslist = []
+            for text in texts[start:start + batch_size]:
+                kwargs = dict(options)
+                kwargs['text'] = text
+                kwargslist.append(kwargs)
+            jobs.extend(self._create_jobs_batch('tag_text', kwargslist))
+        return jobs
+
     # --------------------------------------------------------------------------
     def tag_file_async(self, infilepath, encoding=treetaggerwrapper.USER_ENCODING,
                  numlines=False, tagonly=False,
@@ -361,7 +1272,10 @@ class ProcJob(object):
         :code:`"finished"` or an exception information string.
 
     :ivar finished: Boolean indicator of job termination.
-    :ivar result: Final job processing result — or exception.
+    :ivar result: Final job processing result — or exception string.
+    :ivar future: :class:`concurrent.futures.Future` object of the job,
+        its exception is the one raised in the worker process (None if
+        ``keepjobs`` is False or :mod:`concurrent.futures` is not available).
     """
     def __init__(self, poll, methname, keepjobs, kwargs):
         self._poll = poll
@@ -373,11 +1287,29 @@ class ProcJob(object):
             self._event = None
         self._finished = False
         self._result = None
+        self._created = time.time()
+        if keepjobs and futures is not None:
+            self.future = futures.Future()
+            # Job will be started by a worker process, we cannot know when.
+            self.future.set_running_or_notify_cancel()
+        else:
+            self.future = None
 
-    def _set_result(self, result):
+    def _set_result(self, result, error=None):
+        if error is not None:
+            # Keep compatibility with previous versions: result is the
+            # exception string.
+            result = str(error)
         self._result = result
+        self._kwargs = None     # Release inputs.
         self._finished = True
         self._event.set()
+        self._poll._release_slot()
+        if self.future is not None:
+            if error is None:
+                self.future.set_result(result)
+            else:
+                self.future.set_exception(error)
         if DEBUG_MULTITHREAD:
             logger.debug("ProcJob %d finished", id(self))
 
@@ -387,12 +1319,18 @@ class ProcJob(object):
             raise treetaggerwrapper.TreeTaggerError("Can't know about a ProcJob state with keepjobs False.")
         return self._finished
 
-    def wait_finished(self):
+    def wait_finished(self, timeout=None):
         """Lock on the ProcJob event signaling its termination.
+
+        :param timeout: maximum time to wait in seconds, default to None
+            (wait until termination).
+        :type timeout: float
+        :return: True if the job is finished.
+        :rtype: bool
         """
         if self._event is None:
             raise treetaggerwrapper.TreeTaggerError("Can't wait on a ProcJob with keepjobs False.")
-        self._event.wait()
+        return self._event.wait(timeout)
 
     @property
     def result(self):
@@ -402,15 +1340,566 @@ class ProcJob(object):
 
 
 # ==============================================================================
-def worker_main(requestsqueue, resultsqueue, taggerargs, keepjobs, wantresult):
+def tag_corpus(poll, files, store=None, encoding=treetaggerwrapper.USER_ENCODING,
+               packbytes=CORPUS_PACKBYTES, packfiles=CORPUS_PACKFILES,
+               window=None, filedone=None, **kwargs):
+    """Tag a set of files with a poll.
+
+    Files are processed largest first. Files bigger than ``packbytes`` are
+    read and tagged by workers, which directly write their results (or send
+    them back to be added in the store). Smaller files are read here and sent
+    by packs of ``packfiles`` texts (up to ``packbytes`` bytes) in one message
+    to a worker.
+    A file whose processing fail (or which cannot be found, or whose result
+    cannot be written) is logged and counted, other files are still
+    processed. Results are written in
+    temporary files, renamed once complete.
+
+    :param poll: poll of taggers, with ``keepjobs`` and ``wantresult``.
+    :type poll: :class:`TaggerProcessPoll`
+    :param files: pathnames of files to tag, results are written in files
+        with same pathname and ``.ttr`` extension.
+    :type files: [ str ]
+    :param store: store where to add results in place of ``.ttr`` files
+        (documents being added as their processing finish, largest first)
+        — default to None.
+    :type store: :class:`treetaggerstore.StoreWriter`
+    :param encoding: encoding of the files to read/write.
+    :type encoding: str
+    :param packbytes: size (in bytes) under which files are packed.
+    :type packbytes: int
+    :param packfiles: maximum count of files in a pack.
+    :type packfiles: int
+    :param window: maximum count of files and packs sent and not finished —
+        default to None (4 by worker).
+    :type window: int
+    :param filedone: function called with each file pathname and its
+        processing exception (None if it succeeded) when it is finished,
+        after its result is written — default to None.
+    :type filedone: callable
+    :param kwargs: other parameters passed to
+        :meth:`treetaggerwrapper.TreeTagger.tag_text`.
+    :return: dictionnary with keys ``files``, ``failed`` (count of files
+        whose processing failed), ``bytes`` (size of processed files),
+        ``tokens`` and ``seconds``.
+    :rtype: dict
+    """
+    if window is None:
+        window = 4 * poll._workerscount
+    started = time.time()
+    tokens = poll.metrics()['tokens']
+    sizes = {}
+    missing = []
+    for path in files:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError as e:
+            missing.append((path, e))
+    files = sorted(sizes, key=lambda f: (-sizes[f], f))
+    stats = {'files': len(files) + len(missing), 'failed': len(missing),
+             'bytes': sum(sizes.values())}
+    for path, e in missing:
+        logger.error("Reading of file %s failed: %s", path, e)
+        if filedone is not None:
+            filedone(path, e)
+    pending = collections.deque()
+
+    def write_done(block=False):
+        while pending and (block or len(pending) >= window):
+            paths, jobs = pending.popleft()
+            for path, job in zip(paths, jobs):
+                job.wait_finished()
+                error = job_error(job)
+                if error is not None:
+                    logger.error("Processing of file %s failed: %s", path, error)
+                    stats['failed'] += 1
+                elif store is not None:
+                    store.add_document(path, job.result)
+                elif job.result is not None:
+                    # An interrupted run don't leave truncated results.
+                    respath = path + "." + treetaggerwrapper.RESEXT
+                    tmppath = respath + ".tmp"
+                    try:
+                        with io.open(tmppath, "w", encoding=encoding) as f:
+                            f.write("\n".join(job.result))
+                        getattr(os, "replace", os.rename)(tmppath, respath)
+                    except Exception as e:
+                        logger.error("Writing of file %s failed: %s", respath, e)
+                        stats['failed'] += 1
+                        error = e
+                        try:
+                            os.remove(tmppath)
+                        except OSError:
+                            pass
+                if filedone is not None:
+                    filedone(path, error)
+
+    def send_pack(paths):
+        texts, readpaths = [], []
+        for path in paths:
+            try:
+                with io.open(path, "r", encoding=encoding) as f:
+                    texts.append(f.read())
+            except Exception as e:
+                logger.error("Reading of file %s failed: %s", path, e)
+                stats['failed'] += 1
+                if filedone is not None:
+                    filedone(path, e)
+                continue
+            readpaths.append(path)
+        if texts:
+            pending.append((readpaths, poll.tag_texts_async(texts, batch_size=len(texts),
+                                                            **kwargs)))
+
+    pack, packsize = [], 0
+    for path in files:
+        write_done()
+        if sizes[path] > packbytes:
+            if store is not None:
+                job = poll.tag_file_async(path, encoding=encoding, **kwargs)
+            else:
+                job = poll.tag_file_to_async(path, path + "." + treetaggerwrapper.RESEXT,
+                                             encoding=encoding, **kwargs)
+            pending.append(([path], [job]))
+            continue
+        pack.append(path)
+        packsize += sizes[path]
+        if len(pack) >= packfiles or packsize >= packbytes:
+            send_pack(pack)
+            pack, packsize = [], 0
+    if pack:
+        send_pack(pack)
+    write_done(block=True)
+
+    stats['tokens'] = poll.metrics()['tokens'] - tokens
+    stats['seconds'] = time.time() - started
+    return stats
+
+
+def job_error(job):
+    """Get the exception of a finished :class:`ProcJob`.
+
+    :return: the exception, or None if the job succeeded.
+    """
+    if job.future is not None:
+        return job.future.exception()
+    # Without futures, an exception is transmitted as a string result.
+    if isinstance(job.result, six.string_types) and job.result != "finished":
+        return job.result
+    return None
+
+
+def process_context(startmethod=None):
+    """Get the :mod:`multiprocessing` context used to start poll process.
+
+    Workers are replaced from background threads (autoscaling, recycling,
+    crashes): forked from the main process, they could inherit pipes of a
+    TreeTagger process started by another thread at the same time, which
+    would then wait for the worker end. The fork server start process from
+    its own clean state.
+
+    :param startmethod: start method name — default to None
+        (``"forkserver"`` where available, else platform default).
+    :type startmethod: str
+    :return: the context (the :mod:`multiprocessing` module itself with
+        Python < 3.4).
+    """
+    if not hasattr(multiprocessing, "get_context"):     # Python < 3.4
+        if startmethod is not None:
+            logger.error("Process start method need Python 3.4 or later.")
+            raise treetaggerwrapper.TreeTaggerError(
+                        "Process start method need Python 3.4 or later.")
+        return multiprocessing
+    if startmethod is None and "forkserver" in multiprocessing.get_all_start_methods():
+        startmethod = "forkserver"
+    return multiprocessing.get_context(startmethod)
+
+
+# ==============================================================================
+#: Handle of data transmitted via a shared memory segment.
+#: kind is "text" for a string, "lines" for a list of strings.
+SharedPayload = collections.namedtuple("SharedPayload", "name size kind")
+
+
+def _shm_segment(name=None, size=0):
+    """Create or attach a shared memory segment.
+
+    Where possible, segments are not followed by the resource tracker:
+    the receiver of the data unlink the segment.
+    """
+    create = name is None
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size,
+                                          track=False)
+    except TypeError:   # Python < 3.13, no track parameter.
+        return shared_memory.SharedMemory(name=name, create=create, size=size)
+
+
+def shm_put(data, kind):
+    """Write encoded data into a new shared memory segment.
+
+    :param data: UTF-8 encoded data.
+    :type data: bytes
+    :param kind: "text" or "lines", how to decode data.
+    :type kind: str
+    :return: handle to transmit to the receiver of the data.
+    :rtype: SharedPayload
+    """
+    shm = _shm_segment(size=len(data))
+    try:
+        shm.buf[:len(data)] = data
+        payload = SharedPayload(shm.name, len(data), kind)
+    finally:
+        shm.close()
+    return payload
+
+
+def shm_get(payload):
+    """Decode data from a shared memory segment, and remove the segment.
+
+    :param payload: handle got from :func:`shm_put`.
+    :type payload: SharedPayload
+    :return: decoded text, or list of lines.
+    :rtype: str or [ str ]
+    """
+    shm = _shm_segment(name=payload.name)
+    try:
+        view = shm.buf[:payload.size]
+        try:
+            data = codecs.utf_8_decode(view)[0]
+        finally:
+            view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+    if payload.kind == "lines":
+        return data.split("\n")
+    return data
+
+
+def shm_exists(payload):
+    """Tell if the shared memory segment of a payload still exists.
+    """
+    try:
+        shm = _shm_segment(name=payload.name)
+    except OSError:
+        return False
+    shm.close()
+    return True
+
+
+def shm_release(payload):
+    """Remove the shared memory segment of a payload which will not be read.
+    """
+    try:
+        shm = _shm_segment(name=payload.name)
+    except OSError:
+        return      # Already consumed.
+    shm.close()
+    shm.unlink()
+
+
+# ==============================================================================
+def process_work(tagger, work, wantresult, shmthreshold=None, workerid=None,
+                 current=None):
+    """Process a work with a tagger.
+
+    :param tagger: the tagger of the worker process.
+    :type tagger: :class:`treetaggerwrapper.TreeTagger`
+    :param work: job id, method (name or callable), args and kwargs — and
+        chunker measures for a work prepared in pipeline mode.
+    :type work: tuple
+    :param shmthreshold: size from which list of strings results are sent
+        back via shared memory.
+    :type shmthreshold: int
+    :param workerid: identifier of the worker in the poll.
+    :type workerid: int
+    :param current: shared array of the process, whose count of started
+        works is incremented — default to None.
+    :type current: Array
+    :return: job id, result, exception (None if no exception) and
+        measures (worker id, start time, preparation and tagging seconds,
+        tagged tokens count, and chunker measures).
+    :rtype: tuple
+    """
+    workid, workmeth, args, kwargs = work[:4]
+    chunking = work[4] if len(work) > 4 else None
+    if DEBUG_MULTITHREAD:
+        logger.debug("Worker doing picked work %d", workid)
+    work_started(current)
+    started = time.time()
+    tagseconds, tagtokens = tagger._tagseconds, tagger._tagtokens
+    error = None
+    try:
+        if isinstance(kwargs.get('text'), SharedPayload):
+            kwargs = dict(kwargs, text=shm_get(kwargs['text']))
+        if isinstance(workmeth, six.string_types):
+            meth = getattr(tagger, workmeth)
+            result = meth(*args, **kwargs)
+        else:
+            result = workmeth(tagger, *args, **kwargs)
+        result = pack_result(result, wantresult, shmthreshold)
+    except Exception as e:
+        if DEBUG_MULTITHREAD:
+            logger.debug("Work %d exit with exception", workid)
+        result = None
+        error = sendable_error(e)
+    tagseconds = tagger._tagseconds - tagseconds
+    timings = (workerid, started, time.time() - started - tagseconds, tagseconds,
+               tagger._tagtokens - tagtokens, chunking)
+    return workid, result, error, timings
+
+
+def pack_result(result, wantresult, shmthreshold=None):
+    """Prepare a work result to be sent back to the main process.
+
+    :return: the result, ``"finished"`` if the user don't want back
+        results, or a :class:`SharedPayload` for big lists of strings.
+    """
+    # If user don't want back result, just store a "finished" to distinguish
+    # from exception.
+    if not wantresult:
+        return "finished"
+    if shmthreshold is not None and isinstance(result, list) and result and \
+            all(isinstance(x, six.text_type) for x in result):
+        # Tagged lines never contain newlines.
+        data = "\n".join(result).encode("utf-8")
+        if len(data) >= shmthreshold:
+            return shm_put(data, "lines")
+    return result
+
+
+def sendable_error(error):
+    """Get an exception which can be sent back to the main process.
+
+    :return: the exception if it is pickleable, else a
+        :class:`treetaggerwrapper.TreeTaggerError` with its message.
+    """
+    try:
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        error = treetaggerwrapper.TreeTaggerError(str(error))
+    return error
+
+
+def framable_work(tagger, work):
+    """Tell if a work can be tagged in a frame of coalesced works.
+
+    Only :func:`treetaggerwrapper.TreeTagger.tag_text` works (including
+    works prepared in pipeline mode) are framed, and only with a tagger
+    without results or sentences cache (which are used by ``tag_text``).
+    """
+    workmeth, args, kwargs = work[1:4]
+    return workmeth == 'tag_text' and not args and not kwargs.get('prepronly') and \
+        tagger.tagcache is None and tagger.sentcache is None
+
+
+# ==============================================================================
+def process_works(tagger, works, wantresult, shmthreshold=None, workerid=None,
+                  current=None):
+    """Process coalesced works with a tagger.
+
+    Texts of framable works (see :func:`framable_work`) are prepared one
+    after the other, and tagged as frames of one exchange with TreeTagger
+    process. Other works are processed with :func:`process_work`.
+
+    Parameters are same as :func:`process_work` ones, with a list of works.
+    Measures of framed works get their share of the exchange time, by
+    count of lines.
+
+    :return: list of :func:`process_work` results, in works order.
+    :rtype: [ tuple ]
+    """
+    started = time.time()
+    results = [None] * len(works)
+    framed = []         # Work index, prepared lines, preparation seconds.
+    for i, work in enumerate(works):
+        if not framable_work(tagger, work):
+            results[i] = process_work(tagger, work, wantresult, shmthreshold, workerid,
+                                      current)
+            continue
+        workid, workmeth, args, kwargs = work[:4]
+        work_started(current)
+        prepstart = time.time()
+        try:
+            kwargs = dict(kwargs)
+            kwargs.pop('prepronly', None)
+            text = kwargs.pop('text')
+            if isinstance(text, SharedPayload):
+                text = shm_get(text)
+            lines = tagger._prepare_lines(text, **kwargs)
+        except Exception as e:
+            timings = (workerid, prepstart, time.time() - prepstart, 0.0, 0,
+                       work[4] if len(work) > 4 else None)
+            results[i] = (workid, None, sendable_error(e), timings)
+            continue
+        framed.append((i, lines, time.time() - prepstart))
+    if not framed:
+        return results
+    if DEBUG_MULTITHREAD:
+        logger.debug("Worker tagging %d coalesced works", len(framed))
+    tagstart = time.time()
+    error = None
+    try:
+        # Works are isolated, as if they were tagged one after the other.
+        outputs = tagger._tag_frames([lines for i, lines, prep in framed], isolated=True)
+    except Exception as e:
+        outputs = [None] * len(framed)
+        error = sendable_error(e)
+    tagseconds = time.time() - tagstart
+    totallines = sum(len(lines) for i, lines, prep in framed) or 1
+    for (i, lines, prep), output in zip(framed, outputs):
+        work = works[i]
+        result, workerror = None, error
+        if workerror is None:
+            try:
+                result = pack_result(output, wantresult, shmthreshold)
+            except Exception as e:
+                workerror = sendable_error(e)
+        timings = (workerid, started, prep, tagseconds * len(lines) / totallines,
+                   len(output or ()), work[4] if len(work) > 4 else None)
+        results[i] = (work[0], result, workerror, timings)
+    return results
+
+
+# ==============================================================================
+def prepare_work(tagger, work, shmthreshold=None, chunkerid=None, current=None):
+    """Do the chunking part of a work, in pipeline mode.
+
+    Works for :func:`treetaggerwrapper.TreeTagger.tag_text` and
+    :func:`treetaggerwrapper.TreeTagger.tag_file` are transformed into
+    works tagging the prepared lines with ``tagonly``.
+    Other works are returned unchanged, to be fully processed by a worker.
+
+    :param tagger: the tagger of the chunker process (its TreeTagger process
+        is never started).
+    :type tagger: :class:`treetaggerwrapper.TreeTagger`
+    :param work: job id, method (name or callable), args and kwargs.
+    :type work: tuple
+    :param shmthreshold: size from which prepared lines are sent via shared
+        memory.
+    :type shmthreshold: int
+    :param chunkerid: identifier of the chunker in the poll, given with
+        preparation measures in the prepared work.
+    :type chunkerid: int
+    :param current: shared array of the process, whose count of started
+        works is incremented — default to None.
+    :type current: Array
+    :return: work to send to a worker and exception (None if no exception).
+    :rtype: tuple
+    """
+    workid, workmeth, args, kwargs = work
+    work_started(current)
+    if workmeth not in ('tag_text', 'tag_file') or args or \
+            kwargs.get('tagonly') or kwargs.get('prepronly'):
+        return work, None
+    if DEBUG_MULTITHREAD:
+        logger.debug("Chunker preparing picked work %d", workid)
+    started = time.time()
+    try:
+        kwargs = dict(kwargs, prepronly=True)
+        if workmeth == 'tag_file':
+            encoding = kwargs.pop('encoding', treetaggerwrapper.USER_ENCODING)
+            with io.open(kwargs.pop('infilepath'), "r", encoding=encoding) as f:
+                kwargs['text'] = f.read()
+        elif isinstance(kwargs.get('text'), SharedPayload):
+            kwargs['text'] = shm_get(kwargs['text'])
+        lines = tagger.tag_text(**kwargs)
+        if shmthreshold is not None and lines:
+            data = "\n".join(lines).encode("utf-8")
+            if len(data) >= shmthreshold:
+                lines = shm_put(data, "lines")
+    except Exception as e:
+        if DEBUG_MULTITHREAD:
+            logger.debug("Work %d preparation exit with exception", workid)
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            e = treetaggerwrapper.TreeTaggerError(str(e))
+        return work, e
+    chunking = (chunkerid, started, time.time() - started)
+    return (workid, 'tag_text', (), {'text': lines, 'tagonly': True}, chunking), None
+
+
+# ==============================================================================
+def chunker_main(requestsqueue, taggingqueue, resultsqueue, taggerargs, keepjobs,
+                 shmthreshold=None, current=None, chunkerid=None):
+    """Main function of a chunker process, in pipeline mode.
+
+    The chunker process loop on picking up a job work (or a list of works)
+    from the poll shared works queue, prepare it with :func:`prepare_work`,
+    and put the prepared work in the tagging queue, for workers.
+    Works failing in preparation have their exception directly put in
+    the poll results queue.
+    The loop exit when the picked work is None.
+
+    :param requestsqueue: incoming requests queue of works to do.
+    :type requestsqueue: Queue
+    :param taggingqueue: outgoing queue of prepared works.
+    :type taggingqueue: Queue
+    :param resultsqueue: outgoing result queue of works in error.
+    :type resultsqueue: Queue
+    :param taggerargs: named parameters dict for creating the
+        tagger.
+    :type taggerargs: dict
+    :param shmthreshold: size from which prepared lines are sent via
+        shared memory.
+    :type shmthreshold: int
+    :param current: shared array to store the id of the work being
+        prepared (0 when waiting) and the count of started works, for the
+        poll to recover it if the process crash.
+    :type current: Array
+    :param chunkerid: identifier of the chunker in the poll.
+    :type chunkerid: int
+    """
+    tagger = treetaggerwrapper.TreeTagger(**taggerargs)
+    while True:
+        if DEBUG_MULTITHREAD:
+            logger.debug("Chunker waiting for work to pick…")
+        work = requestsqueue.get()
+        if work is None:
+            if DEBUG_MULTITHREAD:
+                logger.debug("Chunker finishing")
+            break
+        set_current_work(current, work)
+        prepared = []
+        errors = []
+        for w in (work if isinstance(work, list) else [work]):
+            w, error = prepare_work(tagger, w, shmthreshold, chunkerid, current)
+            if error is None:
+                prepared.append(w)
+            else:
+                errors.append((w[0], None, error, None))
+        if prepared:
+            taggingqueue.put(prepared if isinstance(work, list) else prepared[0])
+        if errors and keepjobs:
+            resultsqueue.put(errors)
+        set_current_work(current, None)
+    del tagger
+
+
+# ==============================================================================
+def worker_main(requestsqueue, resultsqueue, taggerargs, keepjobs, wantresult,
+                shmthreshold=None, workerid=None, maxjobs=None, maxrssmb=None,
+                retireevent=None, warmedevent=None, current=None, cpus=None,
+                coalescejobs=None, coalescebytes=None):
     """Main function of a worker process.
 
     The worker process first create a :class:`treetaggerwrapper.TreeTagger`
     object corresponding to options in :parapm:`taggerargs`.
-    Then it loop on picking up a job work from the poll shared works queue,
-    process it, and put back its result in the poll shared results queue.
+    Then it loop on picking up a job work (or a list of works for a batch)
+    from the poll shared works queue, process it, and put back its result
+    (or list of results) in the poll shared results queue.
     The loop exit when the picked work is None.
 
+    When the worker reach ``maxjobs`` or ``maxrssmb``, it request its
+    replacement to the poll and continue working until its ``retireevent``
+    is set by the replacement worker, once this one is ready.
+
+    With ``coalescejobs``, the worker also pick works already waiting in the
+    queue (see :func:`drain_works`) and process them together with
+    :func:`process_works`, results being put back message by message.
+
     :param requestsqueue: incoming requests queue of works to do.
     :type requestsqueue: Queue
     :param resultsqueue: outgoing result queue of works done.
@@ -418,32 +1907,298 @@ def worker_main(requestsqueue, resultsqueue, taggerargs, keepjobs, wantresult):
     :param taggerargs: named parameters dict for creating the
         tagger.
     :type taggerargs: dict
+    :param shmthreshold: size from which results are sent back via
+        shared memory.
+    :type shmthreshold: int
+    :param workerid: identifier of the worker in the poll.
+    :type workerid: int
+    :param maxjobs: count of jobs after which the worker request its
+        replacement.
+    :type maxjobs: int
+    :param maxrssmb: resident memory size (in MB) from which the worker
+        request its replacement.
+    :type maxrssmb: float
+    :param retireevent: event set when the worker must exit.
+    :type retireevent: Event
+    :param warmedevent: event to set once the tagger is ready, for a worker
+        replacing another.
+    :type warmedevent: Event
+    :param current: shared array to store the ids of the works being
+        processed (0 when waiting) and the count of started works, for the
+        poll to recover them if the process crash.
+    :type current: Array
+    :param cpus: CPUs to pin the worker on — its TreeTagger process,
+        started later, inherit this affinity.
+    :type cpus: set
+    :param coalescejobs: maximum count of works processed together.
+    :type coalescejobs: int
+    :param coalescebytes: maximum size of texts of works processed
+        together (a first work may be bigger).
+    :type coalescebytes: int
     """
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (OSError, ValueError) as e:
+            logger.warning("Worker %s cannot set its CPU affinity to %s: %s",
+                           workerid, sorted(cpus), e)
     tagger = treetaggerwrapper.TreeTagger(**taggerargs)
+    if warmedevent is not None:
+        # Start TreeTagger process before replaced worker exit.
+        tagger._tag_lines(tagger.dummysequence.split("\n"))
+        warmedevent.set()
+    jobscount = 0
+    recycling = False
     while True:
         if DEBUG_MULTITHREAD:
             logger.debug("Worker waiting for work to pick…")
-        work = requestsqueue.get()  # Pickup a job work.
+        if recycling:
+            if retireevent.is_set():
+                if DEBUG_MULTITHREAD:
+                    logger.debug("Worker replaced, finishing")
+                break
+            try:
+                work = requestsqueue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if work is None:
+                # The None is for another worker (this one is no longer
+                # counted by the poll).
+                requestsqueue.put(None)
+                retireevent.wait(0.1)
+                continue
+        else:
+            work = requestsqueue.get()  # Pickup a job work.
         if work is None:
             if DEBUG_MULTITHREAD:
                 logger.debug("Worker finishing")
             break   # Put Nones in works queue to stop workers.
-        # Do the work
-        workid, workmeth, workargs = work
-        if DEBUG_MULTITHREAD:
-            logger.debug("Worker doing picked work %d", workid)
-        try:
-            meth = getattr(tagger, workmeth)
-            result = meth(**workargs)
-            # If user don't want back result, just store a "finished" to distinguish
-            # from exception.
-            if not wantresult:
-                result = "finished"
-        except Exception as e:
-            if DEBUG_MULTITHREAD:
-                logger.debug("Work %d exit with exception", workid)
-            result = str(e)
-        # Send back result.
+        messages = [work]
+        finishing = False
+        if coalescejobs is not None:
+            finishing = drain_works(requestsqueue, messages, coalescejobs,
+                                    coalescebytes, recycling)
+        set_current_works(current, messages)
+        # Do the work(s)
+        works = [w for m in messages for w in (m if isinstance(m, list) else [m])]
+        if coalescejobs is not None and len(works) > 1:
+            results = process_works(tagger, works, wantresult, shmthreshold, workerid,
+                                    current)
+        else:
+            results = [process_work(tagger, w, wantresult, shmthreshold, workerid, current)
+                       for w in works]
+        jobscount += len(works)
+        # Send back results, one message by works message.
         if keepjobs:
-            resultsqueue.put((workid, result))
+            start = 0
+            for m in messages:
+                if isinstance(m, list):
+                    resultsqueue.put(results[start:start + len(m)])
+                    start += len(m)
+                else:
+                    resultsqueue.put(results[start])
+                    start += 1
+        set_current_works(current, [])
+        if retireevent is not None and not recycling and (
+                (maxjobs is not None and jobscount >= maxjobs) or
+                (maxrssmb is not None and worker_rss_mb(tagger) > maxrssmb)):
+            if DEBUG_MULTITHREAD:
+                logger.debug("Worker %d request its replacement", workerid)
+            recycling = True
+            resultsqueue.put((WORKER_RECYCLE, workerid))
+        if finishing:
+            if DEBUG_MULTITHREAD:
+                logger.debug("Worker finishing")
+            break
     del tagger  # Explicitely remove object.
+
+
+def work_size(work):
+    """Get the size of texts of a work (or list of works), in characters
+    (or bytes for texts in shared memory).
+    """
+    size = 0
+    for w in (work if isinstance(work, list) else [work]):
+        text = w[3].get('text')
+        if isinstance(text, six.text_type):
+            size += len(text)
+        elif isinstance(text, SharedPayload):
+            size += text.size
+        elif isinstance(text, list):
+            size += sum(len(line) + 1 for line in text)
+    return size
+
+
+def drain_works(requestsqueue, messages, maxjobs, maxbytes=None, recycling=False):
+    """Pick works messages already waiting in a queue, without blocking.
+
+    Messages are picked until there are ``maxjobs`` works, or until their
+    texts reach ``maxbytes``.
+
+    :param requestsqueue: incoming requests queue of works to do.
+    :type requestsqueue: Queue
+    :param messages: works messages already picked, new ones are appended.
+    :type messages: list
+    :param maxjobs: maximum count of works.
+    :type maxjobs: int
+    :param maxbytes: maximum size of works texts (see :func:`work_size`),
+        default to None (no limit).
+    :type maxbytes: int
+    :param recycling: the worker is being replaced, stop requests it picks
+        are for other workers.
+    :type recycling: bool
+    :return: True if a stop request has been picked (the worker must exit
+        after processing messages).
+    :rtype: bool
+    """
+    count = sum(len(m) if isinstance(m, list) else 1 for m in messages)
+    size = sum(work_size(m) for m in messages)
+    while count < maxjobs and (maxbytes is None or size < maxbytes):
+        try:
+            work = requestsqueue.get_nowait()
+        except queue.Empty:
+            break
+        if work is None:
+            if not recycling:
+                return True
+            requestsqueue.put(None)     # For another worker.
+            break
+        messages.append(work)
+        count += len(work) if isinstance(work, list) else 1
+        size += work_size(work)
+    return False
+
+
+def set_current_work(current, work):
+    """Store the id of a work (or of the first work of a list) being processed.
+
+    :param current: shared array of the process, or None.
+    :type current: Array
+    :param work: work tuple, list of works, or None when the process wait.
+    """
+    set_current_works(current, [work] if work is not None else [])
+
+
+def set_current_works(current, messages):
+    """Store the id of the first work of works messages being processed.
+
+    The count of started works is reset.
+
+    :param current: shared array of the process (with room for all
+        messages, plus the count of started works), or None.
+    :type current: Array
+    :param messages: works tuples or lists of works.
+    :type messages: list
+    """
+    if current is None:
+        return
+    for i in range(len(current) - 1):
+        work = messages[i] if i < len(messages) else None
+        if isinstance(work, list):
+            work = work[0] if work else None
+        current[i] = work[0] if work is not None else 0
+    current[-1] = 0
+
+
+def work_started(current):
+    """Count a work started by the process (its text may be consumed).
+
+    :param current: shared array of the process, or None.
+    :type current: Array
+    """
+    if current is not None:
+        current[-1] += 1
+
+
+def worker_rss_mb(tagger):
+    """Get resident memory size of current process and its TreeTagger process.
+
+    :return: resident size in MB (0 if unknown).
+    :rtype: float
+    """
+    return (treetaggerwrapper.process_rss_mb(os.getpid()) or 0) + \
+        (treetaggerwrapper.tagger_rss_mb(tagger) or 0)
+
+
+# ==============================================================================
+def cpu_topology(cpu):
+    """Get the location of a CPU in the hardware.
+
+    This is only available on Linux (via :file:`/sys`).
+
+    :param cpu: CPU number.
+    :type cpu: int
+    :return: physical package (socket) id and core id (hardware threads
+        of a same core share them), or None if unknown.
+    :rtype: (int, int)
+    """
+    topodir = "/sys/devices/system/cpu/cpu{}/topology".format(cpu)
+    try:
+        with open(os.path.join(topodir, "physical_package_id")) as f:
+            package = int(f.read())
+        with open(os.path.join(topodir, "core_id")) as f:
+            core = int(f.read())
+    except (IOError, OSError, ValueError):
+        return None
+    return package, core
+
+
+def affinity_layout(layout, cpus=None, topology=None):
+    """Build the CPU sets of workers for an affinity layout.
+
+    - ``"compact"``: one CPU by worker, filling cores of a package
+      before the next one.
+    - ``"scatter"``: one CPU by worker, taking cores of each package in
+      turn (spread memory bandwidth and caches of packages).
+    - ``"pair"``: two CPUs by worker (for the worker and its TreeTagger
+      process) — the hardware threads of a core when there are two, else
+      two consecutive cores.
+
+    :param layout: one of :data:`AFFINITY_LAYOUTS`.
+    :type layout: str
+    :param cpus: CPUs to use, default to the CPUs the current process can
+        run on.
+    :type cpus: iterable of int
+    :param topology: function giving :func:`cpu_topology` of a CPU,
+        default to :func:`cpu_topology`.
+    :type topology: callable
+    :return: CPU sets to use in turn by workers.
+    :rtype: [ set ]
+    """
+    if layout not in AFFINITY_LAYOUTS:
+        raise ValueError("Invalid affinity layout %r, must be one of %s" %
+                         (layout, ", ".join(AFFINITY_LAYOUTS)))
+    if cpus is None:
+        cpus = os.sched_getaffinity(0)
+    if topology is None:
+        topology = cpu_topology
+    # CPUs sorted by package, core and number, unknown topology keep
+    # CPU numbers order.
+    located = sorted((topology(cpu) or (0, cpu), cpu) for cpu in cpus)
+    if not located:
+        raise ValueError("No CPU for affinity layout.")
+    if layout == "pair":
+        cores = collections.OrderedDict()
+        for location, cpu in located:
+            cores.setdefault(location, []).append(cpu)
+        if all(len(threads) >= 2 for threads in cores.values()):
+            return [set(threads[:2]) for threads in cores.values()]
+        ordered = [cpu for location, cpu in located]
+        if len(ordered) < 2:
+            return [set(ordered)]
+        return [set(ordered[i:i + 2]) for i in range(0, len(ordered) - 1, 2)]
+    # One CPU by worker, using a first hardware thread of each core before
+    # the other ones.
+    rank = collections.Counter()
+    ranked = []
+    for location, cpu in located:
+        ranked.append((rank[location], location, cpu))
+        rank[location] += 1
+    ranked.sort()
+    if layout == "scatter":
+        packages = collections.OrderedDict()
+        for threadrank, (package, core), cpu in ranked:
+            packages.setdefault(package, []).append(cpu)
+        columns = six.moves.zip_longest(*packages.values())
+        return [set([cpu]) for column in columns for cpu in column if cpu is not None]
+    return [set([cpu]) for threadrank, location, cpu in ranked]
@@ -0,0 +1,502 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tagged texts are normally written as plain text files (one
+``word<tab>pos<tab>lemma`` line by token, the ``.ttr`` files of the command
+line tool), and each later analysis must re-read and re-split these lines.
+
+The :mod:`treetaggerstore` module provides a compact binary format for
+tagged corpora, with its :class:`StoreWriter` class to build a store file and
+its :class:`TaggedStore` class to read it.
+Words, POS and lemmas are interned as integer codes, and the file contains
+documents and sentences offsets indexes. The reader memory-maps the file, so
+opening a store is immediate and any document tokens are accessed without
+copy.
+
+Writing a store directly from tagging::
+
+    import treetaggerwrapper
+    import treetaggerstore
+
+    tagger = treetaggerwrapper.TreeTagger(TAGLANG="en")
+    with treetaggerstore.StoreWriter("corpus.ttb") as store:
+        for path in ["a.txt", "b.txt"]:
+            # A StoreWriter can be used in place of an output file path.
+            tagger.tag_file_to(path, store)
+        store.add_document("inline", tagger.tag_text("This is a text."))
+
+Or from the command line, with :option:`--store` option::
+
+    python treetaggerwrapper.py --store corpus.ttb *.txt
+
+Existing ``.ttr`` files can be converted with :meth:`StoreWriter.add_ttr_file`.
+
+Reading the store::
+
+    store = treetaggerstore.TaggedStore("corpus.ttb")
+    doc = store.document("a.txt")
+    for tag in doc:             # Tag / NotTag named tuples.
+        print(tag.lemma)
+    for sentence in doc.sentences():
+        print(" ".join(t.word for t in sentence))
+    codes = doc.codes           # Zero-copy memoryview of (word, pos, lemma) codes.
+    store.close()
+
+.. note:: This module requires Python 3 (it uses memoryview casts).
+
+File format
+-----------
+
+All values are little-endian.
+
+- Header: magic ``TTPWSTO1``, version, flags, tokens count, documents count,
+  sentences count, offsets of vocabularies, documents and sentences sections.
+- Tokens: a ``uint32`` triplet (word code, pos code, lemma code) by token.
+- Vocabularies: words, POS and lemmas strings tables.
+- Documents: tokens offsets, first sentence indexes and names table.
+- Sentences: tokens offsets of sentences starts.
+
+Lines which are not tags (ex. SGML tags within tagger output) are stored
+with pos and lemma code 0 (empty string), their full text being the word.
+Extra informations (probabilities) are not stored.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import array
+import io
+import logging
+import mmap
+import struct
+import sys
+
+import six
+
+import treetaggerwrapper
+from treetaggerwrapper import Tag, NotTag, TreeTaggerError
+
+
+# We don't print for errors/warnings, we use Python logging system.
+logger = logging.getLogger("TreeTagger.Store")
+# Avoid No handlers could be found for logger "TreeTagger" message.
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['StoreWriter', 'TaggedStore', 'TaggedDocument']
+
+# Extension for store files (TreeTagger binary => ttb).
+STOREEXT = "ttb"
+
+STORE_MAGIC = b"TTPWSTO1"
+STORE_VERSION = 1
+# magic, version, flags, ntokens, ndocs, nsents, vocaboffset, docsoffset, sentsoffset
+STORE_HEADER = struct.Struct("<8sIIQQQQQQ")
+
+# POS of tokens ending sentences (TreeTagger english/french, german, spanish
+# tagsets…).
+SENTENCE_TAGS = ("SENT", "$.", "FS")
+
+
+def _pad8(f):
+    """Pad a file with zeros to next 8 bytes alignment."""
+    pos = f.tell()
+    if pos % 8:
+        f.write(b"\0" * (8 - pos % 8))
+    return f.tell()
+
+
+def _write_array(f, arr):
+    # Note: StoreWriter only works on little-endian platforms.
+    f.write(arr.tobytes())
+
+
+def _write_strings(f, strings):
+    """Write a strings table: count, (count+1) offsets, utf-8 data."""
+    offsets = array.array('Q', [0])
+    data = []
+    pos = 0
+    for s in strings:
+        b = s.encode("utf-8")
+        data.append(b)
+        pos += len(b)
+        offsets.append(pos)
+    f.write(struct.pack("<Q", len(strings)))
+    _write_array(f, offsets)
+    f.write(b"".join(data))
+    _pad8(f)
+
+
+def _check_section(buf, offset, size):
+    """Raise ValueError if a section of a mapped file goes beyond its end."""
+    if offset + size > len(buf):
+        raise ValueError("section of %d bytes at offset %d beyond end of file (%d bytes)"
+                         % (size, offset, len(buf)))
+
+
+def _read_strings(buf, offset):
+    """Read a strings table, return (list of strings, offset after table)."""
+    _check_section(buf, offset, 8)
+    count, = struct.unpack_from("<Q", buf, offset)
+    offset += 8
+    _check_section(buf, offset, (count + 1) * 8)
+    offsets = memoryview(buf)[offset:offset + (count + 1) * 8].cast('Q')
+    try:
+        offset += (count + 1) * 8
+        _check_section(buf, offset, offsets[count])
+        data = buf[offset:offset + offsets[count]]
+        strings = [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+    finally:
+        # An exported view would prevent closing the mapping.
+        offsets.release()
+    offset += len(data)
+    if offset % 8:
+        offset += 8 - offset % 8
+    return strings, offset
+
+
+# ==============================================================================
+class StoreWriter(object):
+    """Build a binary store of tagged documents.
+
+    Tokens are written to the file as documents are added, only the
+    vocabularies and indexes are kept in memory until :meth:`close`.
+
+    A :class:`StoreWriter` can be given in place of output file path to
+    :meth:`treetaggerwrapper.TreeTagger.tag_file_to`, the input file path
+    is then used as document name.
+    """
+    def __init__(self, path, sentencetags=SENTENCE_TAGS):
+        """Creation of a new store file.
+
+        :param path: pathname of the store file to write (overwritten if it
+            exists).
+        :type path: str
+        :param sentencetags: POS of tokens ending a sentence.
+        :type sentencetags: [ str ]
+        """
+        if sys.byteorder != "little":
+            # Reader memory maps the file and use native integers.
+            raise TreeTaggerError("Tagged store only supported on little-endian platforms.")
+        self.path = path
+        self._sentencetags = frozenset(sentencetags)
+        self._file = io.open(path, "wb")
+        self._file.write(b"\0" * STORE_HEADER.size)
+        # Code 0 of pos and lemma is used for lines which are not tags.
+        self._words = {}
+        self._pos = {"": 0}
+        self._lemmas = {"": 0}
+        self._names = []
+        self._docoffsets = array.array('Q', [0])
+        self._docsents = array.array('Q', [0])
+        self._sentoffsets = array.array('Q')
+        self._ntokens = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_document(self, name, tags):
+        """Add a tagged document to the store.
+
+        :param name: document name (ex. source file path).
+        :type name: str
+        :param tags: tagger output lines (as returned by
+            :meth:`treetaggerwrapper.TreeTagger.tag_text`), or ``Tag``
+            / ``NotTag`` named tuples (as returned by
+            :func:`treetaggerwrapper.make_tags`).
+        :return: index of the document in the store.
+        :rtype: int
+        """
+        if self._file is None:
+            raise TreeTaggerError("StoreWriter is closed.")
+        words, poss, lemmas = self._words, self._pos, self._lemmas
+        sentencetags = self._sentencetags
+        codes = array.array('I')
+        sentoffsets = self._sentoffsets
+        ntokens = self._ntokens
+        newsentence = True
+        for tag in tags:
+            if isinstance(tag, six.string_types):
+                items = tag.split('\t')
+                if len(items) == 3:
+                    word, pos, lemma = items
+                else:
+                    tag = treetaggerwrapper.make_tags([tag], allow_extra=True)[0]
+            if not isinstance(tag, six.string_types):
+                if isinstance(tag, NotTag):
+                    word, pos, lemma = tag.what, "", ""
+                else:
+                    word, pos, lemma = tag[:3]
+            wcode = words.get(word)
+            if wcode is None:
+                wcode = words[word] = len(words)
+            pcode = poss.get(pos)
+            if pcode is None:
+                pcode = poss[pos] = len(poss)
+            lcode = lemmas.get(lemma)
+            if lcode is None:
+                lcode = lemmas[lemma] = len(lemmas)
+            if newsentence:
+                sentoffsets.append(ntokens)
+                newsentence = False
+            codes.append(wcode)
+            codes.append(pcode)
+            codes.append(lcode)
+            ntokens += 1
+            if pos in sentencetags:
+                newsentence = True
+        _write_array(self._file, codes)
+        self._ntokens = ntokens
+        self._names.append(name)
+        self._docoffsets.append(ntokens)
+        self._docsents.append(len(sentoffsets))
+        return len(self._names) - 1
+
+    def add_ttr_file(self, path, encoding=treetaggerwrapper.USER_ENCODING, name=None):
+        """Add a document from a tagger output text file (ex. ``.ttr`` file).
+
+        :param path: pathname of the file to read.
+        :type path: str
+        :param encoding: encoding of the file, default to utf-8.
+        :type encoding: str
+        :param name: document name, default to the file path.
+        :type name: str
+        :return: index of the document in the store.
+        :rtype: int
+        """
+        with io.open(path, "r", encoding=encoding) as f:
+            lines = [line.rstrip("\n") for line in f]
+        return self.add_document(path if name is None else name,
+                                 [line for line in lines if line])
+
+    def close(self):
+        """Write vocabularies and indexes, and close the store file.
+        """
+        if self._file is None:
+            return
+        f = self._file
+        vocaboffset = _pad8(f)
+        for table in (self._words, self._pos, self._lemmas):
+            strings = [None] * len(table)
+            for s, code in six.iteritems(table):
+                strings[code] = s
+            _write_strings(f, strings)
+        docsoffset = f.tell()
+        _write_array(f, self._docoffsets)
+        _write_array(f, self._docsents)
+        _write_strings(f, self._names)
+        sentsoffset = f.tell()
+        _write_array(f, self._sentoffsets)
+        f.seek(0)
+        f.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, 0, self._ntokens,
+                                  len(self._names), len(self._sentoffsets),
+                                  vocaboffset, docsoffset, sentsoffset))
+        f.close()
+        self._file = None
+        logger.info("Store %s written: %d documents, %d tokens.", self.path,
+                    len(self._names), self._ntokens)
+
+
+# ==============================================================================
+class TaggedStore(object):
+    """Read a binary store of tagged documents built by :class:`StoreWriter`.
+
+    The file is memory-mapped, tokens codes of documents are accessed
+    without copy. Vocabularies (words, POS, lemmas strings) are read when
+    opening the store.
+
+    :ivar words: words vocabulary (index is the word code).
+    :ivar pos: POS vocabulary (index is the pos code, 0 for non-tags).
+    :ivar lemmas: lemmas vocabulary (index is the lemma code, 0 for non-tags).
+    :ivar names: documents names.
+    """
+    def __init__(self, path):
+        """Open a store file.
+
+        :param path: pathname of the store file.
+        :type path: str
+        """
+        if sys.byteorder != "little":
+            # Sections are read as native integers.
+            raise TreeTaggerError("Tagged store only supported on little-endian platforms.")
+        self.path = path
+        self._file = io.open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            _check_section(self._mmap, 0, STORE_HEADER.size)
+            (magic, version, flags, self._ntokens, ndocs, nsents, vocaboffset,
+             docsoffset, sentsoffset) = STORE_HEADER.unpack_from(self._mmap, 0)
+            if magic != STORE_MAGIC or version != STORE_VERSION:
+                self.close()
+                logger.error("Not a tagged store file (or bad version): %s", path)
+                raise TreeTaggerError("Not a tagged store file (or bad version): " + path)
+
+            buf = self._mmap
+            self.words, offset = _read_strings(buf, vocaboffset)
+            self.pos, offset = _read_strings(buf, offset)
+            self.lemmas, offset = _read_strings(buf, offset)
+
+            # Check sections before building views, a failure must not leave
+            # an exported view of the mapping.
+            start = STORE_HEADER.size
+            _check_section(buf, start, self._ntokens * 12)
+            _check_section(buf, docsoffset, (ndocs + 1) * 16)
+            _check_section(buf, sentsoffset, nsents * 8)
+            view = self._view = memoryview(buf)
+            self._tokens = view[start:start + self._ntokens * 12].cast('I')
+            self._docoffsets = view[docsoffset:docsoffset + (ndocs + 1) * 8].cast('Q')
+            offset = docsoffset + (ndocs + 1) * 8
+            self._docsents = view[offset:offset + (ndocs + 1) * 8].cast('Q')
+            self.names, _ = _read_strings(buf, offset + (ndocs + 1) * 8)
+            self._sentoffsets = view[sentsoffset:sentsoffset + nsents * 8].cast('Q')
+        except (ValueError, struct.error) as e:
+            # Empty or truncated file, or offsets of another file format.
+            self.close()
+            logger.error("Corrupted tagged store file %s: %s", path, e)
+            raise TreeTaggerError("Corrupted tagged store file: %s (%s)" % (path, e))
+        self._nameindex = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the memory mapping and close the file.
+
+        Views returned by :attr:`TaggedDocument.codes` must have been
+        released before.
+        """
+        for name in ("_tokens", "_docoffsets", "_docsents", "_sentoffsets", "_view"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+                setattr(self, name, None)
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self.document(i)
+
+    @property
+    def ntokens(self):
+        return self._ntokens
+
+    def document(self, doc):
+        """Access a document.
+
+        :param doc: index or name of the document.
+        :type doc: int or str
+        :return: the document.
+        :rtype: :class:`TaggedDocument`
+        """
+        if isinstance(doc, six.string_types):
+            if self._nameindex is None:
+                self._nameindex = dict((n, i) for i, n in enumerate(self.names))
+            try:
+                doc = self._nameindex[doc]
+            except KeyError:
+                raise KeyError("No document %r in store" % (doc,))
+        if not 0 <= doc < len(self.names):
+            raise IndexError("Document index out of range: %d" % (doc,))
+        return TaggedDocument(self, doc)
+
+    def tag(self, wcode, pcode, lcode):
+        """Build a ``Tag`` (or ``NotTag``) from codes.
+        """
+        if pcode == 0:
+            return NotTag(self.words[wcode])
+        return Tag(self.words[wcode], self.pos[pcode], self.lemmas[lcode])
+
+
+class TaggedDocument(object):
+    """A document within a :class:`TaggedStore`.
+
+    Iterating on the document gives ``Tag``/``NotTag`` named tuples.
+
+    :ivar name: document name.
+    :ivar index: document index in the store.
+    :ivar start: index of first document token in the whole store.
+    :ivar end: index after the last document token in the whole store.
+    """
+    def __init__(self, store, index):
+        self._store = store
+        self.index = index
+        self.name = store.names[index]
+        self.start = store._docoffsets[index]
+        self.end = store._docoffsets[index + 1]
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def codes(self):
+        """Memoryview (no copy) on the document tokens codes.
+
+        Flat ``uint32`` values, three by token: word code, pos code,
+        lemma code. You must ``release()`` it before closing the store.
+        """
+        return self._store._tokens[self.start * 3:self.end * 3]
+
+    def array(self):
+        """NumPy view (no copy) on the document tokens codes, with one
+        ``(word, pos, lemma)`` row by token. As for :attr:`codes`, the
+        array must be deleted before closing the store.
+
+        .. note:: This method requires NumPy.
+        """
+        import numpy
+        return numpy.frombuffer(self.codes, dtype=numpy.uint32).reshape(-1, 3)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Token index out of range: %d" % (i,))
+        tokens = self._store._tokens
+        i = (self.start + i) * 3
+        return self._store.tag(tokens[i], tokens[i + 1], tokens[i + 2])
+
+    def __iter__(self):
+        store = self._store
+        tokens = store._tokens
+        words, poss, lemmas = store.words, store.pos, store.lemmas
+        for i in range(self.start * 3, self.end * 3, 3):
+            pcode = tokens[i + 1]
+            if pcode == 0:
+                yield NotTag(words[tokens[i]])
+            else:
+                yield Tag(words[tokens[i]], poss[pcode], lemmas[tokens[i + 2]])
+
+    def sentences_spans(self):
+        """Get sentences as tokens indexes within the document.
+
+        :return: list of ``(start, end)`` tokens indexes.
+        :rtype: [ (int, int) ]
+        """
+        store = self._store
+        first = store._docsents[self.index]
+        last = store._docsents[self.index + 1]
+        starts = [store._sentoffsets[i] - self.start for i in range(first, last)]
+        ends = starts[1:] + [len(self)]
+        return list(zip(starts, ends))
+
+    def sentences(self):
+        """Get sentences of the document.
+
+        :return: list of sentences, each one as a list of ``Tag``/``NotTag``.
+        :rtype: [ [ Tag ] ]
+        """
+        tags = list(self)
+        return [tags[start:end] for start, end in self.sentences_spans()]
@@ -232,6 +232,11 @@ modifications imply modifications in users code.
   If you need multiple parallel processing, you can create multiple
   :class:`TreeTagger` objects, put them in a poll, and work with them
   from different threads.
+  When many threads tag short texts with one shared :class:`TreeTagger`,
+  :option:`TAGBATCHWINDOW` and :option:`TAGBATCHLINES` parameters allow to
+  coalesce their calls in one exchange with TreeTagger process (each call
+  still getting its own result, texts being separated like successive
+  texts so that their tagging don't use the context of each other).
 
 - Support polls of taggers for optimal usage on multi-core computers.
   See :class:`treetaggerwrapper.TaggerPoll` class for thread poll
@@ -301,6 +306,51 @@ TreeTagger's parameter and abbreviation files.
 You can override these names using :option:`TAGPARFILE` and 
 :option:`TAGABBREV` parameters, and then use alternate files.
 
+Results cache
+-------------
+
+When the same texts are tagged again and again (ex. a corpus where most
+documents don't change between runs), you can give a cache file with
+:option:`TAGCACHE` parameter (or environment variable). Results of
+:meth:`TreeTagger.tag_text` (and so of :meth:`TreeTagger.tag_file` and
+polls jobs) are then stored in a :mod:`sqlite3` database, and a text already
+tagged is not chunked or sent to TreeTagger again::
+
+    tagger = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGCACHE="tags.cache")
+
+Cache entries are keyed by a hash of the text, the tagging options,
+TreeTagger options, and the content of parameter and abbreviations files —
+so updating a language model simply make old entries unused.
+The cache size is bounded, least recently used entries are removed when it
+is exceeded. You can directly build a :class:`ResultCache` to choose its
+size, share it between taggers, and get its hits/misses statistics.
+
+Texts of a corpus often share the same sentences (cookie banners,
+signatures, legal notices…) while being different. With a
+:class:`SentenceCache` given in :option:`TAGSENTCACHE` parameter, prepared
+texts are split into sentences, and only sentences not found in the cache
+are sent to TreeTagger::
+
+    sentcache = treetaggerwrapper.SentenceCache(memsize=200000, path="sentences.cache")
+    tagger = treetaggerwrapper.TreeTagger(TAGLANG="en", TAGSENTCACHE=sentcache)
+
+Sentences are tagged without the context of their neighbours, results may
+slightly differ from tagging whole texts. Line numbering (``numlines``
+option) put lines numbers in sentences, which make them unique.
+
+Incremental corpus runs
+-----------------------
+
+When tagging files from the command line, a ``--manifest`` file records for
+each input file its size and modification time (or content hash with
+``--manifesthash``), the options used, and the processing status (see
+:class:`CorpusManifest`). Running again the same command only tags files
+which changed or failed — and files not yet done when a previous run was
+interrupted. With ``--shard i/N``, only the i-th of N deterministic parts
+of the files is processed, so that several computers can share a corpus::
+
+    python -m treetaggerwrapper -l en --manifest run1.manifest --shard 1/4 "corpus/*.txt"
+
 Other things done by this module
 --------------------------------
 
@@ -454,6 +504,20 @@ in the tagger output (see TreeTagger README file for all options).
     this (you can note in the pprint formated display that we have tab and
     space separators — a tab after the word, then spaces between items).
 
+When you only need candidates tags and their probabilities (ex. for
+confidence filtering), use :func:`make_probs` which build for each token
+a list of ``(pos, lemma, prob)`` candidates, or :func:`make_probs_arrays`
+which build flat NumPy arrays of candidates with offset indexes::
+
+    >>> tagger = ttpw.TreeTagger(TAGLANG='fr', TAGOPT="-threshold 0.1 -token -lemma -sgml -quiet")
+    >>> tags = tagger.tag_text('Voici un petit test de TreeTagger pour voir.')
+    >>> probs = ttpw.make_probs(tags)
+    >>> probs[6]
+    TagProbs(word='pour', candidates=[('PRP', 'pour', 0.663202), ('ADV', 'pour', 0.336798)])
+    >>> arrays = ttpw.make_probs_arrays(tags)
+    >>> arrays.pos[arrays.offsets[6]:arrays.offsets[7]]
+    array(['PRP', 'ADV'], dtype='<U8')
+
 """
 
 from __future__ import print_function
@@ -471,15 +535,21 @@ __version__ = '2.3'
 #       semantic groups of things in the expression but no submatch group
 #       corresponding in the match object.
 # ==============================================================================
-__all__ = ["TreeTaggerError", "TreeTagger", "Tag", "make_tags"]
+__all__ = ["TreeTaggerError", "TreeTagger", "Tag", "make_tags", "make_probs",
+           "make_probs_arrays"]
 
+import bisect
 import codecs
 import collections
 import copy
+import functools
 from six.moves import configparser
 import getopt
 import glob
+import hashlib
 import io
+import itertools
+import json
 import logging
 import multiprocessing
 import os
@@ -494,12 +564,26 @@ import subprocess
 import sys
 import threading
 import time
+import zlib
 
 if six.PY2:
     # Under Python2 a permission denied error raises an OSError
     # with errno 13.
     PermissionError = OSError
 
+try:
+    from concurrent import futures
+except ImportError:
+    # Python2 without the futures backport package: polls work, but
+    # without the concurrent.futures Executor interface.
+    futures = None
+
+try:
+    import sqlite3
+except ImportError:
+    # Python built without sqlite, results cache is not available.
+    sqlite3 = None
+
 # Set to enable debugging code (mainly logs).
 DEBUG = 0
 
@@ -524,6 +608,8 @@ STARTOFTEXT = "<ttpw:start-text />"
 ENDOFTEXT = "<ttpw:end-text />"
 # A tag to identify line numbers from source text.
 NUMBEROFLINE = '<ttpw:line num="{}" />'
+# Separation between frames of lines tagged in one exchange with TreeTagger.
+FRAMESEPARATOR = "<ttpw:frame />"
 # And tags to identify location of whitespaces in source text.
 TAGSPACE = "<ttpw:space />"
 TAGTAB = "<ttpw:tab />"
@@ -788,6 +874,19 @@ class FinalPart(object):
         return self.text
 
 
+class FramesBatch(object):
+    """Frames of concurrent calls coalesced in one exchange with TreeTagger.
+
+    For internal use.
+    """
+    def __init__(self):
+        self.calls = []         # Groups of frames of each call.
+        self.lines = 0
+        self.results = []       # Results of each call.
+        self.error = None
+        self.event = threading.Event()
+
+
 # ==============================================================================
 def pipe_writer(pipe, text, flushsequence, encoding, errors):
     """Write a text to a pipe and manage pre-post data to ensure flushing.
@@ -997,6 +1096,24 @@ class TreeTagger(object):
                             function, so these parameters are available
                             for this function.
         :type CHUNKERPROC: fct(tagger, ['text']) => list ['chunk']
+        :keyword TAGCACHE: path of a results cache file, or a
+                           :class:`ResultCache` object — default to None
+                           (no cache).
+        :type TAGCACHE: str or :class:`ResultCache`
+        :keyword TAGSENTCACHE: path of a sentences cache file, or a
+                               :class:`SentenceCache` object — default to
+                               None (no sentences cache).
+        :type TAGSENTCACHE: str or :class:`SentenceCache`
+        :keyword TAGBATCHWINDOW: time (in seconds) during which concurrent
+                                 calls from different threads are collected
+                                 to be tagged in one exchange with TreeTagger
+                                 process — default to None (no coalescing,
+                                 use 0 to only coalesce calls waiting for
+                                 the TreeTagger process).
+        :type TAGBATCHWINDOW: float
+        :keyword TAGBATCHLINES: maximum count of prepared lines of coalesced
+                                calls — default to 10000.
+        :type TAGBATCHLINES: int
         :return: None
         """
         # Get data in different place, setup context for pre-processing and
@@ -1005,6 +1122,15 @@ class TreeTagger(object):
         self._set_language(kargs)
         self._set_tagger(kargs)
         self._set_preprocessor(kargs)
+        self._set_cache(kargs)
+        # Function to call in place of our own TreeTagger process for tagging
+        # frames of prepared lines (used by TaggerPoll).
+        self._framestagger = None
+        # Time spent in exchanges with our TreeTagger process, count of
+        # lines it output (used by polls metrics), and count of exchanges.
+        self._tagseconds = 0.0
+        self._tagtokens = 0
+        self._tagexchanges = 0
         # Note: TreeTagger process is started later, when really needed.
         if kargs:
             badargs = ", ".join(sorted(kargs.keys()))
@@ -1129,7 +1255,22 @@ class TreeTagger(object):
         else:
             self.removesgml = False
 
+        # ----- Coalescing of concurrent calls.
+        self.batchwindow = get_param("TAGBATCHWINDOW", kargs, None)
+        if self.batchwindow is not None:
+            self.batchwindow = float(self.batchwindow)
+            if self.batchwindow < 0:
+                raise ValueError("Invalid TAGBATCHWINDOW %s" % (self.batchwindow,))
+        self.batchlines = int(get_param("TAGBATCHLINES", kargs, 10000))
+        if self.batchlines < 1:
+            raise ValueError("Invalid TAGBATCHLINES %s" % (self.batchlines,))
+        # Calls collected for the next exchange, and synchronization of
+        # calls with the one doing the exchange.
+        self._batch = None
+        self._batchcond = threading.Condition()
+
         logger.info("tagopt=%s", self.tagopt)
+        logger.info("batchwindow=%s", self.batchwindow)
         logger.info("taginencoding=%s", self.taginencoding)
         logger.info("tagoutencoding=%s", self.tagoutencoding)
         logger.info("taginencerr=%s", self.taginencerr)
@@ -1243,6 +1384,81 @@ class TreeTagger(object):
             logger.error("Chunker function in CHUNKERPROC is not callable.")
             raise TreeTaggerError("Chunker function in CHUNKERPROC is not callable.")
 
+    # -------------------------------------------------------------------------
+    def _set_cache(self, kargs):
+        """Set results cache.
+
+        Internal use.
+        """
+        self.tagcache = get_param("TAGCACHE", kargs, None)
+        if isinstance(self.tagcache, six.string_types):
+            self.tagcache = ResultCache(self.tagcache)
+        logger.info("tagcache=%s", getattr(self.tagcache, "path", None))
+        self.sentcache = get_param("TAGSENTCACHE", kargs, None)
+        if isinstance(self.sentcache, six.string_types):
+            self.sentcache = SentenceCache(path=self.sentcache)
+        logger.info("sentcache=%s", getattr(self.sentcache, "path", None))
+
+    # -------------------------------------------------------------------------
+    def _cache_hash(self, parts):
+        """Start a cache key hash with tagger configuration and given parts.
+
+        Internal use.
+        """
+        chunker = self.chunkerproc
+        if chunker is not None:
+            chunker = "{}.{}".format(getattr(chunker, "__module__", ""),
+                                     getattr(chunker, "__name__", repr(chunker)))
+        h = hashlib.sha1()
+        for part in [CACHE_FORMAT, self.lang, self.tagopt,
+                     file_digest(self.tagparfile), file_digest(self.abbrevfile),
+                     self.taginencoding, self.taginencerr,
+                     self.tagoutencoding, self.tagoutencerr, chunker or ""] + parts:
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h
+
+    # -------------------------------------------------------------------------
+    def cache_key(self, text, options):
+        """Build the results cache key of a text tagging.
+
+        Internal use.
+
+        :param text: the text to tag.
+        :type text: unicode string   /   [ unicode string ]
+        :param options: :meth:`tag_text` options.
+        :type options: dict
+        :return: hexadecimal key, or None for a text which cannot be cached.
+        :rtype: str
+        """
+        if isinstance(text, six.text_type):
+            text = [text]
+        elif not isinstance(text, (list, tuple)) or \
+                not all(isinstance(t, six.text_type) for t in text):
+            return None     # Error reported by tagging.
+        # Options are all False by default, only names of boolean ones are used.
+        h = self._cache_hash([" ".join(sorted(k if isinstance(v, bool) else "{}={}".format(k, v)
+                                              for k, v in options.items() if v))])
+        for t in text:
+            h.update(t.encode("utf-8", "surrogatepass"))
+            h.update(b"\1")
+        return h.hexdigest()
+
+    # -------------------------------------------------------------------------
+    def sentence_key(self, lines):
+        """Build the sentences cache key of a sentence prepared lines.
+
+        Internal use.
+
+        :param lines: lines of the sentence, as TreeTagger input.
+        :type lines: [ str ]
+        :return: hexadecimal key.
+        :rtype: str
+        """
+        h = self._cache_hash(["sentence"])
+        h.update("\n".join(lines).encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
     # --------------------------------------------------------------------------
     def _start_process(self):
         """Start TreeTagger processing chain.
@@ -1376,6 +1592,64 @@ class TreeTagger(object):
                      numlines, tagonly, prepronly, tagblanks, notagurl, notagemail,
                      notagip, notagdns, nosgmlsplit)
 
+        options = dict(numlines=numlines, tagonly=tagonly, tagblanks=tagblanks,
+                       notagurl=notagurl, notagemail=notagemail, notagip=notagip,
+                       notagdns=notagdns, nosgmlsplit=nosgmlsplit)
+        return self._tag_text(text, options, prepronly)
+
+    # --------------------------------------------------------------------------
+    def _tag_text(self, text, options, prepronly=False, firstlinenum=1):
+        """Tag a text, or a block of lines of a text.
+
+        Internal use, see :meth:`tag_text` for parameters.
+
+        :param options: :meth:`tag_text` options, except ``prepronly``.
+        :type options: dict
+        :param firstlinenum: number of the first line of the text, for
+            ``numlines`` option (default to 1).
+        :type firstlinenum: int
+        :return: List of output strings from the tagger.
+        :rtype:  [ str ]
+        """
+        key = None
+        if self.tagcache is not None:
+            keyoptions = dict(options, prepronly=prepronly)
+            if options.get('numlines') and firstlinenum != 1:
+                keyoptions['firstlinenum'] = firstlinenum
+            key = self.cache_key(text, keyoptions)
+            if key is not None:
+                result = self.tagcache.get(key)
+                if result is not None:
+                    return result
+
+        lines = self._prepare_lines(text, firstlinenum=firstlinenum, **options)
+
+        if prepronly:
+            result = lines
+        elif self.sentcache is not None:
+            result = self._tag_sentences(lines)
+        else:
+            result = self._tag_lines(lines)
+
+        if key is not None:
+            self.tagcache.put(key, result)
+        return result
+
+    # --------------------------------------------------------------------------
+    def _prepare_lines(self, text, numlines=False, tagonly=False,
+                       tagblanks=False, notagurl=False, notagemail=False,
+                       notagip=False, notagdns=False, nosgmlsplit=False,
+                       firstlinenum=1):
+        """Check a text and prepare it for tagging.
+
+        Internal use, see :meth:`tag_text` for parameters.
+
+        :param firstlinenum: number of the first line of the text, for
+            ``numlines`` option (default to 1).
+        :type firstlinenum: int
+        :return: List of lines to process as TreeTagger input.
+        :rtype: [ str ]
+        """
         # Check for incompatible options.
         if (tagblanks or numlines) and self.removesgml:
             logger.error("Line numbering/blanks tagging need use of -sgml " + \
@@ -1389,7 +1663,13 @@ class TreeTagger(object):
             raise TreeTaggerError("Must use *unicode* string as text to tag.")
 
         if isinstance(text, six.text_type):
-            text = [text]
+            if firstlinenum != 1:
+                # Block following others in a text with lines ends: split it
+                # as the whole text would be, even without "\n" left (its
+                # last line may contain form feeds or other separators).
+                text = text.splitlines()
+            else:
+                text = [text]
         else:
             for t in text:
                 if isinstance(t, six.binary_type):
@@ -1405,7 +1685,8 @@ class TreeTagger(object):
                 lines = self._prepare_text(text, tagblanks=tagblanks, numlines=numlines,
                                        notagurl=notagurl, notagemail=notagemail,
                                        notagip=notagip, notagdns=notagdns,
-                                       nosgmlsplit=nosgmlsplit)
+                                       nosgmlsplit=nosgmlsplit,
+                                       firstlinenum=firstlinenum)
             else:
                 logger.debug("Pre-processing text with user providen chunker.")
                 lines = self.chunkerproc(self, text)
@@ -1418,60 +1699,245 @@ class TreeTagger(object):
             for l in text:
                 lines.extend(l.splitlines())
 
-        if prepronly:
-            return lines
+        return lines
+
+    # --------------------------------------------------------------------------
+    def _tag_lines(self, lines):
+        """Send prepared lines to TreeTagger and get its output.
+
+        Internal use.
+
+        :param lines: lines to process as TreeTagger input.
+        :type lines: [ str ]
+        :return: List of output strings from the tagger.
+        :rtype:  [ str ]
+        """
+        return self._tag_frames([lines])[0]
+
+    # --------------------------------------------------------------------------
+    def _tag_sentences(self, lines):
+        """Tag prepared lines sentence by sentence, using the sentences cache.
+
+        Internal use.
+
+        Sentences found in the cache are not sent to TreeTagger, others
+        (once each, if repeated in the text) are tagged as frames of one
+        exchange and stored in the cache.
+
+        :param lines: lines to process as TreeTagger input.
+        :type lines: [ str ]
+        :return: List of output strings from the tagger.
+        :rtype:  [ str ]
+        """
+        spans = sentence_spans(lines)
+        keys = [self.sentence_key(lines[start:end]) for start, end in spans]
+        results = self.sentcache.get_many(keys)
+        missing = collections.OrderedDict()
+        for key, (start, end) in zip(keys, spans):
+            if key not in results and key not in missing:
+                missing[key] = lines[start:end]
+        if missing:
+            tagged = list(zip(missing, self._tag_frames(list(missing.values()),
+                                                        isolated=True)))
+            self.sentcache.put_many(tagged)
+            results.update(tagged)
+        output = []
+        for key in keys:
+            output.extend(results[key])
+        return output
+
+    # --------------------------------------------------------------------------
+    def _tag_frames(self, frames, isolated=False):
+        """Send frames of prepared lines to TreeTagger and get their outputs.
+
+        Internal use.
+
+        Frames are sent in one exchange with TreeTagger process, separated
+        by :data:`FRAMESEPARATOR` SGML tags (so tagging of a frame use the
+        context of its neighbours frames) — or, when ``isolated``, separated
+        by the same flush sequence as between texts (so each frame is tagged
+        as a text on its own).
+
+        :param frames: lists of lines to process as TreeTagger input.
+        :type frames: [ [ str ] ]
+        :param isolated: tag frames without context of their neighbours.
+        :type isolated: bool
+        :return: List of output strings from the tagger for each frame.
+        :rtype:  [ [ str ] ]
+        """
+        if self._framestagger is not None:
+            return self._framestagger(frames, isolated)
+        if isolated:
+            groups = [[frame] for frame in frames]
+        else:
+            groups = [frames]
+        if self.batchwindow is not None:
+            results = self._tag_frames_coalesced(groups)
+        else:
+            # Prevent concurrent access to the pipe if used in multithreading
+            # context.
+            with self.taggerlock:
+                results = self._exchange_frames(groups)
+        return [res for group in results for res in group]
+
+    # --------------------------------------------------------------------------
+    def _tag_frames_coalesced(self, groups):
+        """Tag groups of frames with groups of concurrent calls, in one exchange.
+
+        Internal use.
+
+        The first call of a batch wait for :attr:`batchwindow` seconds (or
+        for :attr:`batchlines` lines) and for the TreeTagger process, then
+        do the exchange for all calls of the batch and give them their
+        results. Groups are isolated from each other (see
+        :meth:`_exchange_frames`), so a call result doesn't depend on other
+        calls texts.
+        """
+        count = sum(len(frame) for frames in groups for frame in frames)
+        with self._batchcond:
+            # Wait for a batch with room for our lines.
+            while self._batch is not None and self._batch.lines and \
+                    self._batch.lines + count > self.batchlines:
+                self._batchcond.wait()
+            leader = self._batch is None
+            if leader:
+                self._batch = batch = FramesBatch()
+            else:
+                batch = self._batch
+            index = len(batch.calls)
+            batch.calls.append(groups)
+            batch.lines += count
+            if batch.lines >= self.batchlines:
+                self._batchcond.notify_all()
+            if leader:
+                deadline = time.time() + self.batchwindow
+                while batch.lines < self.batchlines:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._batchcond.wait(remaining)
+
+        if not leader:
+            batch.event.wait()
+            if batch.error is not None:
+                raise batch.error
+            return batch.results[index]
 
-        # Prevent concurrent access to the pipe if used in multithreading
-        # context.
         with self.taggerlock:
-            # TreeTagger process is started at first need.
-            if self.taginput is None:
-                self._start_process()
-
-            # Send text to TreeTagger, get result.
-            logger.debug("Tagging text.")
-            t = threading.Thread(target=pipe_writer,
-                                 args=(self.taginput,
-                                       lines, self.dummysequence,
-                                       self.taginencoding,
-                                       self.taginencerr))
-            t.start()
-
-            result = []
-            intext = False
+            # Calls arrived while waiting for the TreeTagger process are in
+            # the batch.
+            with self._batchcond:
+                self._batch = None
+                self._batchcond.notify_all()
+            if DEBUG_MULTITHREAD:
+                logger.debug("Tagging %d coalesced calls, %d lines",
+                             len(batch.calls), batch.lines)
+            try:
+                results = self._exchange_frames([frames for calls in batch.calls
+                                                 for frames in calls])
+                start = 0
+                for calls in batch.calls:
+                    batch.results.append(results[start:start + len(calls)])
+                    start += len(calls)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.event.set()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[0]
+
+    # --------------------------------------------------------------------------
+    def _exchange_frames(self, groups):
+        """Do one exchange of groups of frames with TreeTagger process.
+
+        Internal use, called with :attr:`taggerlock` held.
+
+        Frames of a group are separated by :data:`FRAMESEPARATOR`. Groups
+        are separated like texts, with an end of text, a sentence end and
+        the flush sequence, so TreeTagger don't use a group as context of
+        the next one.
+
+        :param groups: lists of frames of lines.
+        :type groups: [ [ [ str ] ] ]
+        :return: List of output strings from the tagger for each frame, by
+            group.
+        :rtype:  [ [ [ str ] ] ]
+        """
+        isolation = [ENDOFTEXT, "."] + self.dummysequence.split("\n") + [STARTOFTEXT]
+        lines = []
+        for g, frames in enumerate(groups):
+            if g:
+                lines.extend(isolation)
+            for i, frame in enumerate(frames):
+                if i:
+                    lines.append(FRAMESEPARATOR)
+                lines.extend(frame)
+
+        started = time.time()
+        # TreeTagger process is started at first need.
+        if self.taginput is None:
+            self._start_process()
+
+        # Send text to TreeTagger, get result.
+        logger.debug("Tagging text.")
+        t = threading.Thread(target=pipe_writer,
+                             args=(self.taginput,
+                                   lines, self.dummysequence,
+                                   self.taginencoding,
+                                   self.taginencerr))
+        t.start()
+
+        results = [[[]]]
+        # Ends of texts to skip before the final one.
+        groupends = max(len(groups) - 1, 0)
+        startseen = False
+        intext = False
+        lastline_time = time.time()
+        while True:
+            line = self.tagoutput.readline()
+            if DEBUG: logger.debug("Read from TreeTagger: %r", line)
+            if not line:
+                if (time.time() - lastline_time) > TAGGER_TIMEOUT:
+                    # We already wait some times, there may be a problem with tagging
+                    # process communication. This avoid infinite loop.
+                    logger.error("Time out for TreeTagger reply.")
+                    raise TreeTaggerError("Time out for TreeTagger reply, enable debug / see error logs")
+                else:
+                    # We process too much quickly, leave time for tagger and writer
+                    # thread to work.
+                    time.sleep(0.1)
+                    continue    # read again.
             lastline_time = time.time()
-            while True:
-                line = self.tagoutput.readline()
-                if DEBUG: logger.debug("Read from TreeTagger: %r", line)
-                if not line:
-                    if (time.time() - lastline_time) > TAGGER_TIMEOUT:
-                        # We already wait some times, there may be a problem with tagging
-                        # process communication. This avoid infinite loop.
-                        logger.error("Time out for TreeTagger reply.")
-                        raise TreeTaggerError("Time out for TreeTagger reply, enable debug / see error logs")
-                    else:
-                        # We process too much quickly, leave time for tagger and writer
-                        # thread to work.
-                        time.sleep(0.1)
-                        continue    # read again.
-                lastline_time = time.time()
-
-                line = line.decode(self.tagoutencoding, self.tagoutencerr)
-                line = line.strip()
-                if line == STARTOFTEXT:
-                    intext = True
+
+            line = line.decode(self.tagoutencoding, self.tagoutencerr)
+            line = line.strip()
+            if line == STARTOFTEXT:
+                if startseen:
+                    results.append([[]])    # Next group.
+                startseen = True
+                intext = True
+                continue
+            if line == ENDOFTEXT:  # The flag we sent to identify texts.
+                intext = False
+                if groupends:
+                    groupends -= 1
                     continue
-                if line == ENDOFTEXT:  # The flag we sent to identify texts.
-                    intext = False
-                    break
-                if intext and line:
-                    if not (self.removesgml and is_sgml_tag(line)):
-                        result.append(line)
+                break
+            if intext and line == FRAMESEPARATOR:
+                results[-1].append([])
+                continue
+            if intext and line:
+                if not (self.removesgml and is_sgml_tag(line)):
+                    results[-1][-1].append(line)
 
-            # Synchronize to avoid possible problems.
-            t.join()
+        # Synchronize to avoid possible problems.
+        t.join()
+        self._tagseconds += time.time() - started
+        self._tagtokens += sum(len(r) for group in results for r in group)
+        self._tagexchanges += 1
 
-        return result
+        return results
 
     # --------------------------------------------------------------------------
     def tag_file(self, infilepath, encoding=USER_ENCODING,
@@ -1481,6 +1947,9 @@ class TreeTagger(object):
                  nosgmlsplit=False):
         """Call :meth:`tag_text` on the content of a specified file.
 
+        The file is read and tagged by blocks of paragraphs (see
+        :meth:`tag_file_to`).
+
         :param infilepath: pathname to access the file to read.
         :type infilepath: str
         :param encoding: specify encoding of the file to read, default to utf-8.
@@ -1490,14 +1959,14 @@ class TreeTagger(object):
         
         Other parameters are simply passed to :meth:`tag_text`.
         """
-        with io.open(infilepath, "r", encoding=encoding) as f:
-            content = f.read()
-
-        return self.tag_text(content,
-                             numlines=numlines, tagonly=tagonly,
-                             prepronly=prepronly, tagblanks=tagblanks, notagurl=notagurl,
-                             notagemail=notagemail, notagip=notagip, notagdns=notagdns,
-                             nosgmlsplit=nosgmlsplit)
+        result = []
+        for res in self._tag_file_blocks(infilepath, encoding, prepronly,
+                                         dict(numlines=numlines, tagonly=tagonly,
+                                              tagblanks=tagblanks, notagurl=notagurl,
+                                              notagemail=notagemail, notagip=notagip,
+                                              notagdns=notagdns, nosgmlsplit=nosgmlsplit)):
+            result.extend(res)
+        return result
 
     # --------------------------------------------------------------------------
     def tag_file_to(self, infilepath, outfilepath, encoding=USER_ENCODING,
@@ -1508,38 +1977,80 @@ class TreeTagger(object):
         """Call :meth:`tag_text` on the content of a specified file and write 
         result to a file.
 
+        The file is read by blocks of paragraphs (see :func:`read_blocks`),
+        each block result being written before the next block is read — so
+        memory stay bounded whatever the file size. Line numbering take care
+        of lines before each block. TreeTagger is flushed at the end of each
+        block (after an empty line), tags of words around blocks limits may
+        slightly differ from tagging the whole text at once.
+
         :param infilepath: pathname to access the file to read.
         :type infilepath: str
-        :param outfilepath: pathname to access the file to write.
+        :param outfilepath: pathname to access the file to write, or a
+            :class:`treetaggerstore.StoreWriter` object to add the result
+            as a document (named with infilepath) in a binary store.
         :type outfilepath: str
         :param encoding: specify encoding of the files to read/write, default to utf-8.
         :type encoding: str
 
         Other parameters are simply passed to :meth:`tag_text`.
         """
-        logger.info("Processing with file %s, reading input.", infilepath)
-        with io.open(infilepath, "r", encoding=encoding) as f:
-            content = f.read()
-
-        logger.info("Processing with file %s, tagging.", infilepath)
-        res = self.tag_text(content,
-                            numlines=numlines, tagonly=tagonly,
-                            prepronly=prepronly, tagblanks=tagblanks, notagurl=notagurl,
-                            notagemail=notagemail, notagip=notagip, notagdns=notagdns,
-                            nosgmlsplit=nosgmlsplit)
-
-        logger.info("Processing with file %s, writing to %s.",
+        blocks = self._tag_file_blocks(infilepath, encoding, prepronly,
+                                       dict(numlines=numlines, tagonly=tagonly,
+                                            tagblanks=tagblanks, notagurl=notagurl,
+                                            notagemail=notagemail, notagip=notagip,
+                                            notagdns=notagdns, nosgmlsplit=nosgmlsplit))
+
+        if hasattr(outfilepath, "add_document"):
+            logger.info("Processing with file %s, tagging and adding to store %s.",
+                        infilepath, outfilepath.path)
+            # A failure while adding tags would leave the store inconsistent.
+            outfilepath.add_document(infilepath, [tag for res in blocks for tag in res])
+            logger.info("Processing with file %s, finished.", infilepath)
+            return
+
+        logger.info("Processing with file %s, tagging and writing to %s.",
                     infilepath, outfilepath)
-        res = "\n".join(res)
-        with io.open(outfilepath, "w", encoding=encoding) as f:
-            content = f.write(res)
+        # Previous result stay in place if processing fail.
+        tmppath = outfilepath + ".tmp"
+        try:
+            with io.open(tmppath, "w", encoding=encoding) as f:
+                first = True
+                for res in blocks:
+                    if not res:
+                        continue
+                    if not first:
+                        f.write("\n")
+                    first = False
+                    f.write("\n".join(res))
+        except Exception:
+            if osp.exists(tmppath):
+                os.remove(tmppath)
+            raise
+        getattr(os, "replace", os.rename)(tmppath, outfilepath)
 
         logger.info("Processing with file %s, finished.", infilepath)
 
+    def _tag_file_blocks(self, infilepath, encoding, prepronly, options):
+        """Tag a file by blocks of paragraphs.
+
+        Internal use, see :meth:`tag_file_to` for parameters.
+
+        :return: results of blocks.
+        :rtype: generator of [ str ]
+        """
+        with io.open(infilepath, "r", encoding=encoding) as f:
+            empty = True
+            for block, firstlinenum in read_blocks(f):
+                empty = False
+                yield self._tag_text(block, options, prepronly, firstlinenum)
+            if empty:
+                yield self._tag_text("", options, prepronly)
+
     # --------------------------------------------------------------------------
     def _prepare_text(self, text, tagblanks=False, numlines=False,
                       notagurl=False, notagemail=False, notagip=False,
-                      notagdns=False, nosgmlsplit=False):
+                      notagdns=False, nosgmlsplit=False, firstlinenum=1):
         """Prepare a text for processing by TreeTagger.
 
         :param  text: the text to split into base elements.
@@ -1561,6 +2072,8 @@ class TreeTagger(object):
         :type   notagdns: boolean
         :param  nosgmlsplit: indicator to not split on sgml already within the text.
         :type   nosgmlsplit: boolean
+        :param  firstlinenum: number of the first line, for line numbering.
+        :type   firstlinenum: int
         :return: List of lines to process as TreeTagger input (no \\n at end of line).
         :rtype: [ unicode ]
         """
@@ -1589,7 +2102,7 @@ class TreeTagger(object):
             logger.debug("Numbering lines.")
             parts = []
             for num, line in enumerate(lines):
-                parts.append(FinalPart(NUMBEROFLINE.format(num + 1,)))
+                parts.append(FinalPart(NUMBEROFLINE.format(num + firstlinenum,)))
                 parts.append(line)
             # Remove temporary storage.
 
@@ -2448,7 +2961,1258 @@ def make_tags(result, exclude_nottags=False, allow_extra=False):
 
 
 # ==============================================================================
-class TaggerPoll(object):
+TagProbs = collections.namedtuple("TagProbs", "word candidates")
+"""
+A named tuple built by :func:`make_probs` for a token of TreeTagger output
+produced with :option:`-prob` / :option:`-threshold` options.
+``candidates`` is a list of ``(pos, lemma, prob)`` tuples in tagger output
+order (lemma is None if tagger was not run with :option:`-lemma`).
+"""
+
+ProbArrays = collections.namedtuple("ProbArrays", "words offsets pos lemmas probs")
+"""
+A named tuple built by :func:`make_probs_arrays`. ``words`` is a list of
+tokens, candidates of token ``i`` are at indexes
+``offsets[i]:offsets[i+1]`` in the flat ``pos``, ``lemmas`` and ``probs``
+NumPy arrays.
+"""
+
+# Used to check probabilities fields when a whole conversion failed.
+FLOAT_re = re.compile(r"^[-+]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]+)?$")
+
+
+def make_probs(result, lemma=True, exclude_nottags=False):
+    """Tool function to transform a list of TreeTagger output strings
+    obtained with :option:`-prob` or :option:`-threshold` options into a list
+    of ``TagProbs``/``NotTag`` named tuples.
+
+    Output lines are expected as a word, a tab, then a sequence of
+    ``pos lemma prob`` (or ``pos prob`` if :option:`-lemma` is not used)
+    groups, one group by candidate tag.
+
+    :param result: result of a :meth:`TreeTagger.tag_text` call.
+    :param bool lemma: tagger output contains lemmas. Default to True.
+    :param bool exclude_nottags: dont generate ``NotTag`` for lines which
+        are not candidates lists (ex. SGML tags). Default to False.
+    :return: list of ``TagProbs``/``NotTag`` named tuples.
+    :rtype: list
+    """
+    width = 3 if lemma else 2
+    newres = []
+    for line in result:
+        word, sep, rest = line.partition('\t')
+        fields = rest.split()
+        count = len(fields)
+        if sep and count and not count % width:
+            try:
+                probs = list(map(float, fields[width - 1::width]))
+            except ValueError:
+                probs = None
+            if probs is not None:
+                if lemma:
+                    candidates = list(zip(fields[0::3], fields[1::3], probs))
+                else:
+                    candidates = list(zip(fields[0::2], [None] * len(probs), probs))
+                newres.append(TagProbs(word, candidates))
+                continue
+        if not exclude_nottags:
+            newres.append(NotTag(line, ))
+    return newres
+
+
+def make_probs_arrays(result, lemma=True, exclude_nottags=False):
+    """Tool function to transform a list of TreeTagger output strings
+    obtained with :option:`-prob` or :option:`-threshold` options into flat
+    NumPy arrays.
+
+    Candidates of all tokens are stored in the same arrays, with an
+    ``offsets`` index giving the candidates range of each token.
+    Lines which are not candidates lists are kept as a word with no
+    candidate (unless ``exclude_nottags`` is set).
+
+    .. note:: This function requires NumPy.
+
+    :param result: result of a :meth:`TreeTagger.tag_text` call.
+    :param bool lemma: tagger output contains lemmas. Default to True.
+    :param bool exclude_nottags: dont keep lines which are not candidates
+        lists. Default to False.
+    :return: words list, and arrays of candidates with offset indexes.
+    :rtype: ProbArrays
+    """
+    try:
+        import numpy
+    except ImportError:
+        logger.error("make_probs_arrays() requires NumPy.")
+        raise TreeTaggerError("make_probs_arrays() requires NumPy.")
+
+    width = 3 if lemma else 2
+
+    def collect(checkprobs):
+        words = []
+        counts = []
+        allfields = []
+        for line in result:
+            word, sep, rest = line.partition('\t')
+            fields = rest.split()
+            count = len(fields)
+            if sep and count and not count % width and (not checkprobs or
+                    all(FLOAT_re.match(x) for x in fields[width - 1::width])):
+                words.append(word)
+                counts.append(count // width)
+                allfields.extend(fields)
+            elif not exclude_nottags:
+                words.append(line)
+                counts.append(0)
+        fields = numpy.array(allfields, dtype=numpy.str_).reshape(-1, width)
+        return words, counts, fields
+
+    if not isinstance(result, list):
+        result = list(result)
+    words, counts, fields = collect(False)
+    try:
+        probs = fields[:, -1].astype(numpy.float64)
+    except ValueError:
+        # Some lines are not candidates lists - check probabilities line
+        # by line (slow path, only with unexpected outputs).
+        logger.debug("make_probs_arrays() found non-probability values.")
+        words, counts, fields = collect(True)
+        probs = fields[:, -1].astype(numpy.float64)
+
+    offsets = numpy.zeros(len(counts) + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=offsets[1:])
+    pos = fields[:, 0]
+    if lemma:
+        lemmas = fields[:, 1]
+    else:
+        lemmas = None
+    return ProbArrays(words, offsets, pos, lemmas, probs)
+
+
+# ==============================================================================
+#: Default size (in characters) of segments for split tagging of big texts.
+SPLIT_SEGMENT_SIZE = 100000
+#: Default size (in characters) of blocks of paragraphs read by streaming
+#: processing.
+STREAM_BLOCKSIZE = 65536
+# Prepared tokens ending a sentence.
+SENTENCE_END_re = re.compile("^[.!?\u2026]+$")
+
+
+def segment_text(text, segmentsize):
+    """Split a text in segments of complete lines.
+
+    As texts preparation is done line by line, segments can be prepared
+    independently (given the number of their first line for line
+    numbering).
+
+    :param text: the text to split.
+    :type text: str
+    :param segmentsize: minimum size of segments (in characters), except
+        for the last one.
+    :type segmentsize: int
+    :return: list of segments texts and number of their first line.
+    :rtype: [ (str, int) ]
+    """
+    segments = []
+    current = []
+    currentsize = 0
+    firstlinenum = 1
+    for line in text.splitlines(True):
+        current.append(line)
+        currentsize += len(line)
+        if currentsize >= segmentsize:
+            segments.append(("".join(current), firstlinenum))
+            firstlinenum += len(current)
+            current = []
+            currentsize = 0
+    if current or not segments:
+        segments.append(("".join(current), firstlinenum))
+    return segments
+
+
+def read_blocks(f, blocksize=STREAM_BLOCKSIZE):
+    """Read a text file by blocks of complete paragraphs.
+
+    Blocks end after an empty line (paragraph end) once they reach
+    ``blocksize`` characters. Without paragraphs, a block is ended at a line
+    end when it reach four times this size.
+    As texts preparation is done line by line, blocks can be prepared
+    independently (given the number of their first line for line
+    numbering).
+
+    :param f: file (or any iterable of lines) opened in text mode.
+    :param blocksize: minimum size of blocks (in characters), except for
+        the last one.
+    :type blocksize: int
+    :return: blocks texts and number of their first line.
+    :rtype: generator of (str, int)
+    """
+    current = []
+    currentsize = 0
+    firstlinenum = 1
+    for line in f:
+        current.append(line)
+        currentsize += len(line)
+        if (currentsize >= blocksize and not line.strip()) or \
+                currentsize >= 4 * blocksize:
+            block = "".join(current)
+            yield block, firstlinenum
+            # Count lines as text preparation does (splitlines() also split
+            # on form feeds and other separators).
+            firstlinenum += len(block.splitlines())
+            current = []
+            currentsize = 0
+    if current:
+        yield "".join(current), firstlinenum
+
+
+def sentence_spans(lines):
+    """Find sentences in prepared lines.
+
+    :param lines: lines to process as TreeTagger input.
+    :type lines: [ str ]
+    :return: start and end indexes of sentences lines.
+    :rtype: [ (int, int) ]
+    """
+    sentences = []
+    start = 0
+    for i, line in enumerate(lines):
+        if SENTENCE_END_re.match(line):
+            sentences.append((start, i + 1))
+            start = i + 1
+    if start < len(lines):
+        sentences.append((start, len(lines)))
+    return sentences
+
+
+def segment_lines(lines, segmentsize):
+    """Split prepared lines in frames of complete sentences.
+
+    Each frame come with its context: the sentence before it and the
+    sentence after it (empty lists at text start and end).
+
+    :param lines: lines to process as TreeTagger input.
+    :type lines: [ str ]
+    :param segmentsize: minimum size of frames (in characters), except for
+        the last one.
+    :type segmentsize: int
+    :return: list of left context, frame lines and right context.
+    :rtype: [ ([ str ], [ str ], [ str ]) ]
+    """
+    sentences = sentence_spans(lines)
+    if not sentences:
+        return [([], [], [])]
+
+    # Group sentences.
+    groups = []
+    first = 0
+    size = 0
+    for n, (start, end) in enumerate(sentences):
+        size += sum(len(line) + 1 for line in lines[start:end])
+        if size >= segmentsize:
+            groups.append((first, n + 1))
+            first = n + 1
+            size = 0
+    if first < len(sentences):
+        groups.append((first, len(sentences)))
+
+    frames = []
+    for first, last in groups:
+        start = sentences[first][0]
+        end = sentences[last - 1][1]
+        left = lines[sentences[first - 1][0]:start] if first > 0 else []
+        right = lines[end:sentences[last][1]] if last < len(sentences) else []
+        frames.append((left, lines[start:end], right))
+    return frames
+
+
+def prepare_segment(tagger, text, firstlinenum, options):
+    """Poll job function to prepare a segment of text.
+
+    :param options: tag_text options.
+    :type options: dict
+    :return: List of lines to process as TreeTagger input.
+    :rtype: [ str ]
+    """
+    return tagger._prepare_lines(text, firstlinenum=firstlinenum, **options)
+
+
+def tag_block(tagger, text, firstlinenum, options, prepronly=False):
+    """Poll job function to prepare and tag a block of text lines.
+
+    :param options: tag_text options (except ``prepronly``).
+    :type options: dict
+    :return: List of output strings from the tagger.
+    :rtype: [ str ]
+    """
+    return tagger._tag_text(text, options, prepronly, firstlinenum)
+
+
+def tag_segment(tagger, left, lines, right):
+    """Poll job function to tag a frame of prepared lines with its context.
+
+    :return: List of output strings from the tagger for frame lines.
+    :rtype: [ str ]
+    """
+    return tagger._tag_frames([left, lines, right])[1]
+
+
+# ==============================================================================
+#: Version of cached results, part of cache keys (changed when the wrapper
+#: preparation of texts changes).
+CACHE_FORMAT = "1"
+#: Default maximum size (in bytes) of a :class:`ResultCache`.
+CACHE_MAXSIZE = 512 * 1024 * 1024
+# Eviction reduce the cache to this ratio of its maximum size (so it is not
+# done at each new entry).
+CACHE_EVICT_RATIO = 0.9
+
+
+# Files hashes, by (path, size, modification time).
+g_filedigests = {}
+
+
+def file_digest(path):
+    """Get a hash of a file content, for cache keys.
+
+    Hashes are kept while the file size and modification time don't change.
+
+    :param path: pathname of the file, or None.
+    :type path: str
+    :return: hexadecimal digest (empty for None).
+    :rtype: str
+    """
+    if path is None:
+        return ""
+    st = os.stat(path)
+    fileid = (path, st.st_size, st.st_mtime)
+    digest = g_filedigests.get(fileid)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        digest = g_filedigests[fileid] = h.hexdigest()
+    return digest
+
+
+class ResultCache(object):
+    """Persistent cache of tagging results, in a :mod:`sqlite3` database.
+
+    Results are stored compressed, with their last use time, and least
+    recently used results are removed when the total size is exceeded.
+    The cache can be shared by taggers of different threads and process
+    (each process open its own connection to the database).
+
+    Statistics returned by :meth:`stats` are for lookups done in the
+    current process.
+    """
+    def __init__(self, path, maxsize=CACHE_MAXSIZE):
+        """Open (or create) a results cache.
+
+        :param path: pathname of the cache database file.
+        :type path: str
+        :param maxsize: maximum size (in bytes) of stored results, default
+            to :data:`CACHE_MAXSIZE`.
+        :type maxsize: int
+        """
+        if sqlite3 is None:
+            logger.error("Results cache need Python sqlite3 module.")
+            raise TreeTaggerError("Results cache need Python sqlite3 module.")
+        if maxsize < 1:
+            raise ValueError("Invalid maxsize %s" % (maxsize,))
+        self.path = os.path.abspath(path)
+        self.maxsize = maxsize
+        self._reset()
+        # Create the database now, to report errors early.
+        with self._lock:
+            self._connection()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = None           # Estimation of total size.
+        self._stats = collections.Counter()
+
+    def __getstate__(self):
+        # Connections cannot be transmitted to other process.
+        return {'path': self.path, 'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _connection(self):
+        """Get the connection to the database, called with the lock held.
+        """
+        if self._conn is None:
+            try:
+                self._conn = sqlite3.connect(self.path, timeout=60,
+                                             check_same_thread=False)
+                try:
+                    self._conn.execute("PRAGMA journal_mode=WAL")
+                except sqlite3.DatabaseError:
+                    pass    # Keep default journal (ex. on network filesystems).
+                self._conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                                   "key TEXT PRIMARY KEY, data BLOB, "
+                                   "size INTEGER, used REAL)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS results_used "
+                                   "ON results (used)")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn = None
+                logger.error("Cannot open results cache %s: %s", self.path, e)
+                raise TreeTaggerError("Cannot open results cache %s: %s" % (self.path, e))
+        return self._conn
+
+    def _check_process(self):
+        # After a fork, don't share the connection (nor the lock) with the
+        # parent process.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def get(self, key):
+        """Search a result in the cache.
+
+        :param key: cache key (see :meth:`TreeTagger.cache_key`).
+        :type key: str
+        :return: the cached result, or None if not found.
+        :rtype: [ str ]
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Search several results in the cache, in one transaction.
+
+        :param keys: cache keys.
+        :type keys: [ str ]
+        :return: cached results by key, for keys found.
+        :rtype: dict
+        """
+        found = {}
+        self._check_process()
+        with self._lock:
+            conn = self._connection()
+            for key in keys:
+                row = conn.execute("SELECT data FROM results WHERE key=?", (key,)).fetchone()
+                if row is None:
+                    self._stats['misses'] += 1
+                else:
+                    found[key] = row[0]
+                    self._stats['hits'] += 1
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE results SET used=? WHERE key=?",
+                                 [(now, key) for key in found])
+                conn.commit()
+        for key, data in found.items():
+            data = zlib.decompress(data).decode("utf-8")
+            # Result lines never contain newlines.
+            found[key] = data.split("\n") if data else []
+        return found
+
+    def put(self, key, result):
+        """Store a result in the cache, removing least recently used ones
+        if the maximum size is exceeded.
+
+        :param key: cache key (see :meth:`TreeTagger.cache_key`).
+        :type key: str
+        :param result: tagging result.
+        :type result: [ str ]
+        """
+        self.put_many([(key, result)])
+
+    def put_many(self, items):
+        """Store several results in the cache, in one transaction.
+
+        :param items: cache keys and results.
+        :type items: [ (str, [ str ]) ]
+        """
+        rows = []
+        now = time.time()
+        for key, result in items:
+            data = zlib.compress("\n".join(result).encode("utf-8"))
+            rows.append((key, sqlite3.Binary(data), len(data), now))
+        if not rows:
+            return
+        self._check_process()
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO results (key, data, size, used) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            self._stats['stores'] += len(rows)
+            if self._size is None:
+                self._size = self._total_size(conn)
+            else:
+                self._size += sum(row[2] for row in rows)
+            if self._size > self.maxsize:
+                # Other process may have already evicted entries.
+                self._size = self._total_size(conn)
+                if self._size > self.maxsize:
+                    self._evict(conn)
+            conn.commit()
+
+    def _total_size(self, conn):
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict(self, conn):
+        excess = self._size - int(self.maxsize * CACHE_EVICT_RATIO)
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY used"):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+            self._size -= size
+        conn.executemany("DELETE FROM results WHERE key=?", keys)
+        self._stats['evictions'] += len(keys)
+        if DEBUG:
+            logger.debug("Evicted %d entries from results cache %s", len(keys), self.path)
+
+    def stats(self):
+        """Get cache statistics.
+
+        :return: dictionnary with keys ``hits``, ``misses``, ``stores``,
+            ``evictions`` (counts since cache opening in the current
+            process), ``entries`` and ``size`` (of the whole cache, in
+            bytes) and ``maxsize``.
+        :rtype: dict
+        """
+        self._check_process()
+        with self._lock:
+            conn = self._connection()
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) "
+                                         "FROM results").fetchone()
+            return {
+                'hits': self._stats['hits'],
+                'misses': self._stats['misses'],
+                'stores': self._stats['stores'],
+                'evictions': self._stats['evictions'],
+                'entries': entries,
+                'size': size,
+                'maxsize': self.maxsize,
+                }
+
+    def clear(self):
+        """Remove all cached results.
+        """
+        self._check_process()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM results")
+            conn.commit()
+            self._size = 0
+
+    def close(self):
+        """Close the connection to the database (it is opened again if
+        the cache is used later).
+        """
+        self._check_process()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SentenceCache(object):
+    """Cache of sentences tagging results, with a memory tier and an
+    optional disk tier.
+
+    Used to not tag again sentences repeated in many texts (ex. boilerplate
+    of web pages). Sentences are identified by their prepared lines, which
+    are tagged without the context of neighbour sentences — so results may
+    slightly differ from tagging of whole texts.
+
+    The memory tier keep most recently used sentences, the disk tier is a
+    :class:`ResultCache` (sentences found there are moved to memory).
+    The memory tier is not shared between process.
+    """
+    def __init__(self, memsize=100000, path=None, maxsize=CACHE_MAXSIZE):
+        """Creation of a sentences cache.
+
+        :param memsize: maximum count of sentences kept in memory, default
+            to 100000.
+        :type memsize: int
+        :param path: pathname of the disk tier database file, default to
+            None (memory only).
+        :type path: str
+        :param maxsize: maximum size (in bytes) of the disk tier, default to
+            :data:`CACHE_MAXSIZE`.
+        :type maxsize: int
+        """
+        if memsize < 1:
+            raise ValueError("Invalid memsize %s" % (memsize,))
+        self.memsize = memsize
+        self.disk = ResultCache(path, maxsize) if path is not None else None
+        self.path = self.disk.path if self.disk is not None else None
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()
+        self._stats = collections.Counter()
+
+    def __getstate__(self):
+        # Only transmit the configuration to other process.
+        return {'memsize': self.memsize, 'disk': self.disk, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def get_many(self, keys):
+        """Search sentences results in the memory tier, then in the disk tier.
+
+        :param keys: sentences keys (see :meth:`TreeTagger.sentence_key`).
+        :type keys: [ str ]
+        :return: cached results by key, for keys found.
+        :rtype: dict
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                result = self._memory.pop(key, None)
+                if result is not None:
+                    self._memory[key] = result      # Most recently used.
+                    found[key] = result
+                    self._stats['memory_hits'] += 1
+        missing = [key for key in keys if key not in found]
+        if missing and self.disk is not None:
+            fromdisk = self.disk.get_many(set(missing))
+            with self._lock:
+                self._stats['disk_hits'] += sum(1 for key in missing if key in fromdisk)
+                self._remember(fromdisk.items())
+            found.update(fromdisk)
+        with self._lock:
+            self._stats['misses'] += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Store sentences results in both tiers.
+
+        :param items: sentences keys and results.
+        :type items: [ (str, [ str ]) ]
+        """
+        items = list(items)
+        with self._lock:
+            self._remember(items)
+        if self.disk is not None:
+            self.disk.put_many(items)
+
+    def _remember(self, items):
+        """Add results to the memory tier, called with the lock held.
+        """
+        for key, result in items:
+            self._memory.pop(key, None)
+            self._memory[key] = result
+        while len(self._memory) > self.memsize:
+            self._memory.popitem(last=False)
+            self._stats['memory_evictions'] += 1
+
+    def stats(self):
+        """Get cache statistics.
+
+        :return: dictionnary with keys ``memory_hits``, ``disk_hits``,
+            ``misses`` and ``memory_evictions`` (counts of sentences since
+            cache creation in the current process), ``memory_entries``, and
+            ``disk`` (:meth:`ResultCache.stats` of the disk tier, or None).
+        :rtype: dict
+        """
+        with self._lock:
+            stats = {
+                'memory_hits': self._stats['memory_hits'],
+                'disk_hits': self._stats['disk_hits'],
+                'misses': self._stats['misses'],
+                'memory_evictions': self._stats['memory_evictions'],
+                'memory_entries': len(self._memory),
+                }
+        stats['disk'] = self.disk.stats() if self.disk is not None else None
+        return stats
+
+    def clear(self):
+        """Remove all cached sentences, in both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+def share_cache_args(taggerargs):
+    """Open the results and sentences caches of taggers arguments, to share
+    them.
+
+    Polls build their taggers with the returned arguments, so they use
+    one :class:`ResultCache` object (and one database connection by process)
+    in place of opening the cache for each tagger — and one
+    :class:`SentenceCache` object.
+
+    :param taggerargs: :class:`TreeTagger` parameters.
+    :type taggerargs: dict
+    :return: parameters with ``TAGCACHE`` as a :class:`ResultCache` object
+        and ``TAGSENTCACHE`` as a :class:`SentenceCache` object (or None).
+    :rtype: dict
+    """
+    taggerargs = dict(taggerargs)
+    cache = get_param("TAGCACHE", dict(taggerargs), None)
+    if isinstance(cache, six.string_types):
+        cache = ResultCache(cache)
+    taggerargs['TAGCACHE'] = cache
+    cache = get_param("TAGSENTCACHE", dict(taggerargs), None)
+    if isinstance(cache, six.string_types):
+        cache = SentenceCache(path=cache)
+    taggerargs['TAGSENTCACHE'] = cache
+    return taggerargs
+
+
+# ==============================================================================
+def process_rss_mb(pid):
+    """Get the resident memory size of a process.
+
+    This is only available on Linux (via :file:`/proc`).
+
+    :param pid: process identifier.
+    :type pid: int
+    :return: resident size in MB, or None if unknown.
+    :rtype: float
+    """
+    try:
+        with open("/proc/{}/statm".format(pid)) as f:
+            pages = int(f.read().split()[1])
+        pagesize = os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return None
+    return pages * pagesize / (1024.0 * 1024.0)
+
+
+def tagger_rss_mb(tagger):
+    """Get the resident memory size of a tagger TreeTagger process.
+
+    :return: resident size in MB, or None if unknown (or process not
+        started).
+    :rtype: float
+    """
+    if getattr(tagger, "tagpopen", None) is None:
+        return None
+    return process_rss_mb(tagger.tagpopen.pid)
+
+
+# ==============================================================================
+#: Jobs scheduling policies of polls: submission order, longest processing
+#: time first, shortest processing time first.
+POLL_SCHEDULES = ("fifo", "lpt", "spt")
+
+
+def job_cost(methname, args, kwargs):
+    """Estimate the processing cost of a poll job.
+
+    The cost is the length of the text to tag (``text`` parameter), or the
+    size of the file to tag (``infilepath`` parameter), or 0 if unknown.
+
+    :return: estimated cost.
+    :rtype: int
+    """
+    text = kwargs.get('text', args[0] if args else None)
+    if isinstance(text, six.string_types):
+        return len(text)
+    if isinstance(text, (list, tuple)):
+        return sum(len(t) for t in text if isinstance(t, six.string_types))
+    infilepath = kwargs.get('infilepath')
+    if infilepath is not None:
+        try:
+            return os.path.getsize(infilepath)
+        except (OSError, TypeError):
+            return 0
+    return 0
+
+
+# ==============================================================================
+#: Upper bounds (in seconds) of polls latency histograms buckets, an extra
+#: last bucket count greater latencies.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+#: Stages of jobs processing measured by polls: waiting in queues (for a
+#: worker, or for a tagger), preparation of texts, exchange with TreeTagger.
+LATENCY_STAGES = ("wait", "prep", "tag")
+
+
+class PollMetrics(object):
+    """Runtime measures of a poll, updated as jobs are done.
+
+    Internal use by polls, which merge :meth:`snapshot` into their
+    ``metrics()``.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._counts = collections.Counter()
+        self._histograms = dict((stage, [0] * (len(LATENCY_BUCKETS) + 1))
+                                for stage in LATENCY_STAGES)
+        self._sums = dict.fromkeys(LATENCY_STAGES, 0.0)
+        # Start time and busy seconds, by worker key.
+        self._busy = {}
+
+    def worker_started(self, key):
+        with self._lock:
+            self._busy[key] = [time.time(), 0.0]
+
+    def worker_stopped(self, key):
+        with self._lock:
+            self._busy.pop(key, None)
+
+    def add_busy(self, key, seconds):
+        with self._lock:
+            if key in self._busy:
+                self._busy[key][1] += seconds
+
+    def job_created(self):
+        with self._lock:
+            self._counts['created'] += 1
+
+    def job_finished(self):
+        with self._lock:
+            self._counts['finished'] += 1
+
+    def job_measured(self, wait, prep, tag, tokens=0):
+        """Record a processed job stages durations (in seconds) and tagged tokens.
+        """
+        with self._lock:
+            self._counts['measured'] += 1
+            self._counts['tokens'] += tokens
+            for stage, seconds in zip(LATENCY_STAGES, (wait, prep, tag)):
+                seconds = max(seconds, 0.0)
+                self._histograms[stage][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+                self._sums[stage] += seconds
+
+    def busy_ratios(self, keys=None):
+        """Get the ratio of time spent processing jobs since workers start.
+
+        :param keys: workers keys, default to all running workers.
+        :return: busy ratio by worker key.
+        :rtype: dict
+        """
+        now = time.time()
+        with self._lock:
+            if keys is None:
+                keys = list(self._busy)
+            ratios = {}
+            for key in keys:
+                if key in self._busy:
+                    started, busy = self._busy[key]
+                    ratios[key] = min(1.0, busy / (now - started)) if now > started else 0.0
+            return ratios
+
+    def snapshot(self):
+        """Get measures as a dictionnary.
+
+        :return: dictionnary with keys ``jobs_in_flight`` (created and not
+            finished), ``tokens`` (count of lines output by TreeTagger),
+            ``tokens_per_second`` (since the poll creation), ``busy_ratio``
+            (by worker) and ``latency`` — by stage (``"wait"``, ``"prep"``,
+            ``"tag"``), a dictionnary with ``count``, ``sum`` (in seconds)
+            and ``buckets`` (list of jobs count by :data:`LATENCY_BUCKETS`
+            bucket, plus one for greater latencies).
+        :rtype: dict
+        """
+        busy = self.busy_ratios()
+        with self._lock:
+            elapsed = time.time() - self._started
+            return {
+                'jobs_in_flight': self._counts['created'] - self._counts['finished'],
+                'tokens': self._counts['tokens'],
+                'tokens_per_second': self._counts['tokens'] / elapsed if elapsed > 0 else 0.0,
+                'busy_ratio': busy,
+                'latency': dict((stage, {'count': self._counts['measured'],
+                                         'sum': self._sums[stage],
+                                         'buckets': list(self._histograms[stage])})
+                                for stage in LATENCY_STAGES),
+                }
+
+
+# ==============================================================================
+class TaggerPollBase(futures.Executor if futures is not None else object):
+    """Common base of polls of taggers, :class:`TaggerPoll` and
+    :class:`treetaggerpoll.TaggerProcessPoll` — it is not a usable poll by
+    itself, jobs creation and poll stop are implemented by subclasses.
+
+    Polls implement the :class:`concurrent.futures.Executor` interface:
+    :meth:`submit` and :meth:`map` (inherited from ``Executor``) schedule
+    calls with a tagger of the poll and return standard
+    :class:`concurrent.futures.Future` objects, which can be used with
+    :func:`concurrent.futures.as_completed`, ``add_done_callback()`` or
+    :func:`asyncio.wrap_future`. :meth:`shutdown` stops the poll, and polls
+    can be used as context managers.
+
+    Jobs returned by ``…_async`` methods give access to their future via
+    their ``future`` attribute.
+
+    With a ``maxinflight`` parameter given at poll creation, count of
+    submitted and not finished jobs is bounded: jobs creation methods block
+    until a running job finish. Asynchronous code can wait for
+    :meth:`slot_available` future before submitting.
+    To tag a large iterable of texts, :meth:`imap` and :meth:`imap_unordered`
+    only keep a window of jobs in flight. A text stream (ex. standard input)
+    can be tagged by blocks of paragraphs the same way with
+    :meth:`tag_stream`.
+    Jobs release their input parameters as soon as they are finished.
+
+    A big text can be split and tagged in parallel by poll workers
+    with :meth:`tag_text_split_async`.
+
+    With a ``schedule`` parameter given at poll creation, waiting jobs are
+    not processed in submission order (``"fifo"``, the default) but
+    ordered by their estimated cost — the length of their text, or the
+    size of their input file: ``"lpt"`` process longest jobs first (best
+    for batch throughput), ``"spt"`` process shortest jobs first (best for
+    latency).
+
+    Polls :meth:`metrics` give a snapshot of their runtime measures: queue
+    depth, jobs in flight, workers busy ratio, histograms of jobs latency
+    by stage (waiting in queues, texts preparation, tagging by TreeTagger
+    — see :data:`LATENCY_BUCKETS`) and tagging throughput in tokens by
+    second. With a ``metricscallback`` parameter given at poll creation, it
+    is called with these metrics every ``metricsinterval`` seconds (from
+    a dedicated thread), to export them to a monitoring system.
+
+    .. note:: With Python2, this interface need the ``futures`` backport
+        package.
+    """
+    def submit(self, fn, *args, **kwargs):
+        """Schedule a call with a tagger of the poll.
+
+        The callable is executed as ``fn(tagger, *args, **kwargs)``, with
+        a :class:`TreeTagger` of the poll. It can be a :class:`TreeTagger`
+        method (ex. ``TreeTagger.tag_text``), or the name of such a method.
+        With a :class:`treetaggerpoll.TaggerProcessPoll`, the callable and
+        its arguments must be pickleable.
+
+        :return: a future about the call result.
+        :rtype: concurrent.futures.Future
+        """
+        if futures is None:
+            raise TreeTaggerError("Poll submit() need concurrent.futures "
+                                  "(futures package with Python2).")
+        return self._create_job(fn, *args, **kwargs).future
+
+    def imap(self, texts, window=None, **kwargs):
+        """Tag texts from an iterable, yielding results in texts order.
+
+        Texts are picked from the iterable only when there is room in the
+        prefetch window, so the whole corpus is never loaded in memory.
+        If a tagging raise an exception, it is raised when its result
+        should be yield.
+
+        :param texts: the texts to tag.
+        :type texts: iterable of str
+        :param window: maximum count of texts in flight, default to twice
+            the count of poll workers.
+        :type window: int
+        :param kwargs: tagging options, see :func:`TreeTagger.tag_text`.
+        :return: results of :func:`TreeTagger.tag_text`.
+        :rtype: generator of [ str ]
+        """
+        return self._imap_results(texts, window, kwargs, True)
+
+    def imap_unordered(self, texts, window=None, **kwargs):
+        """Same as :meth:`imap`, but yield results as soon as they are available.
+        """
+        return self._imap_results(texts, window, kwargs, False)
+
+    def tag_stream(self, infile, blocksize=STREAM_BLOCKSIZE, window=None,
+                   numlines=False, tagonly=False, prepronly=False,
+                   tagblanks=False, notagurl=False, notagemail=False,
+                   notagip=False, notagdns=False, nosgmlsplit=False):
+        """Tag a text stream by blocks of paragraphs, yielding results in order.
+
+        Blocks are read with :func:`read_blocks` only when there is room in
+        the prefetch window, and tagged in parallel by poll workers (line
+        numbering take care of lines before each block) — so memory stay
+        bounded whatever the stream size, and first results are available
+        before the end of the stream.
+        TreeTagger is flushed at the end of each block: tags of words around
+        blocks limits may slightly differ from tagging the whole text.
+
+        See :func:`TreeTagger.tag_text` method for other parameters.
+
+        :param infile: file (or any iterable of lines) opened in text mode.
+        :param blocksize: minimum size of blocks (in characters), default to
+            :data:`STREAM_BLOCKSIZE`.
+        :type blocksize: int
+        :param window: maximum count of blocks in flight, default to twice
+            the count of poll workers.
+        :type window: int
+        :return: results of blocks.
+        :rtype: generator of [ str ]
+        """
+        if blocksize < 1:
+            raise ValueError("Invalid blocksize %s" % (blocksize,))
+        options = dict(numlines=numlines, tagonly=tagonly, tagblanks=tagblanks,
+                       notagurl=notagurl, notagemail=notagemail, notagip=notagip,
+                       notagdns=notagdns, nosgmlsplit=nosgmlsplit)
+        return self._window_results(
+            read_blocks(infile, blocksize), window, True,
+            lambda block: self.submit(tag_block, block[0], block[1], options, prepronly))
+
+    def _imap_results(self, texts, window, kwargs, ordered):
+        return self._window_results(
+            texts, window, ordered,
+            lambda text: self._create_job('tag_text', text=text, **kwargs).future)
+
+    def _window_results(self, items, window, ordered, submit):
+        if futures is None:
+            raise TreeTaggerError("Poll imap() need concurrent.futures "
+                                  "(futures package with Python2).")
+        if window is None:
+            window = 2 * len(self._workers)
+        if window < 1:
+            raise ValueError("Invalid window %s" % (window,))
+        items = iter(items)
+        pending = collections.deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(submit(item))
+            if not pending:
+                break
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, notdone = futures.wait(pending,
+                                             return_when=futures.FIRST_COMPLETED)
+                for f in done:
+                    pending.remove(f)
+                    yield f.result()
+
+    def tag_text_split_async(self, text, segmentsize=SPLIT_SEGMENT_SIZE,
+                             numlines=False, tagonly=False, prepronly=False,
+                             tagblanks=False, notagurl=False, notagemail=False,
+                             notagip=False, notagdns=False, nosgmlsplit=False):
+        """Tag a big text, split into segments processed in parallel.
+
+        The text is split in segments of complete lines, prepared in
+        parallel by poll workers (line numbering take care of lines before
+        each segment).
+        Prepared lines are then split in frames of complete sentences,
+        tagged in parallel by poll workers, each frame being sent to
+        TreeTagger with the sentences before and after it as context.
+        Frames results are joined in order. Each frame is tagged with only
+        one sentence of context on each side: tags of words around frames
+        limits may slightly differ from :func:`TreeTagger.tag_text` result.
+
+        See :func:`TreeTagger.tag_text` method for other parameters.
+
+        :param text: the text to tag.
+        :type text: str
+        :param segmentsize: minimum size of segments (in characters),
+            default to :data:`SPLIT_SEGMENT_SIZE`.
+        :type segmentsize: int
+        :return: a future about the tag_text result.
+        :rtype: concurrent.futures.Future
+        """
+        if futures is None:
+            raise TreeTaggerError("Poll tag_text_split_async() need concurrent.futures "
+                                  "(futures package with Python2).")
+        if not isinstance(text, six.text_type):
+            logger.error("Must use *unicode* string as text to split, not %s.", type(text))
+            raise TreeTaggerError("Must use *unicode* string as text to split.")
+        if segmentsize < 1:
+            raise ValueError("Invalid segmentsize %s" % (segmentsize,))
+        options = dict(numlines=numlines, tagonly=tagonly, tagblanks=tagblanks,
+                       notagurl=notagurl, notagemail=notagemail, notagip=notagip,
+                       notagdns=notagdns, nosgmlsplit=nosgmlsplit)
+        result = futures.Future()
+        # Waiting segments jobs is done in a separate thread.
+        th = threading.Thread(target=self._split_main,
+                              args=(result, text, segmentsize, options, prepronly))
+        th.daemon = True
+        th.start()
+        return result
+
+    def _split_main(self, result, text, segmentsize, options, prepronly):
+        if not result.set_running_or_notify_cancel():
+            return
+        try:
+            fs = [self.submit(prepare_segment, text=segment, firstlinenum=firstlinenum,
+                              options=options)
+                  for segment, firstlinenum in segment_text(text, segmentsize)]
+            del text
+            lines = []
+            for f in fs:
+                lines.extend(f.result())
+            if prepronly:
+                result.set_result(lines)
+                return
+            fs = [self.submit(tag_segment, left, frame, right)
+                  for left, frame, right in segment_lines(lines, segmentsize)]
+            del lines
+            tags = []
+            for f in fs:
+                tags.extend(f.result())
+        except Exception as e:
+            result.set_exception(e)
+        else:
+            result.set_result(tags)
+
+    def slot_available(self):
+        """Get a future done when a job can be created without blocking.
+
+        Use it for asynchronous backpressure (ex. ``await
+        asyncio.wrap_future(poll.slot_available())`` before submitting a
+        job). The slot is not reserved, another thread can take it first.
+
+        :return: a future with a None result.
+        :rtype: concurrent.futures.Future
+        """
+        if futures is None:
+            raise TreeTaggerError("Poll slot_available() need concurrent.futures "
+                                  "(futures package with Python2).")
+        f = futures.Future()
+        with self._inflightcond:
+            if self._maxinflight is not None and \
+                    self._inflightcount >= self._maxinflight:
+                self._slotwaiters.append(f)
+                return f
+        f.set_result(None)
+        return f
+
+    @property
+    def inflight(self):
+        """Count of jobs submitted and not yet finished (when bounded).
+        """
+        return self._inflightcount
+
+    def _init_schedule(self, schedule):
+        if schedule not in POLL_SCHEDULES:
+            raise ValueError("Invalid schedule %r, must be one of %s" %
+                             (schedule, ", ".join(POLL_SCHEDULES)))
+        self._schedule = schedule
+        self._schedseq = itertools.count()
+
+    def _schedule_key(self, methname, args, kwargs):
+        """Build a job sort key for the poll schedule policy.
+
+        :return: cost part of the key (0 for fifo) and sequence number.
+        :rtype: tuple
+        """
+        if self._schedule == "fifo":
+            cost = 0
+        else:
+            cost = job_cost(methname, args, kwargs)
+            if self._schedule == "lpt":
+                cost = -cost
+        return (cost, next(self._schedseq))
+
+    def _init_inflight(self, maxinflight):
+        if maxinflight is not None and maxinflight < 1:
+            raise ValueError("Invalid maxinflight %s" % (maxinflight,))
+        self._maxinflight = maxinflight
+        self._inflightcount = 0
+        self._inflightcond = threading.Condition()
+        self._slotwaiters = []
+
+    def _acquire_slot(self, count=1):
+        """Wait for in-flight slots to be available for new jobs, and take them.
+
+        Slots of several jobs (a batch) are taken all at once, so that
+        callers never hold part of the slots while waiting for others.
+
+        :param count: count of slots to take, not more than ``maxinflight``.
+        :type count: int
+        """
+        if self._maxinflight is None:
+            return
+        with self._inflightcond:
+            while self._inflightcount + count > self._maxinflight:
+                self._inflightcond.wait()
+            self._inflightcount += count
+
+    def _release_slot(self):
+        """Give back a job in-flight slot.
+        """
+        if self._maxinflight is None:
+            return
+        with self._inflightcond:
+            self._inflightcount -= 1
+            # Waiters may need different counts of slots.
+            self._inflightcond.notify_all()
+            waiters, self._slotwaiters = self._slotwaiters, []
+        for f in waiters:
+            f.set_result(None)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Executor interface to stop the poll, see :meth:`stop_poll`.
+
+        Pending jobs are processed before stopping, unless
+        ``cancel_futures`` is True (then jobs not yet started are
+        cancelled, when the poll can do it).
+        The call always wait for the poll to be stopped.
+        """
+        if cancel_futures:
+            self._cancel_pending()
+        self.stop_poll()
+
+    def _cancel_pending(self):
+        """Cancel jobs not yet started (if possible).
+        """
+        pass
+
+    def _start_metrics_reporter(self, callback, interval):
+        if callback is not None and interval <= 0:
+            raise ValueError("Invalid metricsinterval %s" % (interval,))
+        self._metricsstop = threading.Event()
+        if callback is None:
+            self._metricsreporter = None
+            return
+        self._metricsreporter = threading.Thread(target=self._metrics_main,
+                                                 args=(callback, interval))
+        self._metricsreporter.daemon = True
+        self._metricsreporter.start()
+
+    def _metrics_main(self, callback, interval):
+        while not self._metricsstop.wait(interval):
+            try:
+                callback(self.metrics())
+            except Exception:
+                logger.exception("Failure in poll metrics callback.")
+
+    def _stop_metrics_reporter(self):
+        self._metricsstop.set()
+        reporter, self._metricsreporter = self._metricsreporter, None
+        if reporter is not None and reporter is not threading.current_thread():
+            reporter.join()
+
+    def metrics(self):
+        """Get a snapshot of the poll state (implemented by subclasses).
+
+        :return: dictionnary of runtime measures, see :meth:`TaggerPoll.metrics`
+            and :meth:`treetaggerpoll.TaggerProcessPoll.metrics`.
+        :rtype: dict
+        """
+        raise NotImplementedError()
+
+    def _create_job(self, methname, *args, **kwargs):
+        """Create and queue a job calling TreeTagger ``methname`` method
+        (implemented by subclasses).
+
+        :return: the new job.
+        """
+        raise NotImplementedError()
+
+    def stop_poll(self):
+        """Properly stop the poll (implemented by subclasses), see
+        :meth:`TaggerPoll.stop_poll`.
+        """
+        raise NotImplementedError()
+
+
+# ==============================================================================
+class TaggerPoll(TaggerPollBase):
     """Keep a poll of TreeTaggers for processing with different threads.
 
     This class is here for people preferring natural language processing
@@ -2458,6 +4222,14 @@ class TaggerPoll(object):
     set of taggers, able to do (more real) parallel tagging.
     All taggers in the same poll are created for same processing (with
     same options).
+    A job only borrow a tagger for the exchange of prepared lines with its
+    TreeTagger process, not during the chunking of its text — so a tagger
+    is not kept reserved while a text is chunked, and taggers count can be
+    lower than workers count.
+    Taggers can be recycled after some count of jobs or when their
+    TreeTagger process memory grows (see ``maxworkerjobs`` and
+    ``maxrssmb``): the replacement tagger is started and warmed while the
+    old one is still in use.
 
     :class:`TaggerPoll` objects has same high level interface than :class:`TreeTagger`
     ones with ``_async`` at end of methods names.
@@ -2497,8 +4269,24 @@ class TaggerPoll(object):
             print(r.result)
         p.stop_poll()
         print("Finished")
+
+    The poll is also a :class:`concurrent.futures.Executor` (see
+    :class:`TaggerPollBase`), results can be processed as they are
+    available:
+
+    .. code:: python
+
+        import concurrent.futures as cf
+        import treetaggerwrapper as ttpw
+
+        with ttpw.TaggerPoll() as p:
+            fs = [p.submit(ttpw.TreeTagger.tag_text, text) for text in texts]
+            for f in cf.as_completed(fs):
+                print(f.result())
     """
-    def __init__(self, workerscount=None, taggerscount=None, **kwargs):
+    def __init__(self, workerscount=None, taggerscount=None, maxinflight=None,
+                 schedule="fifo", maxworkerjobs=None, maxrssmb=None,
+                 metricscallback=None, metricsinterval=10.0, **kwargs):
         """Creation of a new TaggerPoll.
 
         By default a :class:`TaggerPoll` creates same count of threads and
@@ -2508,6 +4296,28 @@ class TaggerPoll(object):
         :type workerscount: int
         :param taggerscount: number of TreeTaggers objects to create.
         :type taggerscount: int
+        :param maxinflight: maximum count of jobs submitted and not finished,
+            jobs creation block when it is reached — default to None
+            (unbounded).
+        :type maxinflight: int
+        :param schedule: waiting jobs scheduling policy, ``"fifo"``,
+            ``"lpt"`` or ``"spt"`` (see :class:`TaggerPollBase`) — default to
+            ``"fifo"``.
+        :type schedule: str
+        :param maxworkerjobs: count of jobs after which a tagger is replaced by
+            a new one (with a new TreeTagger process) — default to None (never
+            replaced).
+        :type maxworkerjobs: int
+        :param maxrssmb: size of resident memory (in MB) of a tagger
+            TreeTagger process from which the tagger is replaced by a new one
+            — default to None (never replaced).
+        :type maxrssmb: float
+        :param metricscallback: function called with :meth:`metrics` result
+            every ``metricsinterval`` seconds — default to None.
+        :type metricscallback: callable
+        :param metricsinterval: time (in seconds) between calls of
+            ``metricscallback`` — default to 10.
+        :type metricsinterval: float
         :param kwargs: same parameters as :func:`TreeTagger.__init__`.
         """
         if workerscount is None:
@@ -2524,13 +4334,33 @@ class TaggerPoll(object):
             logger.debug("Creating TaggerPoll, %d workers, %d taggers",
                          workerscount,taggerscount )
 
+        self._init_inflight(maxinflight)
+        self._init_schedule(schedule)
         self._stopping = False
         self._workers = []
         self._waittaggers = queue.Queue()
-        self._waitjobs = queue.Queue()
+        # All taggers use the same results cache object.
+        kwargs = share_cache_args(kwargs)
+        self._taggerargs = kwargs
+        self._taggerscount = taggerscount
+        self._maxworkerjobs = maxworkerjobs
+        self._maxrssmb = maxrssmb
+        # Jobs count of taggers, taggers being replaced and replaced taggers,
+        # by tagger id.
+        self._taggersjobs = collections.Counter()
+        self._recyclingtaggers = set()
+        self._retiredtaggers = set()
+        self._recyclelock = threading.Lock()
+        self._stats = collections.Counter()
+        self._metrics = PollMetrics()
+        # Current job measures of each worker thread.
+        self._jobtimes = threading.local()
+        # Jobs are queued with their schedule key.
+        self._waitjobs = queue.PriorityQueue()
 
         self._build_taggers(taggerscount, kwargs)
         self._build_workers(workerscount)
+        self._start_metrics_reporter(metricscallback, metricsinterval)
 
         if DEBUG_MULTITHREAD:
             logger.debug("TaggerPoll ready")
@@ -2541,30 +4371,152 @@ class TaggerPoll(object):
         for i in range(taggerscount):
             tt = TreeTagger(**taggerargs)
             self._waittaggers.put(tt)
+        # Tagger shared by workers for texts preparation, it never start its
+        # own TreeTagger process but borrow one of the taggers.
+        self._preptagger = TreeTagger(**taggerargs)
+        self._preptagger._framestagger = self._tag_frames
+
+    def _tag_frames(self, frames, isolated=False, route=None):
+        waitstart = time.time()
+        tagger = self._borrow_tagger(route)
+        if DEBUG_MULTITHREAD:
+            logger.debug("Thread %d picked tagger %d", threading.current_thread().ident,
+                         id(tagger))
+        tagstart = time.time()
+        try:
+            results = tagger._tag_frames(frames, isolated)
+        finally:
+            if DEBUG_MULTITHREAD:
+                logger.debug("Thread %d give back tagger %d",
+                             threading.current_thread().ident, id(tagger))
+            self._give_back_tagger(tagger, route)
+            times = self._jobtimes
+            times.taggerwait += tagstart - waitstart
+            times.tag += time.time() - tagstart
+        times.tokens += sum(len(r) for r in results)
+        return results
+
+    def _borrow_tagger(self, route=None):
+        return self._waittaggers.get()
+
+    def _give_back_tagger(self, tagger, route=None):
+        if self._maxworkerjobs is None and self._maxrssmb is None:
+            self._waittaggers.put(tagger)
+            return
+        taggerid = id(tagger)
+        with self._recyclelock:
+            if taggerid in self._retiredtaggers:
+                # Its replacement is ready, forget it (this stop its
+                # TreeTagger process).
+                self._retiredtaggers.discard(taggerid)
+                del self._taggersjobs[taggerid]
+                return
+            self._taggersjobs[taggerid] += 1
+            recycle = taggerid not in self._recyclingtaggers and (
+                (self._maxworkerjobs is not None and
+                 self._taggersjobs[taggerid] >= self._maxworkerjobs) or
+                (self._maxrssmb is not None and
+                 (tagger_rss_mb(tagger) or 0) > self._maxrssmb))
+            if recycle:
+                self._recyclingtaggers.add(taggerid)
+        if recycle:
+            # The tagger stay in use while its replacement is warmed.
+            th = threading.Thread(target=self._recycle_tagger, args=(taggerid,))
+            th.daemon = True
+            th.start()
+        self._waittaggers.put(tagger)
+
+    def _recycle_tagger(self, taggerid):
+        if DEBUG_MULTITHREAD:
+            logger.debug("Warming replacement of tagger %d", taggerid)
+        tagger = TreeTagger(**self._taggerargs)
+        tagger._tag_lines(tagger.dummysequence.split("\n"))   # Start TreeTagger process.
+        with self._recyclelock:
+            self._recyclingtaggers.discard(taggerid)
+            self._retiredtaggers.add(taggerid)
+            self._stats['taggers_recycled'] += 1
+        if not self._stopping:
+            self._waittaggers.put(tagger)
+        if DEBUG_MULTITHREAD:
+            logger.debug("Tagger %d replaced by tagger %d", taggerid, id(tagger))
+
+    def metrics(self):
+        """Get a snapshot of the poll state.
+
+        :return: dictionnary with keys ``workers`` (count of worker
+            threads), ``taggers`` (count of taggers),
+            ``taggers_recycled`` (taggers replaced after reaching
+            ``maxworkerjobs`` or ``maxrssmb``), ``queue_depth`` (jobs
+            waiting for a worker), ``cache`` (:meth:`ResultCache.stats`, or
+            None without results cache), ``sentence_cache``
+            (:meth:`SentenceCache.stats`, or None without sentences cache),
+            and measures described in
+            :meth:`PollMetrics.snapshot` — ``busy_ratio`` is by worker
+            thread index, time waiting for a tagger is counted in ``"wait"``
+            latency and not as busy time.
+        :rtype: dict
+        """
+        cache = self._taggerargs['TAGCACHE']
+        metrics = {
+            'workers': len(self._workers),
+            'taggers': self._taggerscount,
+            'taggers_recycled': self._stats['taggers_recycled'],
+            'queue_depth': self._waitjobs.qsize(),
+            'cache': cache.stats() if cache is not None else None,
+            'sentence_cache': (self._taggerargs['TAGSENTCACHE'].stats()
+                               if self._taggerargs['TAGSENTCACHE'] is not None else None),
+            }
+        metrics.update(self._metrics.snapshot())
+        return metrics
 
     def _build_workers(self, workerscount):
         if DEBUG_MULTITHREAD:
             logger.debug("Creating workers for TaggerPoll")
         for i in range(workerscount):
-            th = threading.Thread(target=self._worker_main)
+            th = threading.Thread(target=self._worker_main, args=(i,))
             th.daemon = True
             self._workers.append(th)
+            self._metrics.worker_started(i)
             th.start()
 
-    def _create_job(self, methname, **kwargs):
+    def _measure_job(self, job, started):
+        """Record measures of a job executed by current worker thread.
+        """
+        times = self._jobtimes
+        elapsed = time.time() - started
+        self._metrics.job_measured(started - job._created + times.taggerwait,
+                                   elapsed - times.taggerwait - times.tag,
+                                   times.tag, times.tokens)
+        self._metrics.add_busy(times.workerid, elapsed - times.taggerwait)
+
+    def _create_job(self, methname, *args, **kwargs):
         if self._stopping:
             raise TreeTaggerError("TaggerPoll is stopped working.")
-        job = Job(self, methname, kwargs)
+        route = self._job_route(methname, kwargs)
+        self._acquire_slot()
+        job = Job(self, methname, args, kwargs, route)
+        self._metrics.job_created()
         if DEBUG_MULTITHREAD:
             logger.debug("Job %d created, queuing it", id(job))
-        self._waitjobs.put(job)
+        self._waitjobs.put(self._schedule_key(methname, args, kwargs) + (job,))
         return job
 
-    def _worker_main(self):
+    def _job_route(self, methname, kwargs):
+        """Get the taggers a job must use (None for the poll taggers).
+        """
+        return None
+
+    def _job_tagger(self, job):
+        """Get the tagger to execute a job with.
+        """
+        return self._preptagger
+
+    def _worker_main(self, workerid):
+        self._jobtimes.workerid = workerid
         while True:
             if DEBUG_MULTITHREAD:
                 logger.debug("Worker waiting for job to pick…")
-            job = self._waitjobs.get()  # Pickup a job.
+            job = self._waitjobs.get()[-1]  # Pickup a job.
             if job is None:
                 if DEBUG_MULTITHREAD:
                     logger.debug("Worker finishing")
@@ -2573,6 +4525,15 @@ class TaggerPoll(object):
                 logger.debug("Worker doing picked job %d", id(job))
             job._execute()                       # Do the job
 
+    def _cancel_pending(self):
+        while True:
+            try:
+                job = self._waitjobs.get_nowait()[-1]
+            except queue.Empty:
+                break
+            if job is not None:
+                job._cancel()
+
     def stop_poll(self):
         """Properly stop a :class:`TaggerPoll`.
 
@@ -2583,13 +4544,14 @@ class TaggerPoll(object):
         """
         if DEBUG_MULTITHREAD:
             logger.debug("TaggerPoll stopping")
+        self._stop_metrics_reporter()
         if not self._stopping:          # Just stop one time.
             if DEBUG_MULTITHREAD:
                 logger.debug("Signaling to threads")
             self._stopping = True       # Prevent more Jobs to be queued.
-            # Put one None by thread (will awake threads).
+            # Put one None by thread (will awake threads), after all jobs.
             for x in range(len(self._workers)):
-                self._waitjobs.put(None)
+                self._waitjobs.put((float("inf"), next(self._schedseq), None))
         # Wait for threads to be finished.
         for th in self._workers:
             if DEBUG_MULTITHREAD:
@@ -2599,6 +4561,8 @@ class TaggerPoll(object):
         if hasattr(self, '_workers'):
             del self._workers
         # Remove references to TreeTagger objects.
+        if hasattr(self, '_preptagger'):
+            del self._preptagger
         if hasattr(self, '_waittaggers'):
             del self._waittaggers
         if DEBUG_MULTITHREAD:
@@ -2674,53 +4638,510 @@ class Job(object):
 
     :ivar finished: Boolean indicator of job termination.
     :ivar result: Final job processing result — or exception.
+    :ivar future: :class:`concurrent.futures.Future` object of the job
+        (None if :mod:`concurrent.futures` is not available).
     """
-    def __init__(self, poll, methname, kwargs):
+    def __init__(self, poll, methname, args, kwargs, route=None):
         self._poll = poll
+        self._route = route
         self._methname = methname
+        self._args = args
         self._kwargs = kwargs
         self._event = threading.Event()
         self._finished = False
         self._result = None
+        self._created = time.time()
+        self.future = futures.Future() if futures is not None else None
 
     def _execute(self):
-        # Pickup a tagger.
-        logger.debug("Job %d waitin for a tagger", id(self))
-        tagger = self._poll._waittaggers.get()
+        if self.future is not None and not self.future.set_running_or_notify_cancel():
+            # Cancelled by user before being started.
+            self._cancel()
+            return
         if DEBUG_MULTITHREAD:
-            logger.debug("Job %d picked tagger %d for %s", id(self),
-                         id(tagger), self._methname)
+            logger.debug("Job %d executing %s", id(self), self._methname)
+        started = time.time()
+        times = self._poll._jobtimes
+        times.taggerwait = times.tag = 0.0
+        times.tokens = 0
+        error = None
         try:
-            meth = getattr(tagger, self._methname)
-            self._result = meth(**self._kwargs)
+            # Preparation is done with the poll shared tagger, which borrow a
+            # tagger of the poll only to exchange with TreeTagger process.
+            tagger = self._poll._job_tagger(self)
+            if isinstance(self._methname, six.string_types):
+                meth = getattr(tagger, self._methname)
+                self._result = meth(*self._args, **self._kwargs)
+            else:
+                self._result = self._methname(tagger, *self._args, **self._kwargs)
         except Exception as e:
             if DEBUG_MULTITHREAD:
                 logger.debug("Job %d exit with exception", id(self))
-            self._result = e
-        # Release the tagger, signal the Job end of processing.
+            self._result = error = e
+        self._poll._measure_job(self, started)
+        # Signal the Job end of processing.
+        self._done()
+        if self.future is not None:
+            if error is None:
+                self.future.set_result(self._result)
+            else:
+                self.future.set_exception(error)
         if DEBUG_MULTITHREAD:
-            logger.debug("Job %d give back tagger %d", id(self),
-                         id(tagger))
-        self._poll._waittaggers.put(tagger)
+            logger.debug("Job %d finished", id(self))
+
+    def _cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+        self._done()
+        if DEBUG_MULTITHREAD:
+            logger.debug("Job %d cancelled", id(self))
+
+    def _done(self):
+        # Release inputs (may be large texts) and the in-flight slot.
+        self._args = self._kwargs = None
+        self._poll._metrics.job_finished()
         self._finished = True
         self._event.set()
-        if DEBUG_MULTITHREAD:
-            logger.debug("Job %d finished", id(self))
+        self._poll._release_slot()
 
     @property
     def finished(self):
         return self._finished
 
-    def wait_finished(self):
+    def wait_finished(self, timeout=None):
         """Lock on the Job event signaling its termination.
+
+        :param timeout: maximum time to wait in seconds, default to None
+            (wait until termination).
+        :type timeout: float
+        :return: True if the job is finished.
+        :rtype: bool
         """
-        self._event.wait()
+        return self._event.wait(timeout)
 
     @property
     def result(self):
         return self._result
 
 
+# ==============================================================================
+class TaggerRoute(object):
+    """Taggers of a :class:`TaggerRoutingPoll` for one set of TreeTagger parameters.
+
+    Internal use.
+
+    :ivar taggerargs: TreeTagger parameters of the route.
+    :ivar preptagger: tagger shared by workers to prepare texts (it never
+        start its own TreeTagger process).
+    :ivar idle: taggers of the route waiting for a job.
+    :ivar count: count of taggers of the route (idle or busy).
+    """
+    def __init__(self, taggerargs, preptagger):
+        self.taggerargs = taggerargs
+        self.preptagger = preptagger
+        self.idle = []
+        self.count = 0
+
+
+class TaggerRoutingPoll(TaggerPoll):
+    """Poll of taggers for jobs with different languages (or TreeTagger options).
+
+    Jobs are given a language (``lang`` parameter) and/or TreeTagger
+    parameters (``taggerargs`` parameter, a dictionnary of
+    :func:`TreeTagger.__init__` parameters) which complete the poll
+    default parameters. Jobs with same parameters follow the same route:
+    they use taggers (and TreeTagger process) created for these parameters.
+
+    Workers threads are shared by all routes, and a total count of
+    ``maxtaggers`` taggers is shared by all routes. Taggers of a route
+    are created lazily, when a job need one and none is idle.
+    When the taggers count is reached (or when the resident memory of all
+    TreeTagger process goes over ``memorymb``), the least recently used
+    idle taggers are stopped — possibly removing a language model from
+    memory until a job need it again.
+
+    .. code:: python
+
+        import treetaggerwrapper as ttpw
+
+        with ttpw.TaggerRoutingPoll(maxtaggers=4, TAGLANG="en") as p:
+            jobs = [p.tag_text_async(text, lang=lang) for text, lang in feed]
+            for job in jobs:
+                job.wait_finished()
+                print(job.result)
+
+    Jobs created with :meth:`submit` (with a callable) or
+    :meth:`tag_text_split_async` use the default parameters route.
+    """
+    def __init__(self, workerscount=None, maxtaggers=None, memorymb=None,
+                 maxinflight=None, schedule="fifo", metricscallback=None,
+                 metricsinterval=10.0, **kwargs):
+        """Creation of a new TaggerRoutingPoll.
+
+        :param workerscount: number of worker threads to create — default
+            to CPU cores count.
+        :type workerscount: int
+        :param maxtaggers: maximum count of taggers (TreeTagger process)
+            for all routes — default to CPU cores count.
+        :type maxtaggers: int
+        :param memorymb: resident memory size (in MB) of all TreeTagger
+            process from which idle taggers are stopped — default to None
+            (only use ``maxtaggers``).
+        :type memorymb: float
+        :param kwargs: default parameters for :func:`TreeTagger.__init__`,
+            other parameters are same as :class:`TaggerPoll` ones.
+        """
+        if maxtaggers is None:
+            maxtaggers = multiprocessing.cpu_count()
+        if memorymb is not None and memorymb <= 0:
+            raise ValueError("Invalid memorymb %s" % (memorymb,))
+        self._memorymb = memorymb
+        super(TaggerRoutingPoll, self).__init__(
+                workerscount=workerscount, taggerscount=maxtaggers,
+                maxinflight=maxinflight, schedule=schedule,
+                metricscallback=metricscallback, metricsinterval=metricsinterval,
+                **kwargs)
+
+    def _build_taggers(self, taggerscount, taggerargs):
+        # Taggers are created when jobs need them.
+        self._routes = {}
+        self._routescond = threading.Condition()
+        # Idle taggers of all routes, least recently used first, and all
+        # taggers.
+        self._idletaggers = collections.OrderedDict()
+        self._livetaggers = set()
+        # Check default parameters.
+        self._get_route(self._job_route(None, {}))
+
+    def _job_route(self, methname, kwargs):
+        taggerargs = {}
+        if isinstance(methname, six.string_types):
+            # TreeTagger methods don't have these parameters.
+            taggerargs = dict(kwargs.pop('taggerargs', None) or {})
+            lang = kwargs.pop('lang', None)
+            if lang is not None:
+                taggerargs['TAGLANG'] = lang
+        return tuple(sorted(dict(self._taggerargs, **taggerargs).items()))
+
+    def _job_tagger(self, job):
+        return self._get_route(job._route).preptagger
+
+    def _get_route(self, key):
+        with self._routescond:
+            route = self._routes.get(key)
+        if route is not None:
+            return route
+        # May raise for invalid parameters, the job get the exception.
+        preptagger = TreeTagger(**dict(key))
+        with self._routescond:
+            route = self._routes.get(key)
+            if route is None:
+                if DEBUG_MULTITHREAD:
+                    logger.debug("New route for %r", key)
+                route = TaggerRoute(dict(key), preptagger)
+                route.preptagger._framestagger = functools.partial(self._tag_frames,
+                                                                   route=route)
+                self._routes[key] = route
+        return route
+
+    def _borrow_tagger(self, route=None):
+        stopped = []
+        with self._routescond:
+            while True:
+                if route.idle:
+                    tagger = route.idle.pop()
+                    del self._idletaggers[tagger]
+                    return tagger
+                if len(self._livetaggers) >= self._taggerscount and self._idletaggers:
+                    # Make room for a tagger of this route.
+                    stopped.append(self._stop_lru_tagger())
+                if len(self._livetaggers) < self._taggerscount:
+                    break
+                self._routescond.wait()
+            # Reserve the place of the new tagger.
+            placeholder = object()
+            self._livetaggers.add(placeholder)
+            route.count += 1
+        del stopped[:]      # Stop TreeTagger process out of the lock.
+        try:
+            tagger = TreeTagger(**route.taggerargs)
+        except Exception:
+            with self._routescond:
+                self._livetaggers.discard(placeholder)
+                route.count -= 1
+                self._routescond.notify()
+            raise
+        with self._routescond:
+            self._livetaggers.discard(placeholder)
+            self._livetaggers.add(tagger)
+            self._stats['taggers_started'] += 1
+        return tagger
+
+    def _give_back_tagger(self, tagger, route=None):
+        with self._routescond:
+            route.idle.append(tagger)
+            self._idletaggers[tagger] = route
+            self._routescond.notify()
+        if self._memorymb is not None:
+            self._trim_memory()
+
+    def _stop_lru_tagger(self):
+        """Forget the least recently used idle tagger (call with lock acquired).
+
+        :return: the tagger, its TreeTagger process is stopped when it is
+            deleted.
+        """
+        tagger, route = self._idletaggers.popitem(last=False)
+        route.idle.remove(tagger)
+        route.count -= 1
+        self._livetaggers.discard(tagger)
+        self._stats['taggers_stopped'] += 1
+        if DEBUG_MULTITHREAD:
+            logger.debug("Stopping idle tagger %d", id(tagger))
+        return tagger
+
+    def _trim_memory(self):
+        stopped = []
+        with self._routescond:
+            usedmb = sum(tagger_rss_mb(t) or 0 for t in self._livetaggers
+                         if isinstance(t, TreeTagger))
+            while usedmb > self._memorymb and self._idletaggers:
+                tagger = self._stop_lru_tagger()
+                usedmb -= tagger_rss_mb(tagger) or 0
+                stopped.append(tagger)
+        del stopped[:]
+
+    def metrics(self):
+        """Get a snapshot of the poll state.
+
+        :return: same dictionnary as :meth:`TaggerPoll.metrics`, where
+            ``taggers`` is the current count of taggers, with keys
+            ``max_taggers``, ``taggers_started``, ``taggers_stopped``
+            (idle taggers stopped to make room for others) and ``routes``
+            (count of taggers by route, routes being identified by
+            their TreeTagger parameters different from the poll default
+            ones, as ``"name=value"`` strings joined by ``,``).
+        :rtype: dict
+        """
+        metrics = super(TaggerRoutingPoll, self).metrics()
+        with self._routescond:
+            routes = dict((self._route_label(route.taggerargs), route.count)
+                          for route in self._routes.values())
+            metrics.update({
+                'taggers': len(self._livetaggers),
+                'max_taggers': self._taggerscount,
+                'taggers_started': self._stats['taggers_started'],
+                'taggers_stopped': self._stats['taggers_stopped'],
+                'routes': routes,
+                })
+        return metrics
+
+    def _route_label(self, taggerargs):
+        return ",".join("{}={}".format(name, value)
+                        for name, value in sorted(taggerargs.items())
+                        if self._taggerargs.get(name) != value)
+
+    def stop_poll(self):
+        """See :meth:`TaggerPoll.stop_poll`.
+        """
+        super(TaggerRoutingPoll, self).stop_poll()
+        # Remove references to TreeTagger objects.
+        with self._routescond:
+            self._routes.clear()
+            self._idletaggers.clear()
+            self._livetaggers.clear()
+
+    #---------------------------------------------------------------------------
+    # Below methods have same interface than TaggerPoll ones, with the route
+    # parameters.
+    # --------------------------------------------------------------------------
+    def tag_text_async(self, text, lang=None, taggerargs=None, **kwargs):
+        """
+        See :func:`TaggerPoll.tag_text_async` method.
+
+        :param lang: language of the text (``TAGLANG`` parameter of the
+            tagger), default to the poll one.
+        :type lang: str
+        :param taggerargs: :func:`TreeTagger.__init__` parameters of the
+            tagger to use, default to the poll ones.
+        :type taggerargs: dict
+        :return: a :class:`Job` object about the async process.
+        :rtype: :class:`Job`
+        """
+        return self._create_job('tag_text', text=text, lang=lang,
+                                taggerargs=taggerargs, **kwargs)
+
+    def tag_file_async(self, infilepath, lang=None, taggerargs=None, **kwargs):
+        """
+        See :func:`TaggerPoll.tag_file_async` and :meth:`tag_text_async` methods.
+        """
+        return self._create_job('tag_file', infilepath=infilepath, lang=lang,
+                                taggerargs=taggerargs, **kwargs)
+
+    def tag_file_to_async(self, infilepath, outfilepath, lang=None, taggerargs=None,
+                          **kwargs):
+        """
+        See :func:`TaggerPoll.tag_file_to_async` and :meth:`tag_text_async` methods.
+        """
+        return self._create_job('tag_file_to', infilepath=infilepath,
+                                outfilepath=outfilepath, lang=lang,
+                                taggerargs=taggerargs, **kwargs)
+
+
+# ==============================================================================
+class CorpusManifest(object):
+    """Record of files processed by command line runs over a corpus.
+
+    The manifest is a file with one JSON entry by line, appended as files
+    are processed — so an interrupted run keeps the entries of files already
+    done. Entries of a file are compacted to the last one when the manifest
+    is opened.
+
+    :ivar path: pathname of the manifest file.
+    """
+    def __init__(self, path, options, usehash=False):
+        """Open (or create) a manifest.
+
+        :param path: pathname of the manifest file.
+        :type path: str
+        :param options: options of the run (tagging and tagger options),
+            files processed with other options are not up to date.
+        :type options: dict
+        :param usehash: compare content hash of files in place of their size
+            and modification time — default to False.
+        :type usehash: bool
+        """
+        self.path = path
+        self._options = json.dumps(options, sort_keys=True)
+        self._usehash = usehash
+        self._entries = {}
+        self._signatures = {}
+        if osp.exists(path):
+            with io.open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Last line of an interrupted run.
+                        logger.warning("Ignored invalid manifest %s line: %r", path, line)
+                        continue
+                    self._entries[entry['path']] = entry
+            tmppath = path + ".tmp"
+            with io.open(tmppath, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(self._entry_line(entry))
+            getattr(os, "replace", os.rename)(tmppath, path)
+        self._file = io.open(path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _entry_line(entry):
+        return six.text_type(json.dumps(entry, sort_keys=True)) + "\n"
+
+    def signature(self, filepath):
+        """Get the values identifying a file content.
+
+        :return: dictionnary with ``size`` and ``mtime`` (and ``sha1``
+            when comparing hashes).
+        :rtype: dict
+        """
+        st = os.stat(filepath)
+        sig = {'size': st.st_size, 'mtime': st.st_mtime}
+        if self._usehash:
+            sig['sha1'] = file_digest(filepath)
+        self._signatures[filepath] = sig
+        return sig
+
+    def uptodate(self, filepath, outfilepath=None):
+        """Tell if a file was already processed with same content and options.
+
+        :param filepath: pathname of the input file.
+        :type filepath: str
+        :param outfilepath: pathname of the output file, which must exist —
+            default to None (not checked).
+        :type outfilepath: str
+        :rtype: bool
+
+        A file which cannot be read (ex. removed since files were listed) is
+        not up to date, its processing will report the error.
+        """
+        entry = self._entries.get(filepath)
+        try:
+            sig = self.signature(filepath)
+        except (OSError, IOError) as e:
+            logger.warning("Manifest %s cannot check %s: %s", self.path, filepath, e)
+            return False
+        if entry is None or entry['status'] != "done" or entry['options'] != self._options:
+            return False
+        if outfilepath is not None and not osp.exists(outfilepath):
+            return False
+        if self._usehash:
+            return entry.get('sha1') == sig['sha1']
+        return entry['size'] == sig['size'] and entry['mtime'] == sig['mtime']
+
+    def record(self, filepath, error=None):
+        """Record the processing status of a file.
+
+        :param filepath: pathname of the input file.
+        :type filepath: str
+        :param error: exception of a failed processing — default to None
+            (file done).
+
+        A file which cannot be read anymore (ex. removed during the run) is
+        not recorded, it will be processed again by next run.
+        """
+        try:
+            sig = self._signatures.pop(filepath, None) or self.signature(filepath)
+        except (OSError, IOError) as e:
+            logger.warning("Manifest %s cannot record %s: %s", self.path, filepath, e)
+            return
+        entry = dict(sig, path=filepath, options=self._options,
+                     status="done" if error is None else "failed")
+        if error is not None:
+            entry['error'] = str(error)
+        self._entries[filepath] = entry
+        self._file.write(self._entry_line(entry))
+        self._file.flush()
+
+    def close(self):
+        """Close the manifest file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def shard_files(files, index, count):
+    """Select a deterministic part of files.
+
+    Files are dispatched between shards with a hash of their pathname (with
+    ``/`` separators), so different computers running with same file
+    pathnames get complementary parts.
+
+    :param files: pathnames of files.
+    :type files: [ str ]
+    :param index: index of the shard to select, from 1 to count.
+    :type index: int
+    :param count: count of shards.
+    :type count: int
+    :return: files of the shard, in same order.
+    :rtype: [ str ]
+    """
+    selected = []
+    for f in files:
+        key = f.replace(os.sep, "/")
+        if isinstance(key, six.text_type):
+            key = key.encode("utf-8")
+        if (zlib.crc32(key) & 0xffffffff) % count == index - 1:
+            selected.append(f)
+    return selected
+
+
 # ==============================================================================
 help_string = """treetaggerwrapper.py
 
@@ -2745,6 +5166,10 @@ Options:
                 bg nl et fi gl it la mn pl ru sk sw
     -d dir      TreeTagger base directory (may be automatically detected)
     -e enc      encoding used for user data (default to {USER_ENCODING})
+    -j N        tag files with N worker process (see treetaggerpoll
+                module), largest files first, and print a throughput
+                summary (with pipe mode, need --stream and tag blocks
+                with N worker process).
 
 Other options:
     --version               print script version and exit.
@@ -2753,6 +5178,13 @@ Other options:
     --abbreviations fic     file to use as abbreviations terms.
     --pipe                  use pipe mode on standard input/output 
                             (cannot provide files on command line).
+    --stream                with pipe mode, read and tag standard input
+                            by blocks of paragraphs, writing results as
+                            they are ready (memory stay bounded).
+    --window N              count of blocks tagged in parallel in stream
+                            mode (default to 4).
+    --blocksize N           minimum size (in characters) of blocks in
+                            stream mode (default to {STREAM_BLOCKSIZE}).
     --encerrors err         management of encoding errors for user data,
                             strict or ignore or replace (default
                             to strict).
@@ -2766,6 +5198,21 @@ Other options:
     --notagip               don't insert sgml tags for ip addresses.
     --notagdns              don't insert sgml tags for dns names.
     --nosgmlsplit           don't split on sgml/xml markups.
+    --store file            write all results as documents of a binary
+                            store file (see treetaggerstore module) in
+                            place of .{RESEXT} files.
+    --jobs N                tag files with N worker process (as -j).
+    --coalesce N            with -j, count of small texts a worker tag in
+                            one exchange with TreeTagger (default to 64,
+                            0 to disable).
+    --manifest file         record processed files (size, modification
+                            time, options, status) in a manifest file, and
+                            skip files already done with same options
+                            (resume interrupted runs).
+    --manifesthash          compare files content hash in place of size
+                            and modification time (with --manifest).
+    --shard i/N             process only the i-th of N parts of the files
+                            (from 1/N to N/N).
     
 Options you should not have to use:
     --ttinencoding enc      encoding to use for TreeTagger input
@@ -2810,9 +5257,17 @@ To just see tagging (TreeTagger call) result:
 
     echo -e "This\nis\nthe\nsentence\n." | python -m treetaggerwrapper --pipe --tagonly
 
+To tag a big text flow, with 4 worker process:
+
+    zcat corpus.txt.gz | python -m treetaggerwrapper --pipe --stream -j 4 | gzip > corpus.ttr.gz
+
+Note: in stream mode, TreeTagger is flushed at the end of each block, tags
+of words around blocks limits may slightly differ from tagging the whole
+text at once.
+
 Written by Laurent Pointal <laurent.pointal@limsi.fr> for CNRS-LIMSI.
 Alternate email: <laurent.pointal@laposte.net>
-""".format(RESEXT=RESEXT, USER_ENCODING=USER_ENCODING)
+""".format(RESEXT=RESEXT, USER_ENCODING=USER_ENCODING, STREAM_BLOCKSIZE=STREAM_BLOCKSIZE)
 
 
 def main(*args):
@@ -2837,16 +5292,27 @@ def main(*args):
     encerrors = "strict"
     tagonly = prepronly = tagblanks = notagurl = False
     notagemail = notagip = notagdns = nosgmlsplit = False
+    storepath = None
+    jobs = None
+    coalesce = 64
+    manifestpath = shard = None
+    manifesthash = False
+    streammode = False
+    window = 4
+    blocksize = STREAM_BLOCKSIZE
     tagbuildopt = {}
     try:
-        optlist, args = getopt.getopt(args, 'ptnl:d:be:', ["version", "abbreviations=",
+        optlist, args = getopt.getopt(args, 'ptnl:d:be:j:', ["version", "abbreviations=",
                                                        "ttparamfile=", "ttoptions=", "pipe",
                                                        "ttinencoding=", "ttoutencoding=",
                                                        "ttinencerr=", "ttoutencerr=",
                                                        "debug", "numlines",
                                                        "tagonly", "prepronly",
                                                        "tagblanks", "notagurl", "notagemail",
-                                                       "notagip", "notagdns", "nosgmlsplit"])
+                                                       "notagip", "notagdns", "nosgmlsplit",
+                                                       "store=", "jobs=", "coalesce=", "manifest=",
+                                                       "manifesthash", "shard=", "stream",
+                                                       "window=", "blocksize="])
     except getopt.GetoptError as err:
         print("Error,", err)
         print("See usage with: python treetaggerwrapper.py --help")
@@ -2903,6 +5369,50 @@ def main(*args):
             notagdns = True
         elif opt == "--nosgmlsplit":
             nosgmlsplit = True
+        elif opt == "--store":
+            storepath = val
+        elif opt in ('-j', "--jobs"):
+            try:
+                jobs = int(val)
+            except ValueError:
+                jobs = 0
+            if jobs < 1:
+                print("Error, invalid jobs count", val)
+                sys.exit(-1)
+        elif opt == "--coalesce":
+            try:
+                coalesce = int(val)
+            except ValueError:
+                coalesce = -1
+            if coalesce < 0:
+                print("Error, invalid coalesce count", val)
+                sys.exit(-1)
+        elif opt == "--stream":
+            streammode = True
+        elif opt in ("--window", "--blocksize"):
+            try:
+                count = int(val)
+            except ValueError:
+                count = 0
+            if count < 1:
+                print("Error, invalid", opt[2:], val)
+                sys.exit(-1)
+            if opt == "--window":
+                window = count
+            else:
+                blocksize = count
+        elif opt == "--manifest":
+            manifestpath = val
+        elif opt == "--manifesthash":
+            manifesthash = True
+        elif opt == "--shard":
+            try:
+                shard = tuple(int(x) for x in val.split("/"))
+            except ValueError:
+                shard = ()
+            if len(shard) != 2 or not 1 <= shard[0] <= shard[1]:
+                print("Error, invalid shard", val)
+                sys.exit(-1)
         elif opt == "--version":
             print("treetaggerwrapper.py", __version__)
             sys.exit(0)
@@ -2918,8 +5428,51 @@ def main(*args):
         logger.info("See online help with --help.")
         return -1
 
-    if DEBUG: logger.info("files to process: %r", files)
+    if manifestpath is not None and (pipemode or storepath is not None):
+        enable_debugging_log()
+        logger.error("Cannot use manifest with pipe mode or store.")
+        return -1
+
+    if shard is not None:
+        files = shard_files(files, *shard)
     logger.info("filesencoding=%s", filesencoding)
+    tagoptions = dict(numlines=numlines, tagonly=tagonly,
+                      prepronly=prepronly, tagblanks=tagblanks, notagurl=notagurl,
+                      notagemail=notagemail, notagip=notagip, notagdns=notagdns,
+                      nosgmlsplit=nosgmlsplit)
+    if manifestpath is not None:
+        manifest = CorpusManifest(manifestpath, dict(tagoptions, encoding=filesencoding,
+                                                     **tagbuildopt),
+                                  usehash=manifesthash)
+        todo = [f for f in files if not manifest.uptodate(f, f + "." + RESEXT)]
+        logger.info("Manifest %s: %d files up to date.", manifestpath, len(files) - len(todo))
+        files = todo
+    else:
+        manifest = None
+    if DEBUG: logger.info("files to process: %r", files)
+
+    if streammode:
+        if not pipemode:
+            enable_debugging_log()
+            logger.error("Stream mode need pipe mode.")
+            return -1
+        return main_stream(jobs, window, blocksize, filesencoding, encerrors,
+                           tagbuildopt, tagoptions)
+
+    if jobs is not None and pipemode:
+        enable_debugging_log()
+        logger.error("Jobs with pipe mode need stream mode.")
+        return -1
+
+    if jobs is not None and not pipemode:
+        # Poll process must be created before any TreeTagger in this process.
+        try:
+            return main_jobs(files, jobs, storepath, filesencoding, tagbuildopt,
+                             tagoptions, manifest, coalesce)
+        finally:
+            if manifest is not None:
+                manifest.close()
+
     tagger = TreeTagger(**tagbuildopt)
 
     if pipemode:
@@ -2950,14 +5503,131 @@ def main(*args):
         sys.stdout.write(res)
         logger.info("Processing with stdin/stdout, finished.")
     else:
+        if storepath is not None:
+            import treetaggerstore
+            # Previous store stay in place if processing fail.
+            store = treetaggerstore.StoreWriter(storepath + ".tmp")
+        else:
+            store = None
         for f in files:
-            fout = f + "." + RESEXT
-            tagger.tag_file_to(f, fout, encoding=filesencoding,
-                               numlines=numlines, tagonly=tagonly,
-                               prepronly=prepronly, tagblanks=tagblanks, notagurl=notagurl,
-                               notagemail=notagemail, notagip=notagip, notagdns=notagdns,
-                               nosgmlsplit=nosgmlsplit)
+            if store is not None:
+                fout = store
+            else:
+                fout = f + "." + RESEXT
+            try:
+                tagger.tag_file_to(f, fout, encoding=filesencoding,
+                                   numlines=numlines, tagonly=tagonly,
+                                   prepronly=prepronly, tagblanks=tagblanks, notagurl=notagurl,
+                                   notagemail=notagemail, notagip=notagip, notagdns=notagdns,
+                                   nosgmlsplit=nosgmlsplit)
+            except Exception as e:
+                if manifest is not None:
+                    manifest.record(f, e)
+                    manifest.close()
+                if store is not None:
+                    store.close()
+                    os.remove(store.path)
+                raise
+            if manifest is not None:
+                manifest.record(f)
+        if store is not None:
+            store.close()
+            getattr(os, "replace", os.rename)(store.path, storepath)
+        if manifest is not None:
+            manifest.close()
+
+    logger.info("treetaggerwrapper.py - process terminate normally.")
+    return 0
+
+
+def main_stream(jobs, window, blocksize, encoding, encerrors, tagbuildopt, tagoptions):
+    """Command line processing of standard input by blocks of paragraphs.
+
+    Blocks are tagged by a poll of two taggers threads (or of ``jobs``
+    worker process), see :meth:`TaggerPollBase.tag_stream`.
+    """
+    if hasattr(sys.stdin, "encoding") and sys.stdin.encoding is not None:
+        inencoding = sys.stdin.encoding
+    else:
+        inencoding = encoding
+    if hasattr(sys.stdout, "encoding") and sys.stdout.encoding is not None:
+        outencoding = sys.stdout.encoding
+    else:
+        outencoding = encoding
+    infile = sys.stdin
+    if six.PY2:
+        infile = codecs.getreader(inencoding)(infile, encerrors)
+
+    if jobs is not None:
+        import treetaggerpoll
+        poll = treetaggerpoll.TaggerProcessPoll(workerscount=jobs, **tagbuildopt)
+    else:
+        # One tagger prepares a block while the other one is tagging.
+        poll = TaggerPoll(workerscount=2, taggerscount=2, **tagbuildopt)
+    logger.info("Processing with stdin/stdout, streaming.")
+    try:
+        first = True
+        for res in poll.tag_stream(infile, blocksize=blocksize, window=window,
+                                   **tagoptions):
+            if not res:
+                continue
+            res = "\n".join(res)
+            if not first:
+                res = "\n" + res
+            first = False
+            if six.PY2:
+                res = res.encode(outencoding, encerrors)
+            sys.stdout.write(res)
+            sys.stdout.flush()
+    finally:
+        poll.stop_poll()
+    logger.info("Processing with stdin/stdout, finished.")
+    return 0
+
 
+def main_jobs(files, jobs, storepath, encoding, tagbuildopt, tagoptions, manifest=None,
+              coalesce=64):
+    """Command line processing of files with a poll of worker process.
+
+    Workers tag packs of small files (and other works waiting in the
+    queue, up to ``coalesce``) in one exchange with their TreeTagger
+    process. See :func:`treetaggerpoll.tag_corpus`.
+    """
+    import treetaggerpoll
+    poll = treetaggerpoll.TaggerProcessPoll(workerscount=jobs, coalescejobs=coalesce or None,
+                                            coalescebytes=treetaggerpoll.CORPUS_PACKBYTES,
+                                            **tagbuildopt)
+    store = None
+    done = False
+    try:
+        if storepath is not None:
+            import treetaggerstore
+            # Previous store stay in place if processing fail.
+            store = treetaggerstore.StoreWriter(storepath + ".tmp")
+        stats = treetaggerpoll.tag_corpus(poll, files, store=store, encoding=encoding,
+                                          filedone=manifest.record if manifest else None,
+                                          **tagoptions)
+        done = True
+    finally:
+        try:
+            poll.stop_poll()
+        finally:
+            if store is not None:
+                store.close()
+                if done:
+                    getattr(os, "replace", os.rename)(store.path, storepath)
+                elif osp.exists(store.path):
+                    os.remove(store.path)
+
+    seconds = max(stats['seconds'], 1e-6)
+    print("{0} files ({1} failed), {2:.1f} MB, {3} tokens in {4:.1f} s with {5} workers:".format(
+          stats['files'], stats['failed'], stats['bytes'] / 1e6, stats['tokens'],
+          stats['seconds'], jobs))
+    print("    {0:.1f} files/s, {1:.2f} MB/s, {2:.0f} tokens/s".format(
+          stats['files'] / seconds, stats['bytes'] / 1e6 / seconds, stats['tokens'] / seconds))
+    if stats['failed']:
+        logger.error("Processing of %d files failed.", stats['failed'])
+        return -1
     logger.info("treetaggerwrapper.py - process terminate normally.")
     return 0
 